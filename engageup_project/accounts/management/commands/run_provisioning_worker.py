@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import provisioning
+
+
+class Command(BaseCommand):
+    help = "アカウントの一括作成・パスワード再発行のジョブを実行します（ハッシュ化はプロセスプールで並列に行う）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="ハッシュ化に使うプロセス数（省略時は使えるCPUのコア数）",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=2, help="ジョブがない時の確認間隔（秒）"
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="待機中のジョブがなくなったら終了する",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+
+        # プロセスプールは1つ作って全ジョブで使い回す（子プロセスの起動は1回だけ）
+        with provisioning.create_executor(options["workers"]) as executor:
+            while True:
+                provisioning.fail_stale()
+                job = provisioning.claim_next_job()
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+                    continue
+
+                self.stdout.write(f"ジョブ #{job.pk}（{job.get_kind_display()}）を開始します")
+                job = provisioning.run_job(job, executor)
+                processed += 1
+                self.stdout.write(
+                    f"ジョブ #{job.pk}: {job.get_status_display()}（{job.processed}/{job.total} 件）"
+                )
+
+        self.stdout.write(f"{processed} 件のジョブを処理しました")
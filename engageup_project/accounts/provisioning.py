@@ -0,0 +1,315 @@
+"""
+アカウントの一括作成・パスワード再発行（DB: ProvisioningJob）
+
+パスワードのハッシュ化（PBKDF2）は1件ごとに重いため、画面からはジョブを登録するだけにして、
+run_provisioning_worker コマンドが次のように実行する。
+・ハッシュ化は CPU のコア数に合わせたプロセスプール（ProcessPoolExecutor）で並列に行う
+・PROVISIONING_CHUNK_SIZE 件ごとに bulk_create / bulk_update し、処理済み件数を保存する（進捗表示用）
+・ログイン情報のメールはチャンクごとに1つのSMTP接続で送る（生のパスワードはDBに保存しない）
+・途中で失敗した場合、保存済みのチャンクはそのまま残る（結果に件数を記録する）
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from accounts.authority import AuthoritySet
+from mail.outbox import RATE_LIMIT, RateLimiter
+from main.models import ProvisioningJob, User
+from moderator import sequential_accounts
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, "PROVISIONING_CHUNK_SIZE", 200)
+STALE_TIMEOUT = getattr(settings, "PROVISIONING_STALE_TIMEOUT", 3600)
+
+PASSWORD_LENGTH = 12
+PASSWORD_CHARS = (
+    "abcdefghijklmnopqrstuvwxyz"
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    "0123456789!@#$%^&*"
+)
+
+
+class ProvisioningError(Exception):
+    """ジョブを続けられないエラー（作成するアカウントが既に存在する等）"""
+
+
+def available_cores():
+    """このプロセスが使えるCPUのコア数"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count():
+    return getattr(settings, "PROVISIONING_WORKERS", None) or available_cores()
+
+
+def _init_process():
+    # spawn で起動した子プロセスでは Django の設定が読み込まれていない
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def create_executor(workers=None):
+    """パスワードのハッシュ化に使うプロセスプール（ワーカーが1つ作って使い回す）"""
+    return ProcessPoolExecutor(max_workers=workers or worker_count(), initializer=_init_process)
+
+
+def generate_password():
+    return get_random_string(length=PASSWORD_LENGTH, allowed_chars=PASSWORD_CHARS)
+
+
+def hash_passwords(raw_passwords, executor):
+    """パスワードをプロセスプールで並列にハッシュ化する（順番は raw_passwords と同じ）"""
+    if not raw_passwords:
+        return []
+    # 分割数はプールの実際のプロセス数に合わせる（--workers の指定が設定と異なる場合がある）
+    workers = getattr(executor, "_max_workers", None) or worker_count()
+    chunksize = max(len(raw_passwords) // (workers * 4), 1)
+    return list(executor.map(make_password, raw_passwords, chunksize=chunksize))
+
+
+# =========================
+# ジョブの登録・取り出し
+# =========================
+def enqueue(kind, params, user=None, total=0):
+    return ProvisioningJob.objects.create(
+        kind=kind, params=params, created_by=user, total=total
+    )
+
+
+def fail_stale(now=None):
+    """一定時間以上 running のままのジョブを失敗にする（途中から再開はしない）"""
+    now = now or timezone.now()
+    return ProvisioningJob.objects.filter(
+        status="running", started_at__lt=now - timedelta(seconds=STALE_TIMEOUT)
+    ).update(status="failed", error="タイムアウトしました", finished_at=now)
+
+
+def claim_next_job(now=None):
+    """待機中のジョブを1件取り出して running にする（複数ワーカーでも重複しない）"""
+    now = now or timezone.now()
+    for job in ProvisioningJob.objects.filter(status="pending").order_by("id")[:10]:
+        claimed = ProvisioningJob.objects.filter(pk=job.pk, status="pending").update(
+            status="running", started_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+# =========================
+# ログイン情報のメール
+# =========================
+def _created_message(user, raw_password):
+    return (
+        "アカウント作成のお知らせ",
+        f"""
+{user.username} 様
+
+アカウントが作成されました。
+
+ログイン情報
+ユーザー名: {user.username}
+パスワード: {raw_password}
+""",
+    )
+
+
+def _reset_message(user, raw_password):
+    return (
+        "【重要】ログイン情報のお知らせ",
+        f"""
+{user.username} 様
+
+ランク変更により、パスワードが再発行されました。
+
+ログイン情報
+--------------------
+ユーザー名：{user.username}
+パスワード：{raw_password}
+--------------------
+
+※ログイン後、必ずパスワードを変更してください。
+""",
+    )
+
+
+def _send_credentials(connection, limiter, users, raw_passwords, build_message):
+    """開いている接続でメールを1件ずつ送る。送れなかった宛先のユーザー名を返す"""
+    failed = []
+    for user, raw_password in zip(users, raw_passwords):
+        subject, body = build_message(user, raw_password)
+        limiter.wait()
+        try:
+            connection.send_messages([
+                EmailMessage(
+                    subject=subject,
+                    body=body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[user.email],
+                    connection=connection,
+                )
+            ])
+        except Exception as e:
+            logger.warning("%s へのログイン情報のメールを送れませんでした: %s", user.email, e)
+            failed.append(user.username)
+    return failed
+
+
+# =========================
+# ジョブの実行
+# =========================
+def _chunks(items, size=None):
+    size = size or CHUNK_SIZE
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _progress(job, count):
+    job.processed += count
+    job.save(update_fields=["processed", "updated_at"])
+
+
+def create_users(job, executor):
+    """連番のアカウントを作成する（params: start_number, count, rank）"""
+    accounts = sequential_accounts.candidates(job.params["start_number"], job.params["count"])
+    conflicts = sequential_accounts.find_conflicts(accounts)
+    if conflicts["usernames"] or conflicts["emails"]:
+        raise ProvisioningError(
+            "既に存在するアカウントがあります: "
+            + ", ".join(sequential_accounts.conflicting_usernames(accounts, conflicts)[:10])
+        )
+
+    job.total = len(accounts)
+    job.save(update_fields=["total", "updated_at"])
+
+    created, mail_failed = 0, []
+    connection = get_connection()
+    limiter = RateLimiter(RATE_LIMIT)
+    with connection:
+        for chunk in _chunks(accounts):
+            raw_passwords = [generate_password() for _ in chunk]
+            hashed = hash_passwords(raw_passwords, executor)
+            users = [
+                User(
+                    username=username,
+                    email=email,
+                    rank=job.params.get("rank", "visitor"),
+                    password=password,
+                )
+                for (_, username, email), password in zip(chunk, hashed)
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            created += len(users)
+            mail_failed += _send_credentials(
+                connection, limiter, users, raw_passwords, _created_message
+            )
+            _progress(job, len(chunk))
+    return {"created": created, "mail_failed": mail_failed}
+
+
+def reset_passwords(job, executor):
+    """指定したユーザーのパスワードを再発行する（params: user_ids）"""
+    users = list(
+        User.objects.filter(pk__in=job.params["user_ids"])
+        .only("pk", "username", "email")
+        .order_by("pk")
+    )
+    job.total = len(users)
+    job.save(update_fields=["total", "updated_at"])
+
+    updated, mail_failed = 0, []
+    connection = get_connection()
+    limiter = RateLimiter(RATE_LIMIT)
+    with connection:
+        for chunk in _chunks(users):
+            raw_passwords = [generate_password() for _ in chunk]
+            for user, password in zip(chunk, hash_passwords(raw_passwords, executor)):
+                user.password = password
+            User.objects.bulk_update(chunk, ["password"])
+            updated += len(chunk)
+            mail_failed += _send_credentials(
+                connection, limiter, chunk, raw_passwords, _reset_message
+            )
+            _progress(job, len(chunk))
+    return {"updated": updated, "mail_failed": mail_failed}
+
+
+HANDLERS = {
+    "create_users": create_users,
+    "reset_passwords": reset_passwords,
+}
+
+
+def _finish(job, **fields):
+    """
+    running のままの場合だけ結果を保存する
+    タイムアウト（fail_stale）で失敗にされたジョブは、遅れて終わっても成功に戻さない
+    """
+    fields["updated_at"] = timezone.now()
+    updated = ProvisioningJob.objects.filter(pk=job.pk, status="running").update(**fields)
+    if not updated:
+        logger.warning("アカウントのジョブ #%s はタイムアウト済みのため結果を保存しません", job.pk)
+        job.refresh_from_db()
+        return job
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return job
+
+
+def run_job(job, executor):
+    """ジョブを1件実行して結果を保存する"""
+    close_old_connections()
+    try:
+        try:
+            result = HANDLERS[job.kind](job, executor)
+        except Exception as e:
+            logger.warning("アカウントのジョブ #%s が失敗しました: %s", job.pk, e)
+            return _finish(job, status="failed", error=str(e), finished_at=timezone.now())
+
+        return _finish(job, status="succeeded", result=result, finished_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def redirect_url(job):
+    """ジョブ完了後に表示する画面"""
+    if job.kind == "create_users":
+        rank = job.created_by.rank if job.created_by else ""
+        return str(
+            AuthoritySet.authority_two("administer", "user_list", "moderator", "user_list", rank)
+            or reverse("moderator:user_list")
+        )
+    return reverse("administer:select_rank")
+
+
+def status_payload(job):
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "state": job.status,
+        "state_display": job.get_status_display(),
+        "total": job.total,
+        "processed": job.processed,
+        "percent": job.percent,
+        "error": job.error if job.status == "failed" else "",
+        "result": job.result if job.status == "succeeded" else {},
+        "redirect_url": redirect_url(job),
+    }
@@ -1,3 +1,111 @@
-from django.test import TestCase
+import re
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from administer.views import UserRankListView
+from main.models import Constant, ProvisioningJob, User
+from moderator.views import SequentialUserCreateView
+
+from . import provisioning
+
+
+class ProvisioningJobTests(TestCase):
+    """アカウントの一括処理はジョブとして登録され、ワーカーがプロセスプールで実行する"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.executor = provisioning.create_executor(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+        super().tearDownClass()
+
+    def setUp(self):
+        Constant.objects.all().delete()
+        Constant.objects.create(company_code="exa", address="example.com")
+        self.admin = User.objects.create_user(
+            username="admin", email="admin@example.com", password="pass", rank="administer"
+        )
+
+    def post(self, view_class, data):
+        request = RequestFactory().post("/", data, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        request.user = self.admin
+        request._dont_enforce_csrf_checks = True
+        return view_class.as_view()(request)
+
+    def run_next_job(self):
+        job = provisioning.claim_next_job()
+        return provisioning.run_job(job, self.executor)
+
+    def sent_password(self, message):
+        return re.search(r"パスワード[:：] ?(\S+)", message.body).group(1)
+
+    def test_create_users_in_background(self):
+        response = self.post(SequentialUserCreateView, {"start_number": 1, "count": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.filter(username="user1").exists())
+
+        # 2件ずつハッシュ化・保存して進捗を更新する
+        with mock.patch.object(provisioning, "CHUNK_SIZE", 2):
+            job = self.run_next_job()
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual((job.processed, job.total, job.result["created"]), (3, 3, 3))
+
+        self.assertEqual(len(mail.outbox), 3)
+        for message in mail.outbox:
+            user = User.objects.get(email=message.to[0])
+            self.assertEqual(user.rank, "visitor")
+            self.assertTrue(user.check_password(self.sent_password(message)))
+
+    def test_create_fails_when_accounts_appear_before_the_job_runs(self):
+        self.post(SequentialUserCreateView, {"start_number": 1, "count": 3})
+        User.objects.create_user(username="user2", email="x@example.com", password="pass")
+
+        job = self.run_next_job()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("user2", job.error)
+        self.assertFalse(User.objects.filter(username__in=["user1", "user3"]).exists())
+
+    def test_demoting_to_visitor_resets_passwords(self):
+        staff = User.objects.create_user(
+            username="staff", email="staff@example.com", password="old", rank="staff"
+        )
+        self.post(UserRankListView, {"selected_user": [staff.pk], "rank": "visitor"})
+        staff.refresh_from_db()
+        self.assertEqual(staff.rank, "visitor")
+        # 古いパスワードはランクの変更と同時に使えなくなる
+        self.assertFalse(staff.has_usable_password())
+
+        job = self.run_next_job()
+        self.assertEqual(job.kind, "reset_passwords")
+        self.assertEqual(job.status, "succeeded")
+        staff.refresh_from_db()
+        self.assertTrue(staff.check_password(self.sent_password(mail.outbox[0])))
+        self.assertFalse(ProvisioningJob.objects.filter(status="pending").exists())
+
+    def test_job_failed_as_stale_is_not_marked_succeeded(self):
+        def finish_after_timeout(job, executor):
+            # 処理中にタイムアウトで失敗にされた
+            provisioning.fail_stale(
+                now=timezone.now() + timedelta(seconds=provisioning.STALE_TIMEOUT + 1)
+            )
+            return {"created": 0}
+
+        provisioning.enqueue("create_users", {"start_number": 1, "count": 1})
+        with mock.patch.dict(provisioning.HANDLERS, {"create_users": finish_after_timeout}):
+            job = self.run_next_job()
+        self.assertEqual((job.status, job.error), ("failed", "タイムアウトしました"))
+        self.assertEqual(job.result, {})
+
+    def test_hash_chunks_follow_the_pool_size(self):
+        executor = mock.Mock(_max_workers=2)
+        executor.map.return_value = []
+        with mock.patch.object(provisioning, "worker_count", return_value=64):
+            provisioning.hash_passwords(["p"] * 32, executor)
+        self.assertEqual(executor.map.call_args.kwargs["chunksize"], 4)
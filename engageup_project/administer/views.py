@@ -1,11 +1,8 @@
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 
-from django.utils.crypto import get_random_string
-
-from django.core.mail import send_mail
-from django.utils.crypto import get_random_string
-from django.conf import settings
+from django.urls import reverse
+from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.views.generic import (
     TemplateView,
@@ -17,6 +14,7 @@ from django.db.models import Q
 from main.models import User, Constant
 from .forms import UserRankForm, ConstantForm
 from common.views import AdminOrModeratorRequiredMixin, BaseTemplateMixin
+from accounts import provisioning
 
 
 # =========================
@@ -154,43 +152,36 @@ class UserRankListView(
             new_rank = form.cleaned_data["rank"]
             users = User.objects.filter(pk__in=selected_users)
 
+            reset_ids = []
             for user in users:
                 if user == request.user:
                     continue
 
                 user.rank = new_rank
-
-                # visitor に変更された場合のみ
+                # visitor に変更された場合のみパスワードを再発行する
+                # 新しいパスワードが届くまで古いパスワードでログインできないよう、ランクと同時に無効にする
                 if new_rank == "visitor":
-                    raw_password = get_random_string(12)
-
-                    # 🔐 Django標準のパスワード更新
-                    user.set_password(raw_password)
-                    user.save()
-
-                    # ✉️ Django標準のメール送信
-                    send_mail(
-                        subject="【重要】ログイン情報のお知らせ",
-                        message=f"""
-    {user.username} 様
-
-    ランク変更により、パスワードが再発行されました。
-
-    ログイン情報
-    --------------------
-    ユーザー名：{user.username}
-    パスワード：{raw_password}
-    --------------------
-
-    ※ログイン後、必ずパスワードを変更してください。
-    """,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[user.email],
-                        fail_silently=False,
-                    )
-                else:
-                    user.save()
-
+                    user.set_unusable_password()
+                    reset_ids.append(user.pk)
+                user.save()
+
+            # 🔐 パスワードのハッシュ化・✉️ メール送信はワーカー（run_provisioning_worker）で行う
+            if reset_ids:
+                job = provisioning.enqueue(
+                    "reset_passwords",
+                    params={"user_ids": reset_ids},
+                    user=request.user,
+                    total=len(reset_ids),
+                )
+                if request.headers.get("x-requested-with") == "XMLHttpRequest":
+                    return JsonResponse({
+                        "status": "success",
+                        "job_id": job.pk,
+                        "status_url": reverse("provisioning_job_status", kwargs={"job_id": job.pk}),
+                    })
+
+        if request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return JsonResponse({"status": "success", "status_url": None})
         return redirect("administer:select_rank")
 
 # =========================
@@ -0,0 +1,59 @@
+"""
+AI プロバイダー層
+
+AI生成の呼び出しはすべて generate() を通す。実際のプロバイダー（Gemini など）は
+settings.AI_PROVIDER で切り替え、最初に使われた時に初めて import する。
+（google.generativeai と gRPC/protobuf の読み込みを、AIを使わないプロセスで発生させないため）
+テスト・ベンチマーク用に、ネットワークを使わない決定的な FakeProvider がある。
+"""
+
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_PROVIDER = "common.ai.gemini.GeminiProvider"
+
+_provider = None
+_lock = threading.Lock()
+
+
+def get_provider():
+    """設定されたプロバイダーを（初回のみ import して）返す"""
+    global _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                provider_class = import_string(
+                    getattr(settings, "AI_PROVIDER", DEFAULT_PROVIDER)
+                )
+                _provider = provider_class(**getattr(settings, "AI_PROVIDER_OPTIONS", {}))
+    return _provider
+
+
+def reset():
+    """プロバイダーを破棄する（設定を変えたテストの後など）"""
+    global _provider
+    with _lock:
+        _provider = None
+
+
+def identity():
+    """設定されたプロバイダーの識別子（AI生成結果のキャッシュの鍵に含める）"""
+    return get_provider().identity()
+
+
+def clean_json(text):
+    """応答からコードブロックの記号を取り除く"""
+    return text.replace("```json", "").replace("```", "").strip()
+
+
+def generate(prompt, text=None, pdf_data=None, hints=None):
+    """
+    AIに生成させて応答テキスト（JSON部分）を返す
+    text     : プロンプトに続けて渡す教材テキスト
+    pdf_data : 教材PDFのバイト列
+    hints    : 生成内容の種類など（FakeProvider が応答の形を決めるのに使う）
+    """
+    response = get_provider().generate(prompt, text=text, pdf_data=pdf_data, hints=hints or {})
+    return clean_json(response)
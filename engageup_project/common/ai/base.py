@@ -0,0 +1,14 @@
+class BaseProvider:
+    """AI プロバイダーの共通インターフェース"""
+
+    name = "base"
+    model_name = ""
+
+    def identity(self):
+        """キャッシュの鍵に含める識別子（プロバイダーのクラスとモデル名）"""
+        provider_class = type(self)
+        return f"{provider_class.__module__}.{provider_class.__qualname__}:{self.model_name}"
+
+    def generate(self, prompt, text=None, pdf_data=None, hints=None):
+        """応答テキストを返す"""
+        raise NotImplementedError
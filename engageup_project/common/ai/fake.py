@@ -0,0 +1,55 @@
+"""
+オフラインの決定的なプロバイダー（テスト・ベンチマーク用）
+
+ネットワークを使わず、入力のハッシュから毎回同じ応答を作る。
+応答の形は hints["kind"] で決める（exam_questions: 問題のリスト / module_content: 要約と例題）。
+"""
+
+import hashlib
+import json
+import random
+
+from .base import BaseProvider
+
+
+class FakeProvider(BaseProvider):
+    name = "fake"
+
+    def __init__(self, seed=0, **options):
+        self.seed = seed
+        self.model_name = f"seed={seed}"
+
+    def _random(self, prompt, text, pdf_data):
+        digest = hashlib.sha256()
+        digest.update(str(self.seed).encode("utf-8"))
+        digest.update(prompt.encode("utf-8"))
+        digest.update((text or "").encode("utf-8"))
+        digest.update(pdf_data or b"")
+        return random.Random(digest.hexdigest()), digest.hexdigest()[:8]
+
+    @staticmethod
+    def _question(rng, label, number):
+        correct = rng.randrange(4)
+        return {
+            "text": f"問題{number}（{label}）",
+            "choices": [
+                {"text": f"選択肢{i + 1}（{label}-{number}）", "is_correct": i == correct}
+                for i in range(4)
+            ],
+        }
+
+    def generate(self, prompt, text=None, pdf_data=None, hints=None):
+        hints = hints or {}
+        rng, label = self._random(prompt, text, pdf_data)
+
+        if hints.get("kind") == "module_content":
+            examples = []
+            for number in range(1, 3):
+                example = self._question(rng, label, number)
+                example["explanation"] = f"解説{number}（{label}）"
+                examples.append(example)
+            data = {"summary": f"<p>要約（{label}）</p>", "examples": examples}
+        else:
+            count = int(hints.get("count", 5))
+            data = [self._question(rng, label, number) for number in range(1, count + 1)]
+        return "```json\n" + json.dumps(data, ensure_ascii=False) + "\n```"
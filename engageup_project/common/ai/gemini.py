@@ -0,0 +1,77 @@
+"""Google Gemini プロバイダー（このモジュールは初めて使われる時に import される）"""
+
+import io
+
+import google.generativeai as genai  # type: ignore
+from django.conf import settings
+from google.generativeai.types import HarmBlockThreshold, HarmCategory  # type: ignore
+
+from .base import BaseProvider
+
+# これより大きいPDFはリクエストに埋め込まず File API でアップロードする
+# （埋め込むとPDF全体のコピーがワーカーのメモリに載るため。API側の上限は約20MB）
+INLINE_LIMIT = getattr(settings, "AI_INLINE_PDF_LIMIT", 8 * 1024 * 1024)
+
+
+class _BufferReader(io.RawIOBase):
+    """memoryview（mmap）をコピーせずに少しずつ読むためのファイルオブジェクト"""
+
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.buffer)}[whence]
+        self.position = max(base + offset, 0)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def readinto(self, b):
+        chunk = self.buffer[self.position:self.position + len(b)]
+        b[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+}
+
+
+class GeminiProvider(BaseProvider):
+    name = "gemini"
+
+    def __init__(self, model_name="gemini-flash-latest", api_key=None):
+        genai.configure(api_key=api_key or settings.GEMINI_API_KEY)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(
+            model_name=model_name, safety_settings=SAFETY_SETTINGS
+        )
+
+    def generate(self, prompt, text=None, pdf_data=None, hints=None):
+        contents = [prompt]
+        if text is not None:
+            contents.append(text)
+        uploaded = None
+        if pdf_data is not None and len(pdf_data) > INLINE_LIMIT:
+            uploaded = genai.upload_file(
+                io.BufferedReader(_BufferReader(pdf_data)), mime_type="application/pdf"
+            )
+            contents.append(uploaded)
+        elif pdf_data is not None:
+            contents.append({"mime_type": "application/pdf", "data": bytes(pdf_data)})
+        try:
+            return self.model.generate_content(contents).text
+        finally:
+            if uploaded is not None:
+                genai.delete_file(uploaded.name)
@@ -0,0 +1,134 @@
+"""
+AI生成結果のキャッシュ（内容アドレス方式）
+
+教材ファイルの SHA-256・プロンプトのバージョン・プロバイダーとモデル・生成条件から鍵を作り、
+同じ条件での生成はAPIを呼ばずに前回の応答を返す。
+・応答はディスク（AI_CACHE_DIR）に保存するため、再起動後やステージング環境の再投入でも使える
+・件数・合計サイズの上限を超えたら、最後に使われた日時が古いものから削除する（LRU）
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+from main.models import MediaAsset
+
+from . import mapped_file
+
+CACHE_DIR = str(getattr(settings, "AI_CACHE_DIR", settings.BASE_DIR / "ai_cache"))
+MAX_ENTRIES = getattr(settings, "AI_CACHE_MAX_ENTRIES", 500)
+MAX_BYTES = getattr(settings, "AI_CACHE_MAX_BYTES", 200 * 1024 * 1024)
+
+_evict_lock = threading.Lock()
+
+
+def file_digest(fieldfile):
+    """
+    FileField のファイルの SHA-256
+    重複排除ストレージで保存したファイルは索引 (MediaAsset) の値を使い、ファイルを読まない
+    """
+    sha256 = (
+        MediaAsset.objects.filter(name=fieldfile.name).values_list("sha256", flat=True).first()
+    )
+    if sha256:
+        return sha256
+    with mapped_file.open_mapped(fieldfile) as data:
+        return hashlib.sha256(data).hexdigest()
+
+
+def make_key(file_sha256, prompt_version, provider, **params):
+    """
+    キャッシュの鍵（ファイルのハッシュ・プロンプトのバージョン・プロバイダー・生成条件）
+    provider: ai.identity()（プロバイダーやモデルを切り替えたら別の鍵になる）
+    """
+    payload = json.dumps(
+        {"file": file_sha256, "prompt": prompt_version, "provider": provider, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.txt")
+
+
+def get(key):
+    """保存済みの応答テキスト（なければ None）。使われた日時を更新する"""
+    path = _path(key)
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return text
+
+
+def store(key, text):
+    """応答テキストを保存する（一時ファイルに書いてから置き換える）"""
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    evict()
+
+
+def evict():
+    """上限を超えた分を、最後に使われた日時が古いものから削除する。削除した件数を返す"""
+    with _evict_lock:
+        entries = []
+        for root, _, files in os.walk(CACHE_DIR):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if count <= MAX_ENTRIES and total <= MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+            removed += 1
+        return removed
+
+
+def get_or_generate(key, generate, validate=None, refresh=False):
+    """
+    キャッシュにあればそれを返し、なければ generate() で作って保存する
+    validate: 応答テキストを検証する関数（例外を出した応答は保存しない）
+    refresh : True ならキャッシュを使わずに作り直し、保存済みの応答を置き換える
+    """
+    if not refresh:
+        text = get(key)
+        if text is not None:
+            return text
+    text = generate()
+    if validate is not None:
+        validate(text)
+    store(key, text)
+    return text
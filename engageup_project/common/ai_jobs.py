@@ -0,0 +1,211 @@
+"""
+AI生成ジョブのキュー（DB: AIJob）
+
+画面からは enqueue() でジョブを登録してすぐに応答を返し、
+run_ai_worker コマンドがスレッドプールでジョブを実行する。
+・失敗したジョブは指数バックオフで再実行する（最大 max_attempts 回）
+・同時に実行するジョブ数は全ワーカー合計で AI_MAX_CONCURRENCY 件まで
+・ワーカーが落ちて running のまま残ったジョブは AI_JOB_STALE_TIMEOUT 秒後に戻す
+・戻されたジョブの結果は、遅れて終わった元のワーカーからは保存しない
+  （開始日時 started_at が変わっていないかを条件に更新する）
+"""
+
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from main.models import AIJob
+
+logger = logging.getLogger(__name__)
+
+# ジョブの種類 → 実行する関数（引数は AIJob、戻り値は result に保存する dict）
+HANDLERS = {
+    "exam_questions": "enrollments.ai_tasks.generate_exam_questions",
+    "module_content": "courses.ai_tasks.generate_module_content",
+}
+
+WORKER_THREADS = getattr(settings, "AI_WORKER_THREADS", 2)
+MAX_CONCURRENCY = getattr(settings, "AI_MAX_CONCURRENCY", 4)
+MAX_ATTEMPTS = getattr(settings, "AI_JOB_MAX_ATTEMPTS", 3)
+RETRY_BACKOFF = getattr(settings, "AI_JOB_RETRY_BACKOFF", 10)
+RATE_LIMIT_BACKOFF = getattr(settings, "AI_JOB_RATE_LIMIT_BACKOFF", 60)
+STALE_TIMEOUT = getattr(settings, "AI_JOB_STALE_TIMEOUT", 60 * 60)
+
+
+class PermanentJobError(Exception):
+    """再実行しても結果が変わらないエラー（教材がない等）。すぐに失敗にする"""
+
+
+def is_rate_limited(error):
+    """API の利用上限（HTTP 429 / ResourceExhausted）によるエラーか"""
+    return (
+        getattr(error, "code", None) == 429
+        or type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+    )
+
+
+class StaleJobError(Exception):
+    """タイムアウトで待機中に戻された（または別のワーカーが実行し直した）ジョブ"""
+
+
+class JobConflictError(Exception):
+    """同じ対象・種類のジョブが別の条件で待機中／実行中"""
+
+    def __init__(self, job):
+        self.job = job
+        super().__init__(
+            "同じ対象の生成が別の条件で実行中です。完了してからもう一度お試しください。"
+        )
+
+
+def enqueue(kind, params=None, exam=None, module=None, user=None):
+    """
+    ジョブを登録する
+    同じ対象・種類・条件のジョブが待機中／実行中ならそれを返す（ボタンの連打対策）
+    条件（params）が異なる場合は JobConflictError
+    """
+    params = params or {}
+    active = AIJob.objects.filter(
+        kind=kind, exam=exam, module=module, status__in=("pending", "running")
+    ).first()
+    if active:
+        if active.params != params:
+            raise JobConflictError(active)
+        return active
+    return AIJob.objects.create(
+        kind=kind,
+        params=params,
+        exam=exam,
+        module=module,
+        created_by=user,
+        max_attempts=MAX_ATTEMPTS,
+    )
+
+
+def requeue_stale(now=None):
+    """一定時間以上 running のままのジョブを待機中に戻す（上限回数に達していれば失敗）"""
+    now = now or timezone.now()
+    stale = AIJob.objects.filter(
+        status="running", started_at__lt=now - timedelta(seconds=STALE_TIMEOUT)
+    )
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status="failed", error="タイムアウトしました", finished_at=now
+    )
+    requeued = stale.update(status="pending", run_after=now)
+    return failed + requeued
+
+
+def claim_next_job(now=None):
+    """実行可能なジョブを1件取り出して running にする（複数ワーカーでも重複しない）"""
+    now = now or timezone.now()
+    if AIJob.objects.filter(status="running").count() >= MAX_CONCURRENCY:
+        return None
+    candidates = AIJob.objects.filter(status="pending", run_after__lte=now).order_by(
+        "run_after", "id"
+    )
+    for job in candidates[:10]:
+        claimed = AIJob.objects.filter(pk=job.pk, status="pending").update(
+            status="running", started_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def retry_delay(job, error):
+    """次の実行までの待ち時間（秒）。指数バックオフ + ゆらぎ"""
+    base = RATE_LIMIT_BACKOFF if is_rate_limited(error) else RETRY_BACKOFF
+    return base * (2 ** max(job.attempts - 1, 0)) + random.uniform(0, base)
+
+
+def _running(job):
+    """このワーカーが取り出した実行中のジョブ（戻された後は0件になる）"""
+    return AIJob.objects.filter(pk=job.pk, status="running", started_at=job.started_at)
+
+
+def lock_running(job):
+    """
+    生成結果を登録する前に呼ぶ（トランザクションの中で）
+    ジョブがまだこのワーカーの実行中なら、トランザクションの終わりまで行をロックする
+    戻されていれば StaleJobError（登録しない）
+    """
+    if not _running(job).update(updated_at=timezone.now()):
+        raise StaleJobError(f"AIジョブ #{job.pk} は待機中に戻されています")
+
+
+def _finish(job, **fields):
+    """実行中のままの場合だけ結果を保存する。戻されていれば何もしないで False"""
+    fields["updated_at"] = timezone.now()
+    if not _running(job).update(**fields):
+        logger.warning("AIジョブ #%s は待機中に戻されたため結果を破棄しました", job.pk)
+        return False
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return True
+
+
+def run_job(job):
+    """ジョブを1件実行して結果を保存する（ワーカースレッドから呼ばれる）"""
+    close_old_connections()
+    try:
+        handler = import_string(HANDLERS[job.kind])
+        try:
+            result = handler(job)
+        except StaleJobError:
+            logger.warning("AIジョブ #%s は待機中に戻されたため結果を破棄しました", job.pk)
+            return job
+        except Exception as e:
+            now = timezone.now()
+            retryable = not isinstance(e, PermanentJobError) and job.attempts < job.max_attempts
+            logger.warning("AIジョブ #%s が失敗しました: %s", job.pk, e)
+            if retryable:
+                _finish(
+                    job,
+                    status="pending",
+                    run_after=now + timedelta(seconds=retry_delay(job, e)),
+                    error=str(e),
+                )
+            else:
+                _finish(job, status="failed", finished_at=now, error=str(e))
+            return job
+
+        _finish(
+            job,
+            status="succeeded",
+            result=result or {},
+            error="",
+            finished_at=timezone.now(),
+        )
+        return job
+    finally:
+        close_old_connections()
+
+
+def redirect_url(job):
+    """ジョブ完了後に表示する画面"""
+    if job.kind == "exam_questions" and job.exam_id:
+        return reverse("enrollments:question_list", kwargs={"exam_id": job.exam_id})
+    if job.kind == "module_content" and job.module_id:
+        return reverse("courses:module_edit", kwargs={"pk": job.module_id})
+    return ""
+
+
+def status_payload(job):
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "state": job.status,
+        "state_display": job.get_status_display(),
+        "attempts": job.attempts,
+        "error": job.error if job.status == "failed" else "",
+        "result": job.result if job.status == "succeeded" else {},
+        "redirect_url": redirect_url(job),
+    }
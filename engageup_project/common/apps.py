@@ -4,3 +4,39 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'common'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_init, post_save
+        from main.models import (
+            Course,
+            Exam,
+            News,
+            TrainingModule,
+            User,
+            UserCourseProgress,
+            UserExamStatus,
+        )
+        from .media_library import REFERENCE_FIELDS
+        from .signals import (
+            count_file_references_on_delete,
+            count_file_references_on_save,
+            invalidate_dashboard_stats,
+            invalidate_dashboard_stats_on_user_save,
+            invalidate_user_dashboard_stats,
+            remember_file_names,
+        )
+
+        # アップロードされたファイル（重複排除ストレージ）の参照数を数える
+        for model in {model for model, _ in REFERENCE_FIELDS}:
+            post_init.connect(remember_file_names, sender=model)
+            post_save.connect(count_file_references_on_save, sender=model)
+            post_delete.connect(count_file_references_on_delete, sender=model)
+
+        # ホーム画面の集計のスナップショットを無効にする
+        for model in (TrainingModule, Course, Exam, News):
+            post_save.connect(invalidate_dashboard_stats, sender=model)
+            post_delete.connect(invalidate_dashboard_stats, sender=model)
+        for model in (UserCourseProgress, UserExamStatus):
+            post_save.connect(invalidate_user_dashboard_stats, sender=model)
+            post_delete.connect(invalidate_user_dashboard_stats, sender=model)
+        post_save.connect(invalidate_dashboard_stats_on_user_save, sender=User)
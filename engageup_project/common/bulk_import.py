@@ -0,0 +1,54 @@
+"""
+問題・例題の一括登録の共通処理
+
+検定問題（enrollments/question_bank.py）と研修の例題（courses/example_bank.py）で
+選択肢の検証・正規化と bulk_create の件数・方法を揃える。
+"""
+
+from django.conf import settings
+from django.db import connection
+
+BATCH_SIZE = getattr(settings, "QUESTION_IMPORT_BATCH_SIZE", 500)
+
+
+def as_bool(value):
+    """AIの応答・JSONの正解フラグ（true / "true" / "1" / "正解" など）を bool にする"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes", "正解")
+    return bool(value)
+
+
+def normalize_choices(raw_choices, max_length):
+    """
+    選択肢のリストを検証・正規化する（不正なら ValueError）
+    戻り値: [{"text": 選択肢, "is_correct": bool}, ...]
+    （AIの応答に合わせて "option" も受け付け、空の選択肢は読み飛ばす）
+    """
+    choices = []
+    for c in raw_choices or []:
+        if not isinstance(c, dict):
+            continue
+        text = str(c.get("text") or c.get("option") or "").strip()
+        if not text:
+            continue
+        if len(text) > max_length:
+            raise ValueError(f"選択肢が{max_length}文字を超えています")
+        choices.append({"text": text, "is_correct": as_bool(c.get("is_correct", False))})
+    if len(choices) < 2:
+        raise ValueError("選択肢が2つ以上必要です")
+    return choices
+
+
+def bulk_create_parents(objs):
+    """
+    子（選択肢）から参照する行をまとめて作成する
+    作成した行のIDを受け取れないDBでは1件ずつ保存する
+    """
+    if not objs:
+        return objs
+    if connection.features.can_return_rows_from_bulk_insert:
+        type(objs[0]).objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    else:
+        for obj in objs:
+            obj.save()
+    return objs
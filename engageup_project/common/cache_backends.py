@@ -0,0 +1,15 @@
+"""
+キャッシュのバックエンドの判定
+
+書き込みバッファ・無効化のバージョンなど、別プロセス（他のワーカー・管理コマンド）からも
+同じ値が見える必要がある使い方は、共有キャッシュ（Redis・Memcached 等）の場合だけ有効にする。
+"""
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias="default"):
+    """全プロセスから見えるキャッシュか（プロセスごとのメモリ・ダミーでないか）"""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
@@ -0,0 +1,127 @@
+"""
+ホーム画面（スタッフ）の集計のスナップショット
+
+ランキング・自分の順位・合格数・バッジ数・完了コース数・お知らせを1つにまとめて
+ユーザーごとにキャッシュし、ホーム画面はキャッシュを1回読むだけで表示する。
+スナップショットには作成時のバージョン（全体・ユーザー）を入れておき、
+どちらかのバージョンが上がっていたら作り直す。
+・全体のバージョン: 研修・コース・検定・お知らせの変更、ランキングの更新（common/signals.py）
+・ユーザーのバージョン: そのユーザーの進捗・合格の変更
+
+バージョンは全プロセスから見える必要があるため、スナップショットは共有キャッシュ
+（Redis・Memcached 等）の場合だけ使う。LocMemCache では他のプロセスでの無効化が届かず
+古い集計を表示してしまうので、毎回DBから集計する（DASHBOARD_STATS_SNAPSHOT で明示的に切り替え可）。
+"""
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+from common import cache_backends
+from main.models import BadgeLeaderboard, News, UserCourseProgress, UserExamStatus
+
+GLOBAL_VERSION_KEY = "dashboard_stats_version"
+SNAPSHOT_TIMEOUT = getattr(settings, "DASHBOARD_STATS_TIMEOUT", 60 * 60)
+RANKING_LIMIT = 3
+NEWS_LIMIT = 3
+
+
+def snapshots_enabled():
+    """スナップショットを使うか（未設定なら共有キャッシュの場合だけ）"""
+    enabled = getattr(settings, "DASHBOARD_STATS_SNAPSHOT", None)
+    if enabled is None:
+        return cache_backends.is_shared()
+    return enabled
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """本番（check --deploy）で、複数プロセスから使えないスナップショットの設定を知らせる"""
+    if getattr(settings, "DASHBOARD_STATS_SNAPSHOT", None) and not cache_backends.is_shared():
+        return [
+            checks.Error(
+                "DASHBOARD_STATS_SNAPSHOT を有効にするには共有キャッシュ（Redis 等）が必要です",
+                hint="プロセスごとのキャッシュでは、他のプロセスでの無効化が届きません",
+                id="common.E001",
+            )
+        ]
+    if not snapshots_enabled():
+        return [
+            checks.Warning(
+                "共有キャッシュが設定されていないため、ホーム画面の集計は毎回DBから作ります",
+                id="common.W001",
+            )
+        ]
+    return []
+
+
+def _snapshot_key(user_id):
+    return f"dashboard_stats:{user_id}"
+
+
+def _user_version_key(user_id):
+    return f"dashboard_stats_version:{user_id}"
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def invalidate_user(user_id):
+    """ユーザーのスナップショットを無効にする（進捗・合格が変わった時）"""
+    _bump(_user_version_key(user_id))
+
+
+def invalidate_all():
+    """全ユーザーのスナップショットを無効にする（ランキング・研修・お知らせが変わった時）"""
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def compute(user):
+    """集計をDBから作る"""
+    ranking = []
+    for row in BadgeLeaderboard.objects.top(RANKING_LIMIT):
+        row.user.badge_count = row.badge_count
+        ranking.append(row.user)
+    my_badge_rank = BadgeLeaderboard.objects.rank_of(user)
+    return {
+        "badge_ranking": ranking,
+        "my_badge_rank": my_badge_rank,
+        "badges_count": my_badge_rank["badge_count"] if my_badge_rank else 0,
+        "completed_count": UserExamStatus.objects.filter(
+            user=user, is_passed=True, exam__is_active=True
+        ).count(),
+        "completed_course_count": UserCourseProgress.objects.filter(
+            user=user, course__is_active=True, completed_at__isnull=False
+        ).count(),
+        "latest_news": list(
+            News.objects.filter(is_active=True).order_by("-created_at")[:NEWS_LIMIT]
+        ),
+    }
+
+
+def get_stats(user):
+    """
+    ユーザーの集計を返す
+    スナップショットとバージョンを get_many で1回に読み、最新ならそのまま返す
+    """
+    if not snapshots_enabled():
+        return compute(user)
+    snapshot_key, user_version_key = _snapshot_key(user.pk), _user_version_key(user.pk)
+    values = cache.get_many([snapshot_key, GLOBAL_VERSION_KEY, user_version_key])
+    snapshot = values.get(snapshot_key)
+    versions = (values.get(GLOBAL_VERSION_KEY), values.get(user_version_key))
+    if snapshot is not None and None not in versions and snapshot["versions"] == versions:
+        return snapshot["stats"]
+
+    # 集計中に無効化された場合は古いバージョンで保存され、次回作り直される
+    versions = (
+        cache.get_or_set(GLOBAL_VERSION_KEY, 1, None),
+        cache.get_or_set(user_version_key, 1, None),
+    )
+    stats = compute(user)
+    cache.set(snapshot_key, {"versions": versions, "stats": stats}, SNAPSHOT_TIMEOUT)
+    return stats
@@ -0,0 +1,50 @@
+from django import forms
+from django.urls import reverse
+
+from . import media_library
+
+
+class MediaAssetSelect(forms.Select):
+    """
+    メディアライブラリから選ぶためのプルダウン
+    全ファイルを <option> にせず、選択中のファイルだけを描画する。
+    ほかのファイルは検索欄・ページ送りで media_library_search から読み込む
+    """
+
+    template_name = "common/widgets/media_asset_select.html"
+
+    def __init__(self, attrs=None, empty_label="--- 選択してください ---", extensions=()):
+        super().__init__(attrs)
+        self.empty_label = empty_label
+        self.extensions = tuple(extensions)
+
+    def get_context(self, name, value, attrs):
+        self.choices = [("", self.empty_label)]
+        if value:
+            self.choices.append((value, value.rsplit("/", 1)[-1]))
+        context = super().get_context(name, value, attrs)
+        context["widget"]["search_url"] = reverse("media_library_search")
+        context["widget"]["extensions"] = ",".join(self.extensions)
+        context["widget"]["empty_label"] = self.empty_label
+        return context
+
+
+class MediaAssetField(forms.CharField):
+    """メディアライブラリのファイルを選ぶ項目（cleaned_data は MediaAsset または None）"""
+
+    widget = MediaAssetSelect
+
+    def __init__(self, *args, extensions=(), **kwargs):
+        self.extensions = tuple(extensions)
+        kwargs.setdefault("required", False)
+        super().__init__(*args, **kwargs)
+        self.widget.extensions = self.extensions
+
+    def clean(self, value):
+        value = super().clean(value)
+        if not value:
+            return None
+        asset = media_library.library_assets(self.extensions).filter(name=value).first()
+        if asset is None:
+            raise forms.ValidationError("選択したファイルが見つかりません。")
+        return asset
@@ -0,0 +1,64 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# 新しいプロセスで実行し、django.setup() 後の import にかかった時間（ミリ秒）を出力する
+SCRIPT = """
+import time
+import django
+django.setup()
+start = time.perf_counter()
+{imports}
+print((time.perf_counter() - start) * 1000)
+"""
+
+SCENARIOS = [
+    # 変更前の再現: 以前の ai_tasks は読み込み時に google.generativeai も読み込んでいたため、
+    # 現在のコードに google.generativeai の import を加えて模擬する（変更前のコードそのものではない）
+    ("変更前の模擬（google.generativeai も読み込む）",
+     "import enrollments.ai_tasks, courses.ai_tasks\nimport google.generativeai"),
+    ("変更後（プロバイダーは遅延読み込み）",
+     "import enrollments.ai_tasks, courses.ai_tasks"),
+    ("変更後 + FakeProvider で1回生成",
+     "import enrollments.ai_tasks, courses.ai_tasks\n"
+     "from django.conf import settings\n"
+     "settings.AI_PROVIDER = 'common.ai.fake.FakeProvider'  # API は呼ばない\n"
+     "from common import ai\n"
+     "ai.generate('benchmark', hints={'kind': 'exam_questions', 'count': 5})"),
+]
+
+
+class Command(BaseCommand):
+    help = "AI関連モジュールのコールドスタート時の import 時間を計測します"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="各パターンの計測回数")
+
+    def run_once(self, imports):
+        env = dict(os.environ)
+        env["DJANGO_SETTINGS_MODULE"] = os.environ.get(
+            "DJANGO_SETTINGS_MODULE", "engageup_project.settings"
+        )
+        env["PYTHONWARNINGS"] = "ignore"
+        output = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(imports=imports)],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return float(output.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        repeat = max(options["repeat"], 1)
+        for label, imports in SCENARIOS:
+            times = [self.run_once(imports) for _ in range(repeat)]
+            self.stdout.write(
+                f"{label}: 中央値 {statistics.median(times):.1f} ms"
+                f"（最小 {min(times):.1f} ms / 最大 {max(times):.1f} ms, {repeat} 回）"
+            )
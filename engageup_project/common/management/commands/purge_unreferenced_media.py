@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from common import media_library
+
+
+class Command(BaseCommand):
+    help = "どこからも参照されていないアップロード済みファイルを削除します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="最後にアップロードされてからこの日数以上経ったファイルだけを削除する",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="削除せずに対象のファイルを表示する"
+        )
+
+    def handle(self, *args, **options):
+        purged = media_library.purge_unreferenced(options["days"], dry_run=options["dry_run"])
+        for asset in purged:
+            self.stdout.write(f"{asset.name}（{asset.filename}）")
+        verb = "が削除対象です" if options["dry_run"] else "を削除しました"
+        self.stdout.write(f"{len(purged)} 件のファイル{verb}")
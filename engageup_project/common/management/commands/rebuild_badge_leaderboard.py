@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main.models import BadgeLeaderboard
+
+
+class Command(BaseCommand):
+    help = "バッジ獲得ランキング (BadgeLeaderboard) を合格状況から作り直します"
+
+    def handle(self, *args, **options):
+        BadgeLeaderboard.objects.rebuild()
+        self.stdout.write(f"{BadgeLeaderboard.objects.count()} 人分のランキングを作り直しました")
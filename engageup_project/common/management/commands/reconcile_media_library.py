@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from common import media_library
+
+
+class Command(BaseCommand):
+    help = "メディアライブラリの索引 (MediaAsset) を実際のファイルと同期し、参照数を数え直します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rehash",
+            action="store_true",
+            help="サイズが同じファイルもハッシュ・ページ数を計算し直す",
+        )
+
+    def handle(self, *args, **options):
+        counts = media_library.reconcile(rehash=options["rehash"])
+        self.stdout.write(
+            f"{counts['added']} 件を登録、{counts['updated']} 件を更新、"
+            f"{counts['removed']} 件を削除、{counts['recounted']} 件の参照数を修正しました"
+        )
@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from common import ai_jobs
+
+
+class Command(BaseCommand):
+    help = "AI生成ジョブ（検定問題・研修内容）をスレッドプールで実行します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=ai_jobs.WORKER_THREADS,
+            help="同時に実行するジョブ数（このワーカー内）",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=2, help="ジョブがない時の確認間隔（秒）"
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="実行可能なジョブがなくなったら終了する",
+        )
+
+    def handle(self, *args, **options):
+        threads = max(options["threads"], 1)
+        running = set()
+        processed = 0
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            while True:
+                ai_jobs.requeue_stale()
+
+                # 空いているスレッドの数だけジョブを取り出す
+                while len(running) < threads:
+                    job = ai_jobs.claim_next_job()
+                    if job is None:
+                        break
+                    self.stdout.write(f"ジョブ #{job.pk}（{job.get_kind_display()}）を開始します")
+                    running.add(executor.submit(ai_jobs.run_job, job))
+
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+                    continue
+
+                done, running = wait(
+                    running, timeout=options["interval"], return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    job = future.result()
+                    processed += 1
+                    self.stdout.write(f"ジョブ #{job.pk}: {job.get_status_display()}")
+
+        self.stdout.write(f"{processed} 件のジョブを処理しました")
@@ -0,0 +1,38 @@
+"""
+ファイルのメモリマップ読み込み
+
+AI生成・ハッシュ計算で教材ファイル全体を f.read() すると、ファイルの大きさの分だけ
+ワーカーのメモリ（RSS）が増える。open_mapped() はファイルを mmap して読み取り専用の
+memoryview を返すので、読んだページはOSがいつでも捨てられ、ワーカーのメモリは増えない。
+"""
+
+import mmap
+from contextlib import contextmanager
+
+
+@contextmanager
+def open_mapped(fieldfile):
+    """
+    FileField のファイルを mmap して memoryview を返す
+    ローカルのファイルでないストレージ（path を持たない）の場合はバイト列を返す
+    """
+    try:
+        path = fieldfile.path
+    except NotImplementedError:
+        with fieldfile.open("rb") as f:
+            yield f.read()
+        return
+
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空のファイルは mmap できない
+            yield b""
+            return
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            mapped.close()
@@ -0,0 +1,237 @@
+"""
+メディアライブラリ（アップロード済みファイルの索引: MediaAsset）
+
+「保存済みから選ぶ」の一覧はディレクトリ（ネットワークストレージの場合もある）を毎回読まず、
+この索引を検索・ページ送りして表示する。
+・アップロード時: 重複排除ストレージ（common/storage.py）が record_upload() で登録
+・参照数: 各モデルの保存・削除シグナルから add_reference() / remove_reference()
+・ファイルを直接置いた・消した場合: reconcile_media_library コマンドで同期
+"""
+
+import hashlib
+import os
+from collections import Counter
+from datetime import timedelta
+
+import fitz  # type: ignore
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.utils import timezone
+
+from main.models import Badge, Exam, MediaAsset, TrainingModule, User
+
+LIBRARY_DIR = "exams_files"
+PER_PAGE = getattr(settings, "MEDIA_LIBRARY_PER_PAGE", 20)
+READ_CHUNK_SIZE = 1024 * 1024
+
+# 参照数を数えるファイル項目（保存先はすべて重複排除ストレージ）
+REFERENCE_FIELDS = [
+    (Exam, "exams_file"),
+    (TrainingModule, "training_file"),
+    (TrainingModule, "video"),
+    (Badge, "icon"),
+    (User, "avatar"),
+]
+
+
+def upload_dirs():
+    """索引の対象ディレクトリ（各項目の upload_to）"""
+    dirs = []
+    for model, field_name in REFERENCE_FIELDS:
+        directory = model._meta.get_field(field_name).upload_to.strip("/")
+        if directory not in dirs:
+            dirs.append(directory)
+    return dirs
+
+
+def _page_count(name):
+    """PDFのページ数（PDF以外・壊れたPDFは None）"""
+    if not name.lower().endswith(".pdf"):
+        return None
+    try:
+        with fitz.open(default_storage.path(name)) as pdf:
+            return pdf.page_count
+    except Exception:
+        # 壊れたPDFも一覧には出す（ページ数は不明）
+        return None
+
+
+def _inspect(name):
+    """ファイルのサイズ・SHA-256（少しずつ読むのでメモリを使わない）"""
+    digest = hashlib.sha256()
+    size = 0
+    with default_storage.open(name, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def record_upload(name, size, sha256, original_name):
+    """
+    アップロードされたファイルを登録する（ストレージから呼ばれる）
+    同じ内容のファイルが登録済みならアップロード日時だけを更新する
+    """
+    updated = MediaAsset.objects.filter(name=name).update(uploaded_at=timezone.now())
+    if updated:
+        return
+    MediaAsset.objects.get_or_create(
+        name=name,
+        defaults={
+            "original_name": original_name,
+            "size": size,
+            "sha256": sha256,
+            "page_count": _page_count(name),
+            "uploaded_at": timezone.now(),
+        },
+    )
+
+
+def register(name, uploaded_at=None):
+    """既存のファイルを索引に登録（登録済みなら内容を更新）して MediaAsset を返す"""
+    size, sha256 = _inspect(name)
+    asset, _ = MediaAsset.objects.update_or_create(
+        name=name,
+        defaults={
+            "size": size,
+            "sha256": sha256,
+            "page_count": _page_count(name),
+            "uploaded_at": uploaded_at or timezone.now(),
+        },
+    )
+    if not asset.original_name:
+        asset.original_name = os.path.basename(name)
+        asset.save(update_fields=["original_name"])
+    return asset
+
+
+def add_reference(name):
+    """ファイルの参照数を1増やす（索引にないファイルは登録してから）"""
+    if not name:
+        return
+    if MediaAsset.objects.filter(name=name).update(ref_count=F("ref_count") + 1):
+        return
+    if default_storage.exists(name):
+        register(name)
+        MediaAsset.objects.filter(name=name).update(ref_count=F("ref_count") + 1)
+
+
+def remove_reference(name):
+    """ファイルの参照数を1減らす（ファイルは purge_unreferenced_media で削除する）"""
+    if name:
+        MediaAsset.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=F("ref_count") - 1
+        )
+
+
+def library_assets(extensions=None):
+    """ライブラリ内のファイル（extensions: 拡張子で絞り込む）"""
+    assets = MediaAsset.objects.filter(name__startswith=LIBRARY_DIR + "/")
+    if extensions:
+        condition = Q()
+        for ext in extensions:
+            condition |= Q(name__iendswith=ext)
+        assets = assets.filter(condition)
+    return assets
+
+
+def search(query="", extensions=None, page=1, per_page=PER_PAGE):
+    """ファイル名（アップロード時の名前）で検索して1ページ分を返す（django.core.paginator.Page）"""
+    assets = library_assets(extensions)
+    if query:
+        assets = assets.filter(original_name__icontains=query)
+    return Paginator(assets, per_page).get_page(page)
+
+
+def _walk(directory):
+    """ディレクトリ以下のファイル名をすべて返す（アップロード中の一時ファイルは除く）"""
+    try:
+        dirs, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for f in files:
+        if not f.endswith(".upload"):
+            yield f"{directory}/{f}"
+    for d in dirs:
+        yield from _walk(f"{directory}/{d}")
+
+
+def recount_references():
+    """参照数を各モデルの実際の値から数え直す。修正した件数を返す"""
+    counts = Counter()
+    for model, field_name in REFERENCE_FIELDS:
+        counts.update(
+            model._base_manager.exclude(**{field_name: ""})
+            .exclude(**{f"{field_name}__isnull": True})
+            .values_list(field_name, flat=True)
+        )
+    fixed = []
+    for asset in MediaAsset.objects.only("pk", "name", "ref_count"):
+        if asset.ref_count != counts.get(asset.name, 0):
+            asset.ref_count = counts.get(asset.name, 0)
+            fixed.append(asset)
+    MediaAsset.objects.bulk_update(fixed, ["ref_count"], batch_size=500)
+    return len(fixed)
+
+
+def reconcile(rehash=False):
+    """
+    実際のファイルと索引を同期する
+    ・索引にないファイルを登録、サイズが変わったファイルは再登録（rehash=True なら全件再計算）
+    ・ファイルがなくなった行を削除
+    ・参照数を数え直す
+    戻り値: {"added": n, "updated": n, "removed": n, "recounted": n}
+    """
+    counts = {"added": 0, "updated": 0, "removed": 0}
+    names = {name for directory in upload_dirs() for name in _walk(directory)}
+    indexed = dict(MediaAsset.objects.values_list("name", "size"))
+
+    for name in sorted(names):
+        if name in indexed and not rehash and indexed[name] == default_storage.size(name):
+            continue
+        try:
+            modified = default_storage.get_modified_time(name)
+        except (NotImplementedError, OSError):
+            modified = None
+        register(name, uploaded_at=modified)
+        counts["updated" if name in indexed else "added"] += 1
+
+    removed = [name for name in indexed if name not in names]
+    if removed:
+        counts["removed"], _ = MediaAsset.objects.filter(name__in=removed).delete()
+    counts["recounted"] = recount_references()
+    return counts
+
+
+def purge_unreferenced(older_than_days, dry_run=False):
+    """
+    参照されていないファイルを削除する
+    アップロード直後（まだモデルに保存されていない）ファイルを消さないよう、
+    最後にアップロードされてから older_than_days 日以上経ったものだけが対象
+    """
+    unreferenced = MediaAsset.objects.filter(
+        ref_count=0, uploaded_at__lt=timezone.now() - timedelta(days=older_than_days)
+    )
+    purged = []
+    for asset in unreferenced:
+        if not dry_run:
+            # 確認後に参照・再アップロードされていない場合のみ削除する
+            deleted, _ = unreferenced.filter(pk=asset.pk).delete()
+            if not deleted:
+                continue
+            default_storage.delete(asset.name)
+        purged.append(asset)
+    return purged
+
+
+def describe(asset):
+    """一覧表示・検索APIで返す内容"""
+    return {
+        "value": asset.name,
+        "label": asset.filename,
+        "size": asset.size,
+        "page_count": asset.page_count,
+        "uploaded_at": timezone.localtime(asset.uploaded_at).strftime("%Y/%m/%d %H:%M"),
+    }
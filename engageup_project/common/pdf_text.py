@@ -0,0 +1,81 @@
+"""
+PDF のテキスト抽出（PyMuPDF）とチャンク分割
+
+抽出結果はファイルの SHA-256 ごとに DocumentText へ保存し、同じ教材は二度と解析しない。
+長い教材はページ境界でチャンクに分け、AI生成を並列に行えるようにする。
+"""
+
+import fitz  # type: ignore
+from django.conf import settings
+from django.db import IntegrityError
+
+from main.models import DocumentText
+
+from . import ai_cache, mapped_file
+
+CHUNK_CHARS = getattr(settings, "AI_CHUNK_CHARS", 12000)
+
+
+def extract(fieldfile):
+    """FileField の PDF からテキストを抽出する（抽出済みなら保存済みのものを返す）"""
+    sha256 = ai_cache.file_digest(fieldfile)
+    document = DocumentText.objects.filter(sha256=sha256).first()
+    if document:
+        return document
+
+    parts, offsets, position = [], [], 0
+    # ファイルを mmap して渡す（ファイル全体をワーカーのメモリに読み込まない）
+    with mapped_file.open_mapped(fieldfile) as data, fitz.open(stream=data, filetype="pdf") as pdf:
+        for page in pdf:
+            text = page.get_text("text")
+            offsets.append(position)
+            parts.append(text)
+            position += len(text)
+
+    try:
+        return DocumentText.objects.create(
+            sha256=sha256,
+            text="".join(parts),
+            page_offsets=offsets,
+            page_count=len(offsets),
+        )
+    except IntegrityError:
+        # 同じファイルを別のワーカーが先に保存した
+        return DocumentText.objects.get(sha256=sha256)
+
+
+def chunks(document, max_chars=CHUNK_CHARS):
+    """
+    本文をページ単位でまとめて max_chars 程度のチャンクに分ける
+    1ページが max_chars を超える場合はそのページを文字数で分割する
+    戻り値: [{"pages": (開始ページ, 終了ページ), "text": 本文}, ...]（ページは1始まり）
+    """
+    result = []
+    buffer, first_page = [], None
+    size = 0
+
+    def flush(last_page):
+        nonlocal buffer, first_page, size
+        text = "".join(buffer).strip()
+        if text:
+            result.append({"pages": (first_page, last_page), "text": text})
+        buffer, first_page, size = [], None, 0
+
+    for index in range(document.page_count):
+        page_no = index + 1
+        text = document.page_text(index)
+        if len(text) > max_chars:
+            flush(page_no - 1)
+            for start in range(0, len(text), max_chars):
+                piece = text[start:start + max_chars].strip()
+                if piece:
+                    result.append({"pages": (page_no, page_no), "text": piece})
+            continue
+        if size + len(text) > max_chars and buffer:
+            flush(page_no - 1)
+        if first_page is None:
+            first_page = page_no
+        buffer.append(text)
+        size += len(text)
+    flush(document.page_count)
+    return result
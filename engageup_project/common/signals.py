@@ -0,0 +1,71 @@
+from main.models import BadgeLeaderboard
+
+from . import dashboard_stats, media_library
+
+
+# =========================
+# メディアライブラリの参照数 (MediaAsset.ref_count)
+# =========================
+def _file_fields(sender):
+    return [
+        model._meta.get_field(field_name)
+        for model, field_name in media_library.REFERENCE_FIELDS
+        if model is sender
+    ]
+
+
+def _loaded_name(instance, field):
+    # 遅延読み込み（only/defer）された項目はここで読み込まない（None = 不明）
+    if field.attname not in instance.__dict__:
+        return None
+    value = instance.__dict__[field.attname]
+    return getattr(value, "name", value) or ""
+
+
+def remember_file_names(sender, instance, **kwargs):
+    """読み込んだ時点のファイル名を覚えておく（保存時に差し替えを検出するため）"""
+    instance._loaded_file_names = {
+        field.name: _loaded_name(instance, field) for field in _file_fields(sender)
+    }
+
+
+def count_file_references_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    loaded = getattr(instance, "_loaded_file_names", {})
+    for field in _file_fields(sender):
+        if raw or (update_fields is not None and field.name not in update_fields):
+            continue
+        old = loaded.get(field.name)
+        new = getattr(instance, field.name).name or ""
+        if created:
+            media_library.add_reference(new)
+        elif old is not None and old != new:
+            media_library.add_reference(new)
+            media_library.remove_reference(old)
+        loaded[field.name] = new
+    instance._loaded_file_names = loaded
+
+
+def count_file_references_on_delete(sender, instance, **kwargs):
+    for field in _file_fields(sender):
+        media_library.remove_reference(getattr(instance, field.name).name or "")
+
+
+# =========================
+# ホーム画面の集計のスナップショット (common/dashboard_stats.py)
+# =========================
+def invalidate_dashboard_stats(sender, **kwargs):
+    """研修・コース・検定・お知らせが変わったら全ユーザーの集計を作り直す"""
+    dashboard_stats.invalidate_all()
+
+
+def invalidate_user_dashboard_stats(sender, instance, **kwargs):
+    """進捗・合格が変わったらそのユーザーの集計を作り直す"""
+    dashboard_stats.invalidate_user(instance.user_id)
+
+
+def invalidate_dashboard_stats_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    """ランキングに表示する項目（名前・アイコン）が変わったら作り直す（ログイン日時の更新などは無視）"""
+    if created or (update_fields is not None and not {"username", "avatar"} & set(update_fields)):
+        return
+    if BadgeLeaderboard.objects.filter(user_id=instance.pk).exists():
+        dashboard_stats.invalidate_all()
@@ -0,0 +1,90 @@
+"""
+内容アドレス方式のアップロード用ストレージ（重複排除）
+
+アップロードされたファイルは書き込みながら SHA-256 を計算し
+（InspectingUploadHandler が受信時に計算済みならそれを使い、一時ファイルを移動するだけにする）、
+「upload_to/ハッシュの先頭2文字/ハッシュ.拡張子」に1つだけ保存する。
+同じ内容のファイルを再アップロードした場合はファイルを書かず、既存の保存先を返す（メタデータのみの操作）。
+保存したファイルは MediaAsset に登録し、参照数は各モデルの保存シグナルで数える（common/signals.py）。
+参照されなくなったファイルは purge_unreferenced_media コマンドで削除する。
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def blob_name(name, sha256):
+    """保存先のファイル名（元のファイル名のディレクトリ・拡張子とハッシュから作る）"""
+    directory = os.path.dirname(name)
+    ext = os.path.splitext(name)[1].lower()
+    return os.path.join(directory, sha256[:2], f"{sha256}{ext}").replace("\\", "/")
+
+
+@deconstructible
+class DedupStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # 保存先はハッシュで決まるため、同名ファイルの回避（別名での保存）はしない
+        return name
+
+    def _save(self, name, content):
+        from . import media_library
+
+        sha256 = getattr(content, "sha256", None)
+        if sha256 and hasattr(content, "temporary_file_path"):
+            stored_name = self._move_inspected(name, content, sha256)
+            media_library.record_upload(stored_name, content.size, sha256, os.path.basename(name))
+            return stored_name
+
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+
+        # 一時ファイルに書き込みながらハッシュを計算する（ファイル全体をメモリに読まない）
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+
+            stored_name = blob_name(name, digest.hexdigest())
+            path = self.path(stored_name)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        media_library.record_upload(
+            stored_name, size, digest.hexdigest(), os.path.basename(name)
+        )
+        return stored_name
+
+    def _move_inspected(self, name, content, sha256):
+        """受信時にハッシュ計算済みの一時ファイルを、そのまま保存先へ移動する"""
+        stored_name = blob_name(name, sha256)
+        path = self.path(stored_name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_move_safe(content.temporary_file_path(), path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+        return stored_name
+
+
+dedup_storage = DedupStorage()
@@ -1,3 +1,370 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import fitz  # type: ignore
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main.models import AIJob, DocumentText, Exam, MediaAsset
+
+from . import ai, ai_cache, ai_jobs, mapped_file, media_library, pdf_text, uploads
+from .storage import dedup_storage
+
+
+def succeed(job):
+    return {"created": 1}
+
+
+def fail(job):
+    raise RuntimeError("boom")
+
+
+def fail_permanently(job):
+    raise ai_jobs.PermanentJobError("no file")
+
+
+def requeued_while_running(job):
+    # 生成中にタイムアウトで待機中に戻された（別のワーカーが取り出した）状態を作る
+    ai_jobs.requeue_stale(now=timezone.now() + timedelta(seconds=ai_jobs.STALE_TIMEOUT + 1))
+    ai_jobs.lock_running(job)
+    return {"created": 1}
+
+
+def make_pdf(*pages):
+    with fitz.open() as pdf:
+        for text in pages:
+            pdf.new_page().insert_text((72, 72), text)
+        return pdf.tobytes()
+
+
+class TempMediaMixin:
+    """アップロード先（MEDIA_ROOT）を一時ディレクトリにする"""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+def run_with(handler, job):
+    with mock.patch.dict(ai_jobs.HANDLERS, {job.kind: f"common.tests.{handler}"}):
+        ai_jobs.run_job(job)
+    job.refresh_from_db()
+    return job
+
+
+class AIJobQueueTests(TestCase):
+    """AI生成ジョブの登録・取り出し・タイムアウト・実行結果の保存"""
+
+    def setUp(self):
+        self.exam = Exam.objects.create(title="e")
+
+    def enqueue(self, **params):
+        return ai_jobs.enqueue("exam_questions", params, exam=self.exam)
+
+    def test_enqueue_reuses_active_job_and_rejects_other_params(self):
+        job = self.enqueue(count=5)
+        self.assertEqual(self.enqueue(count=5), job)
+        with self.assertRaises(ai_jobs.JobConflictError):
+            self.enqueue(count=10)
+
+    def test_claim_takes_each_job_once(self):
+        job = self.enqueue()
+        claimed = ai_jobs.claim_next_job()
+        self.assertEqual(claimed, job)
+        self.assertEqual((claimed.status, claimed.attempts), ("running", 1))
+        self.assertIsNone(ai_jobs.claim_next_job())
+
+    def test_stale_jobs_are_requeued_or_failed(self):
+        retried = self.enqueue()
+        ai_jobs.claim_next_job()
+        exhausted = ai_jobs.enqueue("module_content", exam=self.exam)
+        ai_jobs.claim_next_job()
+        AIJob.objects.filter(pk=exhausted.pk).update(attempts=ai_jobs.MAX_ATTEMPTS)
+
+        later = timezone.now() + timedelta(seconds=ai_jobs.STALE_TIMEOUT + 1)
+        self.assertEqual(ai_jobs.requeue_stale(now=timezone.now()), 0)
+        self.assertEqual(ai_jobs.requeue_stale(now=later), 2)
+        retried.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual(retried.status, "pending")
+        self.assertEqual(exhausted.status, "failed")
+
+    def test_run_job_saves_result(self):
+        self.enqueue()
+        job = run_with("succeed", ai_jobs.claim_next_job())
+        self.assertEqual((job.status, job.result), ("succeeded", {"created": 1}))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_job_is_retried_until_permanent_error(self):
+        self.enqueue()
+        job = run_with("fail", ai_jobs.claim_next_job())
+        self.assertEqual((job.status, job.error), ("pending", "boom"))
+        self.assertGreater(job.run_after, timezone.now())
+
+        AIJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = run_with("fail_permanently", ai_jobs.claim_next_job())
+        self.assertEqual(job.status, "failed")
+
+    def test_result_of_requeued_job_is_discarded(self):
+        self.enqueue()
+        job = run_with("requeued_while_running", ai_jobs.claim_next_job())
+        self.assertEqual((job.status, job.result), ("pending", {}))
+
+
+
+class AICacheTests(TestCase):
+    """AI生成結果のディスクキャッシュ（鍵・保存・作り直し・LRU削除）"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(ai_cache, "CACHE_DIR", tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_key_depends_on_every_input(self):
+        key = ai_cache.make_key("sha", 1, "gemini:flash", count=5)
+        self.assertEqual(key, ai_cache.make_key("sha", 1, "gemini:flash", count=5))
+        for other in (
+            ai_cache.make_key("sha2", 1, "gemini:flash", count=5),
+            ai_cache.make_key("sha", 2, "gemini:flash", count=5),
+            ai_cache.make_key("sha", 1, "fake", count=5),
+            ai_cache.make_key("sha", 1, "gemini:flash", count=6),
+        ):
+            self.assertNotEqual(key, other)
+
+    def test_generates_once_and_refreshes_on_request(self):
+        generate = mock.Mock(side_effect=["first", "second"])
+        self.assertEqual(ai_cache.get_or_generate("k", generate), "first")
+        self.assertEqual(ai_cache.get_or_generate("k", generate), "first")
+        self.assertEqual(generate.call_count, 1)
+
+        self.assertEqual(ai_cache.get_or_generate("k", generate, refresh=True), "second")
+        self.assertEqual(ai_cache.get("k"), "second")
+
+    def test_invalid_response_is_not_stored(self):
+        def validate(text):
+            raise ValueError(text)
+
+        with self.assertRaises(ValueError):
+            ai_cache.get_or_generate("k", lambda: "broken", validate=validate)
+        self.assertIsNone(ai_cache.get("k"))
+
+    def test_evicts_least_recently_used(self):
+        for i, key in enumerate(["a1", "b1", "c1"]):
+            ai_cache.store(key, key)
+            os.utime(ai_cache._path(key), (1000 + i, 1000 + i))
+        ai_cache.get("a1")  # 使われた日時が新しくなる
+
+        with mock.patch.object(ai_cache, "MAX_ENTRIES", 2):
+            self.assertEqual(ai_cache.evict(), 1)
+        self.assertIsNone(ai_cache.get("b1"))
+        self.assertEqual(ai_cache.get("a1"), "a1")
+
+
+class PdfTextTests(TempMediaMixin, TestCase):
+    """PDFのテキスト抽出（同じファイルは1回だけ）とページ単位のチャンク分割"""
+
+    def test_extracts_each_file_once(self):
+        exam = Exam.objects.create(
+            title="e", exams_file=ContentFile(make_pdf("first page", "second page"), name="m.pdf")
+        )
+        document = pdf_text.extract(exam.exams_file)
+        self.assertEqual(document.page_count, 2)
+        self.assertIn("second page", document.page_text(1))
+        self.assertNotIn("second page", document.page_text(0))
+
+        with mock.patch.object(pdf_text.fitz, "open") as fitz_open:
+            self.assertEqual(pdf_text.extract(exam.exams_file), document)
+        fitz_open.assert_not_called()
+
+    def test_chunks_group_pages_and_split_long_pages(self):
+        pages = ["a" * 4, "b" * 4, "c" * 12, "d" * 2]
+        offsets = [sum(map(len, pages[:i])) for i in range(len(pages))]
+        document = DocumentText(
+            text="".join(pages), page_offsets=offsets, page_count=len(pages)
+        )
+        chunks = pdf_text.chunks(document, max_chars=10)
+        self.assertEqual(
+            [(c["pages"], c["text"]) for c in chunks],
+            [
+                ((1, 2), "aaaabbbb"),
+                ((3, 3), "c" * 10),
+                ((3, 3), "cc"),
+                ((4, 4), "dd"),
+            ],
+        )
+
+
+@override_settings(AI_PROVIDER="common.ai.fake.FakeProvider", AI_PROVIDER_OPTIONS={"seed": 1})
+class AIProviderTests(TestCase):
+    """設定したプロバイダーを遅延読み込みし、キャッシュの鍵にはその識別子を使う"""
+
+    def setUp(self):
+        ai.reset()
+        self.addCleanup(ai.reset)
+
+    def test_fake_provider_is_deterministic(self):
+        first = ai.generate("prompt", text="t", hints={"kind": "exam_questions", "count": 3})
+        self.assertEqual(
+            first, ai.generate("prompt", text="t", hints={"kind": "exam_questions", "count": 3})
+        )
+        # コードブロックの記号は取り除かれる
+        self.assertEqual(len(json.loads(first)), 3)
+
+        content = json.loads(ai.generate("prompt", hints={"kind": "module_content"}))
+        self.assertEqual(len(content["examples"]), 2)
+
+    def test_identity_changes_with_provider_options(self):
+        identity = ai.identity()
+        self.assertEqual(identity, "common.ai.fake.FakeProvider:seed=1")
+        with self.settings(AI_PROVIDER_OPTIONS={"seed": 2}):
+            ai.reset()
+            self.assertNotEqual(ai.identity(), identity)
+            self.assertNotEqual(
+                ai_cache.make_key("sha", 1, ai.identity()),
+                ai_cache.make_key("sha", 1, identity),
+            )
+
+
+class MediaLibraryTests(TempMediaMixin, TestCase):
+    """アップロード済みファイルの索引（登録・検索・実ファイルとの同期）"""
+
+    def upload(self, name, content):
+        return Exam.objects.create(title=name, exams_file=ContentFile(content, name=name))
+
+    def test_upload_is_indexed_and_searchable(self):
+        exam = self.upload("Guide.pdf", make_pdf("p1", "p2"))
+        self.upload("notes.txt", b"notes")
+        asset = MediaAsset.objects.get(name=exam.exams_file.name)
+        self.assertEqual((asset.original_name, asset.page_count), ("Guide.pdf", 2))
+
+        self.assertEqual([a.name for a in media_library.search("guide")], [asset.name])
+        self.assertEqual(
+            [a.original_name for a in media_library.search(extensions=[".txt"])], ["notes.txt"]
+        )
+
+    def test_reconcile_syncs_index_with_files(self):
+        exam = self.upload("a.txt", b"a")
+        placed = default_storage.save("exams_files/manual.txt", ContentFile(b"manual"))
+        gone = MediaAsset.objects.create(
+            name="exams_files/gone.txt", sha256="x", uploaded_at=timezone.now()
+        )
+        MediaAsset.objects.filter(name=exam.exams_file.name).update(ref_count=5)
+
+        counts = media_library.reconcile()
+        self.assertEqual((counts["added"], counts["removed"]), (1, 1))
+        self.assertTrue(MediaAsset.objects.filter(name=placed).exists())
+        self.assertFalse(MediaAsset.objects.filter(pk=gone.pk).exists())
+        self.assertEqual(MediaAsset.objects.get(name=exam.exams_file.name).ref_count, 1)
+
+
+class DedupStorageTests(TempMediaMixin, TestCase):
+    """同じ内容のファイルは1つだけ保存し、参照数が0になったものだけを削除する"""
+
+    def asset(self, name):
+        return MediaAsset.objects.get(name=name)
+
+    def test_same_content_is_stored_once(self):
+        first = dedup_storage.save("exams_files/a.txt", ContentFile(b"same"))
+        second = dedup_storage.save("exams_files/b.TXT", ContentFile(b"same"))
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith(".txt"))
+        self.assertEqual(MediaAsset.objects.count(), 1)
+        self.assertEqual(len(os.listdir(os.path.dirname(dedup_storage.path(first)))), 1)
+
+    def test_references_follow_model_saves_and_deletes(self):
+        exam1 = Exam.objects.create(title="e1", exams_file=ContentFile(b"v1", name="a.txt"))
+        exam2 = Exam.objects.create(title="e2", exams_file=ContentFile(b"v1", name="b.txt"))
+        v1 = exam1.exams_file.name
+        self.assertEqual(self.asset(v1).ref_count, 2)
+
+        # 読み込み直した行でファイルを差し替えると、古いファイルの参照が減る
+        exam2 = Exam.objects.get(pk=exam2.pk)
+        exam2.exams_file = ContentFile(b"v2", name="b.txt")
+        exam2.save()
+        self.assertEqual(self.asset(v1).ref_count, 1)
+        self.assertEqual(self.asset(exam2.exams_file.name).ref_count, 1)
+
+        # ファイル以外の項目だけの保存では数えない
+        exam1 = Exam.objects.get(pk=exam1.pk)
+        exam1.title = "renamed"
+        exam1.save()
+        self.assertEqual(self.asset(v1).ref_count, 1)
+
+        exam1.delete()
+        self.assertEqual(self.asset(v1).ref_count, 0)
+
+    def test_purge_removes_only_old_unreferenced_files(self):
+        exam = Exam.objects.create(title="e", exams_file=ContentFile(b"kept", name="k.txt"))
+        orphan = dedup_storage.save("exams_files/o.txt", ContentFile(b"orphan"))
+        recent = dedup_storage.save("exams_files/r.txt", ContentFile(b"recent"))
+        MediaAsset.objects.exclude(name=recent).update(
+            uploaded_at=timezone.now() - timedelta(days=8)
+        )
+
+        purged = media_library.purge_unreferenced(7)
+        self.assertEqual([a.name for a in purged], [orphan])
+        self.assertFalse(dedup_storage.exists(orphan))
+        self.assertTrue(dedup_storage.exists(recent))
+        self.assertTrue(dedup_storage.exists(exam.exams_file.name))
+
+
+class UploadInspectionTests(TempMediaMixin, TestCase):
+    """受信しながらのハッシュ計算・種類の判定・サイズ制限"""
+
+    def receive(self, field_name, content, chunk_size=8):
+        handler = uploads.InspectingUploadHandler()
+        handler.new_file(field_name, "upload.bin", "application/octet-stream", len(content))
+        for start in range(0, len(content), chunk_size):
+            handler.receive_data_chunk(content[start:start + chunk_size], start)
+        uploaded = handler.file_complete(len(content))
+        self.addCleanup(uploaded.close)
+        return uploaded
+
+    def test_sniff_detects_types_by_magic_number(self):
+        self.assertEqual(uploads.sniff(b"%PDF-1.7"), "pdf")
+        self.assertEqual(uploads.sniff(b"\x89PNG\r\n\x1a\n"), "png")
+        self.assertEqual(uploads.sniff(b"\x00\x00\x00\x18ftypisom"), "mp4")
+        self.assertEqual(uploads.sniff(b"plain text"), "")
+
+    def test_rejects_wrong_type_and_oversized_files(self):
+        rules = {"exams_file": {"types": ["pdf"], "max_size": 64}}
+        with mock.patch.dict(uploads.UPLOAD_RULES, rules):
+            wrong = self.receive("exams_file", b"not a pdf at all, just text")
+            large = self.receive("exams_file", b"%PDF-" + b"x" * 100)
+            ok = self.receive("exams_file", b"%PDF-1.7 small")
+        for uploaded in (wrong, large):
+            self.assertIsNone(uploaded.sha256)
+            with self.assertRaises(ValidationError):
+                uploads.validate_upload(uploaded)
+        uploads.validate_upload(ok)
+
+    def test_inspected_upload_is_moved_without_rehashing(self):
+        content = b"%PDF-1.7 inspected"
+        uploaded = self.receive("exams_file", content)
+        self.assertEqual(uploaded.sha256, hashlib.sha256(content).hexdigest())
+
+        with mock.patch.object(hashlib, "sha256", side_effect=AssertionError):
+            name = dedup_storage.save("exams_files/upload.pdf", uploaded)
+        self.assertIn(uploaded.sha256, name)
+        self.assertEqual(MediaAsset.objects.get(name=name).sha256, uploaded.sha256)
+
+    def test_open_mapped_reads_file_contents(self):
+        exam = Exam.objects.create(title="e", exams_file=ContentFile(b"mapped", name="m.txt"))
+        with mapped_file.open_mapped(exam.exams_file) as data:
+            self.assertEqual(bytes(data), b"mapped")
+        empty = Exam.objects.create(title="e2", exams_file=ContentFile(b"", name="e.txt"))
+        with mapped_file.open_mapped(empty.exams_file) as data:
+            self.assertEqual(bytes(data), b"")
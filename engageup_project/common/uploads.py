@@ -0,0 +1,113 @@
+"""
+アップロードの受信（ストリーミングで検査）
+
+InspectingUploadHandler は受信したチャンクをそのまま一時ファイルに書きながら、
+・SHA-256 を計算する（重複排除ストレージが再計算せずに使う）
+・サイズの上限を確認する（超えた時点で書き込みをやめる）
+・先頭のバイト列（マジックナンバー）からファイルの種類を判定する
+検査結果は UploadedFile の sha256 / detected_type / upload_error に入り、
+モデルの validate_upload で不正なファイルを拒否する。
+項目ごとの制限は settings.UPLOAD_RULES（項目名 → {"types": [...], "max_size": バイト数}）。
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+UPLOAD_RULES = getattr(settings, "UPLOAD_RULES", {})
+DEFAULT_MAX_SIZE = getattr(settings, "UPLOAD_MAX_SIZE", 100 * 1024 * 1024)
+SNIFF_BYTES = 16
+
+TYPE_LABELS = {
+    "pdf": "PDF",
+    "png": "PNG",
+    "jpeg": "JPEG",
+    "gif": "GIF",
+    "webp": "WebP",
+    "mp4": "MP4",
+    "mov": "MOV",
+    "avi": "AVI",
+}
+
+
+def sniff(head):
+    """先頭のバイト列からファイルの種類を判定する（不明なら ""）"""
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "webp"
+    if head.startswith(b"RIFF") and head[8:12] == b"AVI ":
+        return "avi"
+    if head[4:8] == b"ftyp":
+        return "mov" if head[8:10] == b"qt" else "mp4"
+    if head[4:8] in (b"moov", b"mdat", b"wide", b"free"):
+        return "mov"
+    return ""
+
+
+def _format_size(size):
+    return f"{size / 1024 / 1024:.0f}MB"
+
+
+class InspectingUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        rule = UPLOAD_RULES.get(field_name, {})
+        self.allowed_types = rule.get("types")
+        self.max_size = rule.get("max_size", DEFAULT_MAX_SIZE)
+        self.digest = hashlib.sha256()
+        self.head = b""
+        self.received = 0
+        self.detected_type = None
+        self.upload_error = ""
+
+    def _check_type(self):
+        self.detected_type = sniff(self.head)
+        if self.allowed_types and self.detected_type not in self.allowed_types:
+            labels = "・".join(TYPE_LABELS.get(t, t) for t in self.allowed_types)
+            self.upload_error = f"{labels} 形式のファイルのみアップロードできます。"
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.upload_error:
+            # 不正なファイルの残りは書き込まずに読み捨てる
+            return None
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.upload_error = f"ファイルサイズは {_format_size(self.max_size)} までです。"
+            return None
+        if self.detected_type is None:
+            self.head += raw_data[: SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self._check_type()
+                if self.upload_error:
+                    return None
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.detected_type is None and not self.upload_error:
+            self._check_type()  # SNIFF_BYTES より小さいファイル
+        file = super().file_complete(self.received)
+        file.sha256 = None if self.upload_error else self.digest.hexdigest()
+        file.detected_type = self.detected_type
+        file.upload_error = self.upload_error
+        return file
+
+
+def validate_upload(value):
+    """InspectingUploadHandler が不正と判定したファイルを拒否する（モデルの validators 用）"""
+    # 保存済みのファイル（FieldFile）は検査済みなので開かない
+    if getattr(value, "_committed", False):
+        return
+    uploaded = getattr(value, "_file", value)
+    error = getattr(uploaded, "upload_error", "")
+    if error:
+        raise ValidationError(error)
@@ -1,36 +1,33 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
 from django.urls import reverse_lazy
 from django.views import View
 from django.views.generic import FormView, ListView, UpdateView,CreateView
-from main.models import News, UserExamStatus,User
-from django.core.cache import cache
-from django.db.models import Count, Q
+from main.models import AIJob, BadgeLeaderboard, ProvisioningJob, User
 
 from django.views.generic import TemplateView
 
 from django.core.exceptions import PermissionDenied
 
+from accounts import provisioning
+
+from . import ai_jobs, dashboard_stats, media_library
+
 
 
 class BadgeRankingMixin:
-    """バッジ取得数ランキングのデータを提供するMixin"""
+    """バッジ取得数ランキング（BadgeLeaderboard）のデータを提供するMixin"""
+
+    badge_ranking_limit = 3
+
     def get_badge_ranking_data(self):
-            ranking = cache.get('badge_ranking_list')
-            if not ranking:
-                ranking = User.objects.filter(rank='staff').annotate(
-                    badge_count=Count(
-                        'userexamstatus',
-                        filter=Q(
-                            userexamstatus__is_passed=True,
-                            
-                            userexamstatus__exam__exam_type='main',
-                            userexamstatus__exam__is_active=True
-                        )
-                    )
-                ).order_by('-badge_count')[:3]
-                cache.set('badge_ranking_list', ranking, 3600)
-            return ranking
-        
+        """上位のユーザー（各ユーザーに badge_count を付けて返す）"""
+        ranking = []
+        for row in BadgeLeaderboard.objects.top(self.badge_ranking_limit):
+            row.user.badge_count = row.badge_count
+            ranking.append(row.user)
+        return ranking
+
 
 #共通で返す処理
 class BaseCreateView(CreateView):
@@ -107,50 +104,11 @@ class IndexView(BaseTemplateMixin, BadgeRankingMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
-            # ランキングデータをセット
-            context['badge_ranking'] = self.get_badge_ranking_data()
-            
-            # スタッフなら追加の統計もセット
+            # スタッフはランキングと統計をまとめたスナップショット（キャッシュ）からセット
             if self.request.user.rank == "staff":
-                context['completed_count'] = UserExamStatus.objects.filter(
-                    user=self.request.user, is_passed=True, exam__is_active=True
-                ).count()
-                context['badges_count'] = UserExamStatus.objects.filter(
-                    user=self.request.user, is_passed=True, exam__exam_type='main', exam__is_active=True
-                ).count()
-                context['latest_news'] = News.objects.filter(is_active=True).order_by('-id')[:3]
-
-                # ---  コース完了のカウントロジックを追加 ---
-                from main.models import Course, TrainingModule, UserModuleProgress
-                
-                # 有効なすべてのコースを取得
-                all_courses = Course.objects.filter(is_active=True).prefetch_related('modules')
-                completed_course_count = 0
-
-                for course in all_courses:
-                    # そのコース内の「有効な研修（動画）」のリスト
-                    active_modules = course.modules.filter(is_active=True)
-                    
-                    # 研修が1つも登録されていないコースは計算から除外
-                    if not active_modules.exists():
-                        continue
-                    
-                    # そのユーザーがこのコース内で「完了済み」にした研修の数を数える
-                    user_done_count = UserModuleProgress.objects.filter(
-                        user = self.request.user,
-                        module__course=course,
-                        is_completed=True
-                    ).count()
-
-                    # 「コース内の全研修数」と「ユーザーの完了数」が一致したら1カウント
-                    if active_modules.count() == user_done_count:
-                        completed_course_count += 1
-
-                # HTMLで {{ completed_course_count }} として表示可能
-                context['completed_course_count'] = completed_course_count
-
-                # --- お知らせ ---
-                context['latest_news'] = News.objects.filter(is_active=True).order_by('-id')[:3]
+                context.update(dashboard_stats.get_stats(self.request.user))
+            else:
+                context['badge_ranking'] = self.get_badge_ranking_data()
         return context
 
 from django.shortcuts import redirect
@@ -205,3 +163,38 @@ class AdminRequiredMixin(LoginRequiredCustomMixin):
             return redirect(self.login_url)
 
         return super().dispatch(request, *args, **kwargs)
+
+
+class AIJobStatusView(AdminOrModeratorRequiredMixin, View):
+    """AI生成ジョブの状態（生成画面からポーリングされる）"""
+
+    def get(self, request, job_id):
+        job = get_object_or_404(AIJob, pk=job_id)
+        return JsonResponse({"status": "success", "job": ai_jobs.status_payload(job)})
+
+
+class ProvisioningJobStatusView(AdminOrModeratorRequiredMixin, View):
+    """アカウントの一括作成・パスワード再発行ジョブの進捗（画面からポーリングされる）"""
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ProvisioningJob, pk=job_id)
+        return JsonResponse({"status": "success", "job": provisioning.status_payload(job)})
+
+
+class MediaLibrarySearchView(AdminOrModeratorRequiredMixin, View):
+    """保存済みファイルの検索（フォームの「保存済みから選ぶ」から呼ばれる）"""
+
+    def get(self, request):
+        extensions = [e for e in request.GET.get("ext", "").split(",") if e]
+        page = media_library.search(
+            request.GET.get("q", "").strip(), extensions, request.GET.get("page", 1)
+        )
+        return JsonResponse({
+            "status": "success",
+            "results": [media_library.describe(asset) for asset in page],
+            "page": page.number,
+            "num_pages": page.paginator.num_pages,
+            "count": page.paginator.count,
+            "has_previous": page.has_previous(),
+            "has_next": page.has_next(),
+        })
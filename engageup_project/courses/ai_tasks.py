@@ -0,0 +1,78 @@
+"""
+AI生成ジョブの処理（研修の要約・例題）
+
+common/ai_jobs.py のワーカーから呼ばれる。
+"""
+
+import json
+
+from django.db import transaction
+
+from common import ai, ai_cache, mapped_file
+from common.ai_jobs import PermanentJobError, lock_running
+
+from . import example_bank
+
+
+# プロンプトを変更したら上げる（古いキャッシュを使わないため）
+PROMPT_VERSION = 1
+
+
+def _generate(module, user_req):
+    """研修資料をAIに送り、応答テキスト（JSON部分）を返す"""
+    prompt = f"""
+    資料を読み取り、要約テキストと例題2問を以下のJSON形式で作成してください。
+    要望: {user_req}
+    【出力JSON構造】
+    {{
+      "summary": "{module.estimated_time}分で学習できる分量のHTML要約",
+      "examples": [
+        {{
+          "text": "例題の文章",
+          "explanation": "解説",
+          "choices": [
+            {{"text": "選択肢1", "is_correct": true}},
+            {{"text": "選択肢2", "is_correct": false}},
+            {{"text": "選択肢3", "is_correct": false}},
+            {{"text": "選択肢4", "is_correct": false}}
+          ]
+        }}
+      ]
+    }}
+    """
+    with mapped_file.open_mapped(module.training_file) as file_data:
+        return ai.generate(prompt, pdf_data=file_data, hints={"kind": "module_content"})
+
+
+def _parse(res_text):
+    # 必須項目がない・形式が正しくない応答はエラーにする（キャッシュにも保存しない）
+    return example_bank.validate_content(json.loads(res_text))
+
+
+def generate_module_content(job):
+    """研修資料から要約テキストと例題を生成して保存する"""
+    module = job.module
+    if module is None or not module.training_file:
+        raise PermanentJobError("研修資料が登録されていません。")
+
+    user_req = job.params.get("user_instruction") or "特になし"
+
+    # 同じ資料・同じ条件の生成は前回の応答を使う（APIを呼ばない）
+    key = ai_cache.make_key(
+        ai_cache.file_digest(module.training_file),
+        PROMPT_VERSION,
+        ai.identity(),
+        kind="module_content",
+        estimated_time=module.estimated_time,
+        user_instruction=user_req,
+    )
+    res_text = ai_cache.get_or_generate(
+        key, lambda: _generate(module, user_req), validate=_parse
+    )
+    content = _parse(res_text)
+
+    # タイムアウトで待機中に戻されたジョブは保存しない
+    with transaction.atomic():
+        lock_running(job)
+        example_bank.save_content(module, content)
+    return {"examples": len(content["examples"]), "skipped": len(content["errors"])}
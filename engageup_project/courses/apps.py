@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
+
+    def ready(self):
+        from django.db.models.signals import post_init, post_save, post_delete
+        from main.models import TrainingModule
+        from .signals import invalidate_course_navigation, remember_navigation_course
+
+        post_init.connect(remember_navigation_course, sender=TrainingModule)
+        post_save.connect(invalidate_course_navigation, sender=TrainingModule)
+        post_delete.connect(invalidate_course_navigation, sender=TrainingModule)
@@ -0,0 +1,70 @@
+"""
+研修の要約・例題の一括保存（AI生成）
+
+AIの応答（{"summary": ..., "examples": [...]}）を validate_content() で一度だけ検証・正規化し、
+save_content() で TrainingExample / TrainingExampleChoice を bulk_create でまとめて保存する。
+"""
+
+from django.db import transaction
+
+from common.bulk_import import BATCH_SIZE, bulk_create_parents, normalize_choices
+from main.models import TrainingExample, TrainingExampleChoice
+
+CHOICE_TEXT_MAX_LENGTH = TrainingExampleChoice._meta.get_field("text").max_length
+
+
+def _validate_example(ex):
+    if not isinstance(ex, dict):
+        raise ValueError("例題の形式が正しくありません")
+    text = str(ex.get("text") or "").strip()
+    if not text:
+        raise ValueError("例題文がありません")
+
+    return {
+        "text": text,
+        "explanation": str(ex.get("explanation") or ""),
+        "choices": normalize_choices(ex.get("choices"), CHOICE_TEXT_MAX_LENGTH),
+    }
+
+
+def validate_content(data):
+    """
+    AIの応答を検証・正規化する（要約・例題のリストがなければ ValueError。キャッシュにも保存されない）
+    形式の正しくない例題は読み飛ばし、理由を errors に入れる
+    戻り値: {"summary": 要約HTML, "examples": [正規化した例題, ...], "errors": [エラーメッセージ, ...]}
+    """
+    if not isinstance(data, dict) or "summary" not in data or "examples" not in data:
+        raise ValueError("AIの応答に summary / examples がありません")
+    if not isinstance(data["examples"], list):
+        raise ValueError("examples がリストではありません")
+
+    examples, errors = [], []
+    for number, ex in enumerate(data["examples"], start=1):
+        try:
+            examples.append(_validate_example(ex))
+        except ValueError as e:
+            errors.append(f"{number}問目: {e}")
+    return {"summary": str(data["summary"]), "examples": examples, "errors": errors}
+
+
+def save_content(module, content):
+    """validate_content() 済みの要約・例題で、研修の本文と例題を置き換える"""
+    examples = [
+        TrainingExample(module=module, text=ex["text"], explanation=ex["explanation"])
+        for ex in content["examples"]
+    ]
+    with transaction.atomic():
+        module.content_text = content["summary"]
+        module.save(update_fields=["content_text"])
+        module.examples.all().delete()
+        bulk_create_parents(examples)
+
+        TrainingExampleChoice.objects.bulk_create(
+            [
+                TrainingExampleChoice(example=example, text=ch["text"], is_correct=ch["is_correct"])
+                for example, ex in zip(examples, content["examples"])
+                for ch in ex["choices"]
+            ],
+            batch_size=BATCH_SIZE,
+        )
+    return examples
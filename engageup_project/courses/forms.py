@@ -1,7 +1,7 @@
 import os
 from django import forms
-from django.conf import settings
 from django.forms import inlineformset_factory, BaseInlineFormSet
+from common.forms import MediaAssetField, MediaAssetSelect
 from main.models import Course, TrainingModule, TrainingExample, TrainingExampleChoice
 
 # 1. コース（科目）作成・編集用
@@ -28,12 +28,13 @@ class TrainingModuleForm(forms.ModelForm):
         })
     )
     
-    existing_file = forms.ChoiceField(
-        choices=[], 
-        required=False, 
+    # 保存済みファイルはメディアライブラリの索引から検索して選ぶ
+    existing_file = MediaAssetField(
         label="保存済みライブラリから選ぶ",
-
-        widget=forms.Select(attrs={'class': 'form-select'}))
+        extensions=('.pdf', '.jpg', '.jpeg', '.png'),
+        widget=MediaAssetSelect(
+            attrs={'class': 'form-select'}, empty_label='--- 新しくアップロードする ---'
+        ))
         #テキストをpdfのみに制限をかける
 
     training_file = forms.FileField(
@@ -81,15 +82,13 @@ class TrainingModuleForm(forms.ModelForm):
                 raise forms.ValidationError("教材資料はPDFファイルのみアップロード可能です。")
         return file
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        library_path = os.path.join(settings.MEDIA_ROOT, 'exams_files')
-        file_choices = [('', '--- 新しくアップロードする ---')]
-        if os.path.exists(library_path):
-            files = [f for f in os.listdir(library_path) if f.endswith(('.pdf', '.jpg', '.jpeg', '.png'))]
-            for f in files:
-                file_choices.append((f, f))
-        self.fields['existing_file'].choices = file_choices
+    def save(self, commit=True):
+        # 動画が差し替えられたらHLS変換をやり直す（変換が終わるまでは元の動画で配信）
+        if "video" in self.changed_data:
+            self.instance.video_status = "pending" if self.instance.video else "none"
+            self.instance.hls_playlist = ""
+            self.instance.video_error = ""
+        return super().save(commit)
 
 # 3. 研修内の「例題」作成用
 class TrainingExampleForm(forms.ModelForm):
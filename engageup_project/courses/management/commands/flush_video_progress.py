@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import video_progress
+
+
+class Command(BaseCommand):
+    help = "キャッシュにバッファされた動画の再生位置をまとめてDBへ書き込みます"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="終了せずに定期的に書き込みを続ける"
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=video_progress.FLUSH_INTERVAL,
+            help="--loop 時の書き込み間隔（秒）",
+        )
+
+    def handle(self, *args, **options):
+        if not video_progress.uses_shared_cache():
+            raise CommandError(
+                "共有キャッシュ（Redis 等）が設定されていないため、再生位置はバッファされずに"
+                "直接DBへ書き込まれています（このコマンドは不要です）"
+            )
+        while True:
+            count = video_progress.flush()
+            self.stdout.write(f"{count} 件の再生位置を書き込みました")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
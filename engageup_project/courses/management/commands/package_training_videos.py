@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses import packaging
+from main.models import TrainingModule
+
+
+class Command(BaseCommand):
+    help = "変換待ちの研修動画を ffmpeg で HLS（マルチビットレート）とサムネイルに変換します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="終了せずに変換待ちの動画を監視し続ける"
+        )
+        parser.add_argument(
+            "--interval", type=int, default=10, help="--loop 時の確認間隔（秒）"
+        )
+        parser.add_argument(
+            "--enqueue-existing",
+            action="store_true",
+            help="まだ変換していない既存の動画をすべて変換待ちにする",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue_existing"]:
+            count = (
+                TrainingModule.objects.filter(video_status="none")
+                .exclude(video="")
+                .exclude(video__isnull=True)
+                .update(video_status="pending")
+            )
+            self.stdout.write(f"{count} 件の動画を変換待ちにしました")
+
+        while True:
+            requeued = packaging.requeue_stale()
+            if requeued:
+                self.stdout.write(f"{requeued} 件の変換が止まっていたため変換待ちに戻しました")
+            module = packaging.claim_next_module()
+            if module is None:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            self.stdout.write(f"変換開始: {module.pk} {module.title}")
+            if packaging.package_module(module):
+                self.stdout.write(self.style.SUCCESS(f"変換完了: {module.pk}"))
+            else:
+                module.refresh_from_db()
+                self.stdout.write(
+                    self.style.ERROR(f"変換失敗: {module.pk} {module.video_error}")
+                )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main.models import UserCourseProgress
+
+
+class Command(BaseCommand):
+    help = "UserModuleProgress からコース進捗サマリー (UserCourseProgress) を再構築します"
+
+    def handle(self, *args, **options):
+        count = UserCourseProgress.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{count} 件のコース進捗を再構築しました"))
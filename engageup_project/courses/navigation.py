@@ -0,0 +1,70 @@
+"""
+コースごとの研修ナビゲーション（前の研修・次の研修）のインデックス
+
+有効な研修を TrainingModule.order → id 順に並べた結果をキャッシュに保持し、
+前後の研修を O(1) で引けるようにする。
+研修の追加・並べ替え・表示切替・削除のたびにバージョンを上げて無効化する。
+無効化は全プロセスに届く必要があるため、キャッシュは共有キャッシュの場合だけ使い、
+それ以外（LocMemCache 等）では毎回1クエリで作る。
+"""
+
+from django.core.cache import cache
+
+from common import cache_backends
+from main.models import TrainingModule
+
+NAV_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(course_id):
+    return f"course_nav_version:{course_id}"
+
+
+def _get_version(course_id):
+    return cache.get_or_set(_version_key(course_id), 1, None)
+
+
+def invalidate(course_id):
+    """バージョンを上げて古いインデックスを参照されないようにする"""
+    if not cache_backends.is_shared():
+        return
+    try:
+        cache.incr(_version_key(course_id))
+    except ValueError:
+        cache.add(_version_key(course_id), 1, None)
+
+
+def build_index(course_id):
+    rows = list(
+        TrainingModule.objects.filter(course_id=course_id, is_active=True)
+        .order_by("order", "id")
+        .values_list("id", "title")
+    )
+    entries = [{"id": module_id, "title": title} for module_id, title in rows]
+    index = {}
+    for i, entry in enumerate(entries):
+        index[entry["id"]] = {
+            "position": i,
+            "prev": entries[i - 1] if i > 0 else None,
+            "next": entries[i + 1] if i < len(entries) - 1 else None,
+        }
+    return {"ids": [entry["id"] for entry in entries], "index": index}
+
+
+def get_index(course_id):
+    if not cache_backends.is_shared():
+        return build_index(course_id)
+    key = f"course_nav:{course_id}:{_get_version(course_id)}"
+    nav = cache.get(key)
+    if nav is None:
+        nav = build_index(course_id)
+        cache.set(key, nav, NAV_TIMEOUT)
+    return nav
+
+
+def get_neighbors(course_id, module_id):
+    """(前の研修, 次の研修) を {"id", "title"} の辞書で返す（なければ None）"""
+    entry = get_index(course_id)["index"].get(module_id)
+    if entry is None:
+        return None, None
+    return entry["prev"], entry["next"]
@@ -0,0 +1,197 @@
+"""
+研修動画のHLS変換（マルチビットレート）
+
+アップロードされた TrainingModule.video をローカルの ffmpeg で
+複数画質の HLS セグメントとサムネイル画像に変換する。
+変換が終わるまでは元の動画ファイルをそのまま配信する（courses/streaming.py）。
+ワーカーが落ちて processing のまま残った研修は HLS_STALE_TIMEOUT 秒後に変換待ちに戻す。
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from main.models import TrainingModule
+
+FFMPEG_BINARY = getattr(settings, "FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = getattr(settings, "FFPROBE_BINARY", "ffprobe")
+# (高さ, 映像ビットレート kbps)
+HLS_RENDITIONS = getattr(
+    settings, "HLS_RENDITIONS", [(360, 800), (720, 2800), (1080, 5000)]
+)
+HLS_SEGMENT_SECONDS = getattr(settings, "HLS_SEGMENT_SECONDS", 6)
+HLS_STALE_TIMEOUT = getattr(settings, "HLS_STALE_TIMEOUT", 3600)
+AUDIO_BITRATE = 128
+
+HLS_DIR = "training_hls"
+THUMBNAIL_DIR = "training_thumbnails"
+
+
+class PackagingError(Exception):
+    pass
+
+
+def _run(cmd):
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise PackagingError(result.stderr.strip()[-2000:] or "ffmpeg の実行に失敗しました")
+    return result.stdout
+
+
+def probe_size(source):
+    """元動画の (幅, 高さ) を返す。ffprobe が使えない場合は (None, None)"""
+    if not shutil.which(FFPROBE_BINARY):
+        return None, None
+    output = _run([
+        FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height", "-of", "json", source,
+    ])
+    streams = json.loads(output).get("streams") or [{}]
+    return streams[0].get("width"), streams[0].get("height")
+
+
+def select_renditions(source_height):
+    """元動画より高い画質は作らない（最低1つは作る）"""
+    if not source_height:
+        return list(HLS_RENDITIONS)
+    renditions = [r for r in HLS_RENDITIONS if r[0] <= source_height]
+    return renditions or [min(HLS_RENDITIONS)]
+
+
+def build_master_playlist(renditions, source_width, source_height):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for height, kbps in renditions:
+        attrs = f"BANDWIDTH={(kbps + AUDIO_BITRATE) * 1000}"
+        if source_width and source_height:
+            width = int(round(source_width * height / source_height / 2)) * 2
+            attrs += f",RESOLUTION={width}x{height}"
+        lines.append(f"#EXT-X-STREAM-INF:{attrs}")
+        lines.append(f"{height}p/index.m3u8")
+    return "\n".join(lines) + "\n"
+
+
+def encode_rendition(source, out_dir, height, kbps):
+    os.makedirs(out_dir, exist_ok=True)
+    _run([
+        FFMPEG_BINARY, "-y", "-i", source,
+        "-vf", f"scale=-2:{height}",
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main",
+        "-b:v", f"{kbps}k", "-maxrate", f"{int(kbps * 1.07)}k", "-bufsize", f"{kbps * 2}k",
+        "-g", str(HLS_SEGMENT_SECONDS * 30), "-sc_threshold", "0",
+        "-c:a", "aac", "-b:a", f"{AUDIO_BITRATE}k", "-ac", "2",
+        "-hls_time", str(HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, "seg_%05d.ts"),
+        os.path.join(out_dir, "index.m3u8"),
+    ])
+
+
+def extract_poster(source, dest):
+    """動画の1秒目をサムネイル画像として書き出す（短い動画は先頭フレーム）"""
+    for offset in ("1", "0"):
+        try:
+            _run([
+                FFMPEG_BINARY, "-y", "-ss", offset, "-i", source,
+                "-frames:v", "1", "-vf", "scale=1280:-2", dest,
+            ])
+        except PackagingError:
+            continue
+        if os.path.exists(dest) and os.path.getsize(dest) > 0:
+            return True
+    return False
+
+
+def package_module(module):
+    """
+    1つの研修動画を HLS に変換する
+    成功すると video_status="ready"、失敗すると "failed"（元動画での配信を継続）
+    """
+    if not module.video:
+        TrainingModule.objects.filter(pk=module.pk).update(video_status="none")
+        return False
+
+    try:
+        if not shutil.which(FFMPEG_BINARY):
+            raise PackagingError(f"ffmpeg が見つかりません: {FFMPEG_BINARY}")
+
+        source = module.video.path
+        width, height = probe_size(source)
+        renditions = select_renditions(height)
+
+        media_root = str(settings.MEDIA_ROOT)
+        final_dir = os.path.join(media_root, HLS_DIR, str(module.pk))
+        os.makedirs(os.path.join(media_root, HLS_DIR), exist_ok=True)
+        work_dir = tempfile.mkdtemp(dir=os.path.join(media_root, HLS_DIR))
+        try:
+            for rend_height, kbps in renditions:
+                encode_rendition(
+                    source, os.path.join(work_dir, f"{rend_height}p"), rend_height, kbps
+                )
+            with open(os.path.join(work_dir, "master.m3u8"), "w") as f:
+                f.write(build_master_playlist(renditions, width, height))
+
+            # 完成したものだけを差し替える（再生中の古いセグメントは短時間で不要になる）
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.replace(work_dir, final_dir)
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        thumbnail_name = f"{THUMBNAIL_DIR}/{module.pk}.jpg"
+        os.makedirs(os.path.join(media_root, THUMBNAIL_DIR), exist_ok=True)
+        if extract_poster(source, os.path.join(media_root, thumbnail_name)):
+            module.thumbnail.name = thumbnail_name
+
+        module.hls_playlist = f"{HLS_DIR}/{module.pk}/master.m3u8"
+        module.video_status = "ready"
+        module.video_error = ""
+    except Exception as e:
+        module.video_status = "failed"
+        module.video_error = str(e)
+
+    # 変換中に別の動画がアップロードされた・タイムアウトで別のワーカーに渡った場合は結果を捨てる
+    updated = TrainingModule.objects.filter(
+        pk=module.pk,
+        video=module.video.name,
+        video_status="processing",
+        processing_started_at=module.processing_started_at,
+    ).update(
+        video_status=module.video_status,
+        video_error=module.video_error,
+        hls_playlist=module.hls_playlist,
+        thumbnail=module.thumbnail.name or "",
+        processing_started_at=None,
+    )
+    return bool(updated) and module.video_status == "ready"
+
+
+def requeue_stale(now=None):
+    """一定時間以上 processing のままの研修を変換待ちに戻す"""
+    now = now or timezone.now()
+    # 開始日時のない行は、開始日時を記録する前のワーカーが取り出したもの
+    return TrainingModule.objects.filter(
+        Q(processing_started_at__lt=now - timedelta(seconds=HLS_STALE_TIMEOUT))
+        | Q(processing_started_at__isnull=True),
+        video_status="processing",
+    ).update(video_status="pending", processing_started_at=None)
+
+
+def claim_next_module(now=None):
+    """変換待ちの研修を1件取り出して processing にする（複数ワーカーでも重複しない）"""
+    now = now or timezone.now()
+    for module in TrainingModule.objects.filter(video_status="pending").order_by("id")[:10]:
+        claimed = TrainingModule.objects.filter(
+            pk=module.pk, video_status="pending"
+        ).update(video_status="processing", processing_started_at=now)
+        if claimed:
+            module.video_status = "processing"
+            module.processing_started_at = now
+            return module
+    return None
@@ -0,0 +1,74 @@
+"""
+コース進捗の集計サービス
+
+コースごとに UserModuleProgress を count() するループを置き換え、
+「有効な研修数・完了数・進捗率」を1回のクエリ（相関サブクエリ）でまとめて取得する。
+"""
+
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from main.models import Course, TrainingModule, UserModuleProgress
+
+
+def _count_subquery(queryset, course_field):
+    """コース（OuterRef）で絞り込んだクエリセットの件数を返すサブクエリ（0件なら 0）"""
+    counted = (
+        queryset.order_by()
+        .values(course_field)
+        .annotate(c=Count("pk"))
+        .values("c")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def annotate_progress(queryset, user):
+    """
+    Course のクエリセットに以下を annotate して返す
+      - total_active     : 有効な研修数
+      - done_count       : ユーザーが完了した有効な研修数
+      - progress_percent : 進捗率（0〜100 の整数）
+    どちらもコースごとの相関サブクエリで数える
+    （全受講者の進捗を JOIN してから絞り込むと、受講者数に比例して重くなるため）
+    """
+    total_active = _count_subquery(
+        TrainingModule.objects.filter(course=OuterRef("pk"), is_active=True), "course"
+    )
+    done_count = _count_subquery(
+        UserModuleProgress.objects.filter(
+            user=user,
+            is_completed=True,
+            module__course=OuterRef("pk"),
+            module__is_active=True,
+        ),
+        "module__course",
+    )
+    return queryset.annotate(
+        total_active=total_active, done_count=done_count
+    ).annotate(
+        progress_percent=Case(
+            When(
+                total_active__gt=0,
+                then=Cast(F("done_count") * 100 / F("total_active"), IntegerField()),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def get_progress_map(user, course_ids):
+    """
+    {course_id: {"total_active", "done_count", "progress_percent"}} を1クエリで返す
+    """
+    rows = annotate_progress(
+        Course.objects.filter(id__in=course_ids), user
+    ).values("id", "total_active", "done_count", "progress_percent")
+    return {
+        row["id"]: {
+            "total_active": row["total_active"],
+            "done_count": row["done_count"],
+            "progress_percent": row["progress_percent"],
+        }
+        for row in rows
+    }
@@ -0,0 +1,21 @@
+from main.signals import _loaded_values
+
+from . import navigation
+
+
+def remember_navigation_course(sender, instance, **kwargs):
+    """読み込んだ時点のコースを覚えておく（別のコースへの移動を検出するため）"""
+    loaded = _loaded_values(instance, ["course_id"])
+    instance._loaded_nav_course_id = loaded[0] if loaded else None
+
+
+def invalidate_course_navigation(sender, instance, **kwargs):
+    """
+    研修の追加・並べ替え・表示切替・削除時に前後ナビゲーションを作り直す
+    別のコースへ移動した場合は、移動元のコースも作り直す
+    """
+    navigation.invalidate(instance.course_id)
+    loaded = getattr(instance, "_loaded_nav_course_id", None)
+    if loaded is not None and loaded != instance.course_id:
+        navigation.invalidate(loaded)
+    instance._loaded_nav_course_id = instance.course_id
@@ -0,0 +1,155 @@
+"""
+研修動画の配信（HTTP Range 対応）
+
+・Range リクエストには 206 Partial Content で必要な範囲だけを返す
+・ETag / Last-Modified による条件付きリクエスト（304）に対応
+・ファイルは固定サイズのバッファで少しずつ読み出すため、ワーカーのメモリ使用量は一定
+・設定により X-Accel-Redirect (nginx) / X-Sendfile (Apache) でWebサーバーに配信を任せる
+"""
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+STREAM_CHUNK_SIZE = getattr(settings, "VIDEO_STREAM_CHUNK_SIZE", 64 * 1024)
+STREAM_OFFLOAD = getattr(settings, "VIDEO_STREAM_OFFLOAD", None)
+ACCEL_REDIRECT_PREFIX = getattr(settings, "VIDEO_STREAM_ACCEL_PREFIX", "/protected-media/")
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# HLS のプレイリスト・セグメント
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/mp2t", ".ts")
+
+
+class RangeFileWrapper:
+    """ファイルの start〜end（両端含む）だけを固定サイズずつ読み出すラッパー"""
+
+    def __init__(self, filelike, start, end, chunk_size=STREAM_CHUNK_SIZE):
+        self.filelike = filelike
+        self.remaining = end - start + 1
+        self.chunk_size = chunk_size
+        self.filelike.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0:
+            size = self.chunk_size
+        data = self.filelike.read(min(size, self.chunk_size, self.remaining))
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.filelike.close()
+
+
+def parse_range(header, size):
+    """
+    Range ヘッダーを (start, end) に変換する
+    ・ヘッダーなし／解釈できない／複数範囲 → None（全体を返す）
+    ・満たせない範囲 → ValueError（416 を返す）
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if start == "" and end == "":
+        return None
+    if start == "":
+        # bytes=-500 → 末尾500バイト
+        length = int(end)
+        if length == 0:
+            raise ValueError("unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def make_etag(stat):
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def is_not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return since is not None and int(mtime) <= since
+
+
+def if_range_matches(request, etag, mtime):
+    """If-Range が現在のファイルと一致する場合のみ Range を有効にする"""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def serve_file(request, fieldfile):
+    """FileField のファイルを Range 対応で返す"""
+    return serve_path(request, fieldfile.path, fieldfile.name)
+
+
+def serve_path(request, path, name):
+    """
+    MEDIA_ROOT 配下のファイルを Range 対応で返す
+    name: MEDIA_ROOT からの相対パス（X-Accel-Redirect 用）
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = make_etag(stat)
+    last_modified = http_date(stat.st_mtime)
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if is_not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        response["Last-Modified"] = last_modified
+        return response
+
+    if STREAM_OFFLOAD in ("nginx", "sendfile"):
+        # 実際の配信（Range 処理を含む）はWebサーバーに任せる
+        response = HttpResponse(content_type=content_type)
+        if STREAM_OFFLOAD == "nginx":
+            response["X-Accel-Redirect"] = ACCEL_REDIRECT_PREFIX + name
+        else:
+            response["X-Sendfile"] = path
+    else:
+        try:
+            byte_range = (
+                parse_range(request.headers.get("Range"), size)
+                if if_range_matches(request, etag, stat.st_mtime)
+                else None
+            )
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        start, end = byte_range if byte_range else (0, size - 1)
+        wrapper = RangeFileWrapper(open(path, "rb"), start, end)
+        response = FileResponse(wrapper, content_type=content_type)
+        response.block_size = STREAM_CHUNK_SIZE
+        response["Content-Length"] = str(end - start + 1 if size else 0)
+        if byte_range:
+            response.status_code = 206
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = last_modified
+    response["Cache-Control"] = "private, max-age=3600"
+    return response
@@ -1,3 +1,296 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+from django.utils import timezone
+
+from common.views import IndexView
+from common import cache_backends
+from courses import example_bank, navigation, packaging, video_progress
+from courses.progress import annotate_progress, get_progress_map
+from courses.views import StaffCourseListView
+from main.models import Course, Mylist, News, TrainingModule, User, UserCourseProgress, UserModuleProgress
+from mylist.views import MylistIndexView
+from staff.views import StaffIndexView
+
+
+class CourseProgressQueryCountTests(TestCase):
+    """コース数に関わらず進捗計算のクエリ数が一定であることを確認する"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="staff1", email="staff1@example.com", password="pass", rank="staff"
+        )
+        self.factory = RequestFactory()
+        cache.clear()
+
+    def create_courses(self, count):
+        for i in range(count):
+            course = Course.objects.create(subject=f"course{i}")
+            modules = [
+                TrainingModule.objects.create(course=course, title=f"m{i}-{j}")
+                for j in range(4)
+            ]
+            TrainingModule.objects.create(course=course, title="hidden", is_active=False)
+            UserModuleProgress.objects.create(
+                user=self.user, module=modules[0], is_completed=True
+            )
+            Mylist.objects.create(user=self.user, course=course)
+
+    def get_request(self):
+        request = self.factory.get("/")
+        request.user = self.user
+        return request
+
+    def get_context(self, view_class):
+        view = view_class()
+        view.setup(self.get_request())
+        if hasattr(view, "get_queryset"):
+            view.object_list = view.get_queryset()
+        return view.get_context_data()
+
+    def test_annotate_progress_values(self):
+        self.create_courses(1)
+        course = annotate_progress(Course.objects.all(), self.user).get()
+        self.assertEqual(course.total_active, 4)
+        self.assertEqual(course.done_count, 1)
+        self.assertEqual(course.progress_percent, 25)
+
+    def test_moving_a_module_refreshes_both_courses(self):
+        self.create_courses(2)
+        source, target = Course.objects.order_by("id")
+        module = TrainingModule.objects.filter(
+            course=source, usermoduleprogress__user=self.user
+        ).get()
+
+        # タイトルだけの変更では再計算しない
+        module.title = "renamed"
+        with self.assertNumQueries(1):
+            module.save()
+        # 再生位置だけの変更でも再計算しない
+        progress = UserModuleProgress.objects.get(module=module)
+        progress.last_position = 30.0
+        with self.assertNumQueries(1):
+            progress.save()
+
+        module.course = target
+        module.save()
+        summaries = {
+            row.course_id: row for row in UserCourseProgress.objects.filter(user=self.user)
+        }
+        self.assertEqual((summaries[source.id].done_count, summaries[source.id].total_active), (0, 3))
+        self.assertEqual((summaries[target.id].done_count, summaries[target.id].total_active), (2, 5))
+
+    def test_progress_map_is_single_query(self):
+        self.create_courses(3)
+        first_id = Course.objects.values_list("id", flat=True).first()
+        with self.assertNumQueries(1):
+            small = get_progress_map(self.user, [first_id])
+        self.create_courses(20)
+        with self.assertNumQueries(1):
+            large = get_progress_map(self.user, Course.objects.values_list("id", flat=True))
+        self.assertEqual(len(small), 1)
+        self.assertEqual(len(large), 23)
+
+    def test_staff_course_list_query_count_is_constant(self):
+        self.create_courses(2)
+        with self.assertNumQueries(4):
+            context = self.get_context(StaffCourseListView)
+            list(context["courses"])
+        self.create_courses(30)
+        with self.assertNumQueries(4):
+            context = self.get_context(StaffCourseListView)
+            courses = list(context["courses"])
+        self.assertTrue(all(course.progress_percent == 25 for course in courses))
+
+    def test_mylist_query_count_is_constant(self):
+        self.create_courses(2)
+        with self.assertNumQueries(4):
+            self.get_context(MylistIndexView)
+        self.create_courses(30)
+        with self.assertNumQueries(4):
+            context = self.get_context(MylistIndexView)
+        self.assertTrue(
+            all(item.course.progress_percent == 25 for item in context["my_favorites"])
+        )
+
+    def test_dashboard_query_count_is_constant(self):
+        # ランキング（BadgeLeaderboard）は上位・自分の順位ともに件数によらず一定
+        # （バッジのないユーザーは順位の集計を省くため、自分の順位は1クエリ）
+        self.create_courses(2)
+        with self.assertNumQueries(5):
+            self.get_context(IndexView)
+        with self.assertNumQueries(5):
+            self.get_context(StaffIndexView)
+        self.create_courses(30)
+        with self.assertNumQueries(5):
+            self.get_context(IndexView)
+        with self.assertNumQueries(5):
+            self.get_context(StaffIndexView)
+
+    @override_settings(DASHBOARD_STATS_SNAPSHOT=True)
+    def test_dashboard_stats_are_cached_until_invalidated(self):
+        # 2回目以降はスナップショット（キャッシュ）から表示し、DBに問い合わせない
+        self.create_courses(2)
+        self.get_context(StaffIndexView)
+        with self.assertNumQueries(0):
+            context = self.get_context(StaffIndexView)
+        self.assertEqual(context["latest_news"], [])
+
+        # お知らせが追加されたら作り直す
+        News.objects.create(title="news", content="body")
+        with self.assertNumQueries(5):
+            context = self.get_context(IndexView)
+        self.assertEqual([n.title for n in context["latest_news"]], ["news"])
+
+        # 研修を完了してコースが完了したらそのユーザーの分を作り直す
+        for module in TrainingModule.objects.filter(course__subject="course0", is_active=True):
+            UserModuleProgress.objects.update_or_create(
+                user=self.user, module=module, defaults={"is_completed": True}
+            )
+        context = self.get_context(StaffIndexView)
+        self.assertEqual(context["completed_course_count"], 1)
+
+
+class VideoProgressBufferTests(TestCase):
+    """再生位置のバッファは共有キャッシュの場合だけ使い、それ以外は直接DBへ書き込む"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="viewer", email="viewer@example.com", password="pass", rank="staff"
+        )
+        self.module = TrainingModule.objects.create(
+            course=Course.objects.create(subject="c"), title="m"
+        )
+
+    def position(self):
+        return (
+            UserModuleProgress.objects.filter(user=self.user, module=self.module)
+            .values_list("last_position", flat=True)
+            .first()
+        )
+
+    def test_local_cache_writes_through(self):
+        video_progress.buffer_positions(self.user.pk, {self.module.pk: 12})
+        self.assertEqual(self.position(), 12.0)
+        self.assertIsNone(video_progress.get_buffered_position(self.user.pk, self.module.pk))
+        self.assertEqual(video_progress.flush(), 0)
+
+    @mock.patch.object(video_progress, "uses_shared_cache", return_value=True)
+    def test_shared_cache_buffers_until_flush(self, _):
+        video_progress.buffer_positions(self.user.pk, {self.module.pk: 12})
+        video_progress.buffer_positions(self.user.pk, {self.module.pk: 20})
+        self.assertIsNone(self.position())
+        self.assertEqual(video_progress.flush(), 1)
+        self.assertEqual(self.position(), 20.0)
+
+    @mock.patch.object(video_progress, "uses_shared_cache", return_value=True)
+    def test_position_is_written_directly_when_lock_is_busy(self, _):
+        cache.add(video_progress.LOCK_KEY, 1, 60)
+        with mock.patch.object(video_progress.time, "sleep"):
+            video_progress.buffer_positions(self.user.pk, {self.module.pk: 7})
+        self.assertEqual(self.position(), 7.0)
+        self.assertIsNone(cache.get(video_progress.PENDING_KEY))
+
+
+class PackagingQueueTests(TestCase):
+    """変換中のまま止まった研修は一定時間後に変換待ちに戻る"""
+
+    def test_stale_processing_module_is_requeued(self):
+        module = TrainingModule.objects.create(
+            course=Course.objects.create(subject="c"), title="m", video_status="pending"
+        )
+        started = timezone.now()
+        self.assertEqual(packaging.claim_next_module(now=started).pk, module.pk)
+        self.assertIsNone(packaging.claim_next_module(now=started))
+
+        self.assertEqual(packaging.requeue_stale(now=started), 0)
+        later = started + timedelta(seconds=packaging.HLS_STALE_TIMEOUT + 1)
+        self.assertEqual(packaging.requeue_stale(now=later), 1)
+        module.refresh_from_db()
+        self.assertEqual((module.video_status, module.processing_started_at), ("pending", None))
+
+
+@mock.patch.object(cache_backends, "is_shared", return_value=True)
+class CourseNavigationTests(TestCase):
+    """前後ナビゲーションは並べ替え・コースの移動で作り直される"""
+
+    def setUp(self):
+        cache.clear()
+        self.source = Course.objects.create(subject="source")
+        self.target = Course.objects.create(subject="target")
+        self.modules = [
+            TrainingModule.objects.create(course=self.source, title=f"m{i}", order=i)
+            for i in range(3)
+        ]
+
+    def neighbor_ids(self, course, module):
+        return tuple(
+            entry and entry["id"] for entry in navigation.get_neighbors(course.pk, module.pk)
+        )
+
+    def test_reordering_rebuilds_the_index(self, _):
+        first, second, third = self.modules
+        self.assertEqual(self.neighbor_ids(self.source, second), (first.pk, third.pk))
+        with self.assertNumQueries(0):
+            navigation.get_index(self.source.pk)
+
+        third.order = -1
+        third.save()
+        self.assertEqual(self.neighbor_ids(self.source, first), (third.pk, second.pk))
+
+    def test_moving_a_module_rebuilds_both_courses(self, _):
+        first, second, third = self.modules
+        self.assertEqual(self.neighbor_ids(self.source, first), (None, second.pk))
+        navigation.get_index(self.target.pk)
+
+        module = TrainingModule.objects.get(pk=second.pk)
+        module.course = self.target
+        module.save()
+        self.assertEqual(self.neighbor_ids(self.source, first), (None, third.pk))
+        self.assertEqual(navigation.get_index(self.target.pk)["ids"], [second.pk])
+
+    def test_local_cache_builds_the_index_every_time(self, is_shared):
+        is_shared.return_value = False
+        navigation.get_index(self.source.pk)
+        with self.assertNumQueries(1):
+            navigation.get_index(self.source.pk)
+
+
+class ExampleBankTests(TestCase):
+    """AIが生成した要約・例題の検証と置き換え"""
+
+    CONTENT = {
+        "summary": "<p>summary</p>",
+        "examples": [
+            {"text": "ex1", "explanation": "why", "choices": [
+                {"text": "a", "is_correct": True}, {"text": "b", "is_correct": False},
+            ]},
+            {"text": "", "choices": []},
+        ],
+    }
+
+    def setUp(self):
+        course = Course.objects.create(subject="c")
+        self.module = TrainingModule.objects.create(course=course, title="m")
+
+    def test_response_without_summary_is_rejected(self):
+        with self.assertRaises(ValueError):
+            example_bank.validate_content({"examples": []})
+
+    def test_save_content_replaces_examples(self):
+        content = example_bank.validate_content(self.CONTENT)
+        self.assertEqual(len(content["examples"]), 1)
+        self.assertEqual(len(content["errors"]), 1)
+
+        example_bank.save_content(self.module, content)
+        example_bank.save_content(self.module, content)
+        self.module.refresh_from_db()
+        self.assertEqual(self.module.content_text, "<p>summary</p>")
+        example = self.module.examples.get()
+        self.assertEqual(
+            list(example.choices.order_by("id").values_list("text", "is_correct")),
+            [("a", True), ("b", False)],
+        )
@@ -46,11 +46,26 @@ urlpatterns = [
         views.StaffTrainingDetailView.as_view(),
         name="training_detail",
     ),
+    path(
+        "staff/training/<int:module_id>/video/",
+        views.TrainingVideoStreamView.as_view(),
+        name="training_video",
+    ),
+    path(
+        "staff/training/<int:module_id>/hls/<path:filename>",
+        views.TrainingVideoHLSView.as_view(),
+        name="training_video_hls",
+    ),
     path(
         "staff/update_video_progress/",
         views.UpdateVideoProgressView.as_view(),
         name="save_progress",
     ),
+    path(
+        "staff/update_video_progress/batch/",
+        views.BatchVideoProgressView.as_view(),
+        name="save_progress_batch",
+    ),
     # ==============================
     #  マイリスト機能（MyList）
     # ==============================
@@ -0,0 +1,207 @@
+"""
+動画視聴位置の書き込みバッファ（write-behind）
+
+視聴中のハートビート（再生位置）は毎回DBへ書かず、(ユーザー, 研修) ごとに
+最新の位置だけをキャッシュに溜めておき、定期的にまとめて bulk_update / bulk_create する。
+完了イベントだけは即時にDBへ保存する。
+
+バッファは Redis・Memcached 等の共有キャッシュを使う場合だけ有効になる。
+プロセスごとのキャッシュ（LocMemCache 等）では再起動で消え、flush_video_progress
+コマンドからも見えないため、バッファせずに直接DBへ書き込む。
+バッファ中の位置は flush_video_progress --loop（定期実行）と、プロセス終了時に書き込む。
+"""
+
+import atexit
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from common import cache_backends
+from main.models import UserModuleProgress
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "video_progress:pending"
+LOCK_KEY = "video_progress:lock"
+FLUSHED_KEY = "video_progress:flushed"
+
+FLUSH_INTERVAL = getattr(settings, "VIDEO_PROGRESS_FLUSH_INTERVAL", 30)
+BATCH_SIZE = getattr(settings, "VIDEO_PROGRESS_BATCH_SIZE", 500)
+
+
+def _position_key(user_id, module_id):
+    return f"video_progress:{user_id}:{module_id}"
+
+
+def uses_shared_cache():
+    """バッファを置けるキャッシュ（全プロセスから見え、再起動で消えない）か"""
+    return cache_backends.is_shared()
+
+
+_shutdown_flush_registered = False
+
+
+def _register_shutdown_flush():
+    """このプロセスで積んだ位置を、プロセス終了時にも書き込む"""
+    global _shutdown_flush_registered
+    if not _shutdown_flush_registered:
+        atexit.register(_flush_at_exit)
+        _shutdown_flush_registered = True
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception as e:
+        logger.warning("終了時に再生位置を書き込めませんでした: %s", e)
+
+
+@contextmanager
+def _buffer_lock(timeout=5, retries=100):
+    """キャッシュ上の簡易ロック（pending 一覧の読み書きを直列化する）"""
+    acquired = False
+    for _ in range(retries):
+        if cache.add(LOCK_KEY, 1, timeout):
+            acquired = True
+            break
+        time.sleep(0.01)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(LOCK_KEY)
+
+
+def buffer_positions(user_id, positions):
+    """
+    再生位置をバッファに積む
+    positions: {module_id: position} （同じ研修は最新の位置だけが残る）
+    共有キャッシュでない場合やロックを取れなかった場合は、バッファせずにDBへ書き込む
+    """
+    if not positions:
+        return
+    if uses_shared_cache():
+        with _buffer_lock() as acquired:
+            if acquired:
+                cache.set_many(
+                    {
+                        _position_key(user_id, module_id): float(position)
+                        for module_id, position in positions.items()
+                    },
+                    None,
+                )
+                pending = cache.get(PENDING_KEY) or set()
+                pending.update((user_id, module_id) for module_id in positions)
+                cache.set(PENDING_KEY, pending, None)
+                _register_shutdown_flush()
+                return
+        # 後から古い位置で上書きしないよう、バッファに残っている位置は捨てる
+        cache.delete_many([_position_key(user_id, m) for m in positions])
+    write_positions(
+        {(user_id, module_id): float(position) for module_id, position in positions.items()}
+    )
+
+
+def discard_positions(user_id, module_ids):
+    """即時保存した研修のバッファを破棄する（古い位置で上書きしないため）"""
+    if not module_ids or not uses_shared_cache():
+        return
+    with _buffer_lock() as acquired:
+        # 位置を消せば flush では読み飛ばされるので、一覧はロックを取れた時だけ更新する
+        cache.delete_many([_position_key(user_id, m) for m in module_ids])
+        if acquired:
+            pending = cache.get(PENDING_KEY) or set()
+            pending.difference_update((user_id, m) for m in module_ids)
+            cache.set(PENDING_KEY, pending, None)
+
+
+def get_buffered_position(user_id, module_id):
+    """まだDBに書かれていない最新の再生位置（なければ None）"""
+    return cache.get(_position_key(user_id, module_id))
+
+
+def save_completion(user_id, module_id, position):
+    """完了イベントはバッファせず即時に保存する（シグナルで進捗サマリーも更新される）"""
+    progress, _ = UserModuleProgress.objects.get_or_create(
+        user_id=user_id, module_id=module_id
+    )
+    progress.last_position = float(position)
+    progress.is_completed = True
+    progress.save()
+    discard_positions(user_id, [module_id])
+    return progress
+
+
+def flush():
+    """バッファに溜まった再生位置をまとめてDBへ書き込む。書き込んだ件数を返す"""
+    if not uses_shared_cache():
+        return 0
+    with _buffer_lock() as acquired:
+        if not acquired:
+            return 0
+        pending = cache.get(PENDING_KEY) or set()
+        if not pending:
+            return 0
+        keys = {pair: _position_key(*pair) for pair in pending}
+        values = cache.get_many(list(keys.values()))
+        cache.delete_many(list(keys.values()))
+        cache.delete(PENDING_KEY)
+
+    return write_positions(
+        {pair: values[key] for pair, key in keys.items() if key in values}
+    )
+
+
+def write_positions(positions):
+    """
+    再生位置をまとめてDBへ書き込む。書き込んだ件数を返す
+    positions: {(user_id, module_id): position}
+    """
+    if not positions:
+        return 0
+
+    user_ids = {user_id for user_id, _ in positions}
+    module_ids = {module_id for _, module_id in positions}
+    now = timezone.now()
+
+    with transaction.atomic():
+        existing = {
+            (p.user_id, p.module_id): p
+            for p in UserModuleProgress.objects.filter(
+                user_id__in=user_ids, module_id__in=module_ids
+            )
+        }
+        to_update, to_create = [], []
+        for pair, position in positions.items():
+            progress = existing.get(pair)
+            if progress is None:
+                to_create.append(
+                    UserModuleProgress(
+                        user_id=pair[0], module_id=pair[1], last_position=position
+                    )
+                )
+            else:
+                progress.last_position = position
+                progress.updated_at = now
+                to_update.append(progress)
+
+        UserModuleProgress.objects.bulk_update(
+            to_update, ["last_position", "updated_at"], batch_size=BATCH_SIZE
+        )
+        # 同時に完了イベントで作成された行とは衝突しても無視する
+        UserModuleProgress.objects.bulk_create(
+            to_create, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+    return len(positions)
+
+
+def maybe_flush():
+    """前回の書き込みから FLUSH_INTERVAL 秒以上経っていればリクエスト内で書き込む"""
+    if uses_shared_cache() and cache.add(FLUSHED_KEY, 1, FLUSH_INTERVAL):
+        return flush()
+    return 0
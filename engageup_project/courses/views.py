@@ -1,7 +1,6 @@
 import json
 import random
 import os
-import google.generativeai as genai
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
@@ -9,10 +8,13 @@ from django.views.generic import TemplateView, ListView, UpdateView, CreateView
 from django.urls import reverse_lazy, reverse
 from django.views.generic.base import ContextMixin
 from django.db.models import Q, Prefetch
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
 from django.contrib.auth.decorators import login_required
 from django.db import transaction  # トランザクション管理
 
+from common import ai_jobs
 from common.views import (
     BaseCreateView,
     AdminOrModeratorRequiredMixin,
@@ -22,13 +24,13 @@ from common.views import (
 from main.models import (
     Course,
     TrainingModule,
-    TrainingExample,
-    TrainingExampleChoice,
     UserModuleProgress,
     Mylist,
     News,
 )
 from .forms import CourseForm, TrainingModuleForm
+from .progress import annotate_progress, get_progress_map
+from . import navigation, streaming, video_progress
 
 # =====================================================
 # 1. コース管理 (管理者用)
@@ -162,7 +164,7 @@ class TrainingModuleCreateView(
             module.is_active = True
             existing = form.cleaned_data.get("existing_file")
             if existing and not request.FILES.get("training_file"):
-                module.training_file.name = f"exams_files/{existing}"
+                module.training_file.name = existing.name
             module.save()
             if request.POST.get("after_save") == "ai":
                 return redirect(
@@ -210,57 +212,40 @@ class TrainingModuleToggleActiveView(AdminOrModeratorRequiredMixin, View):
 # 3. AI自動生成機能
 # =====================================================
 class TrainingAllAutoGenerateView(AdminOrModeratorRequiredMixin, View):
+    """要約・例題の自動生成（ジョブを登録してすぐに返す。実行は run_ai_worker）"""
+
     def post(self, request, module_id):
         module = get_object_or_404(TrainingModule, pk=module_id)
+        is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+
+        error = None
         if not module.training_file:
-            return redirect("courses:module_edit", pk=module.id)
-        user_req = request.POST.get("user_instruction", "特になし")
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        model = genai.GenerativeModel("gemini-flash-latest")
-        try:
-            with module.training_file.open("rb") as f:
-                file_data = f.read()
-            prompt = f"""
-            資料を読み取り、要約テキストと例題2問を以下のJSON形式で作成してください。
-            要望: {user_req}
-            【出力JSON構造】
-            {{
-              "summary": "{module.estimated_time}分で学習できる分量のHTML要約",
-              "examples": [
-                {{
-                  "text": "例題の文章",
-                  "explanation": "解説",
-                  "choices": [
-                    {{"text": "選択肢1", "is_correct": true}},
-                    {{"text": "選択肢2", "is_correct": false}},
-                    {{"text": "選択肢3", "is_correct": false}},
-                    {{"text": "選択肢4", "is_correct": false}}
-                  ]
-                }}
-              ]
-            }}
-            """
-            response = model.generate_content(
-                [prompt, {"mime_type": "application/pdf", "data": file_data}]
-            )
-            res_text = response.text.replace("```json", "").replace("```", "").strip()
-            data = json.loads(res_text)
-            module.content_text = data["summary"]
-            module.save()
-            module.examples.all().delete()
-            for ex in data["examples"]:
-                example = TrainingExample.objects.create(
-                    module=module, text=ex["text"], explanation=ex["explanation"]
+            error = "要約元資料が登録されていません。"
+        else:
+            try:
+                job = ai_jobs.enqueue(
+                    "module_content",
+                    params={"user_instruction": request.POST.get("user_instruction", "特になし")},
+                    module=module,
+                    user=request.user,
                 )
-                for ch in ex["choices"]:
-                    TrainingExampleChoice.objects.create(
-                        example=example, text=ch["text"], is_correct=ch["is_correct"]
-                    )
+            except ai_jobs.JobConflictError as e:
+                error = str(e)
+
+        if error:
+            if is_ajax:
+                return JsonResponse({"status": "error", "message": error}, status=400)
             return redirect("courses:module_edit", pk=module.id)
-        except Exception as e:
-            return render(
-                request, "enrollments/enrollments_error.html", {"error": str(e)}
+
+        if is_ajax:
+            return JsonResponse(
+                {
+                    "status": "success",
+                    "job_id": job.pk,
+                    "status_url": reverse("ai_job_status", kwargs={"job_id": job.pk}),
+                }
             )
+        return redirect("courses:module_edit", pk=module.id)
 
 
 # =====================================================
@@ -280,10 +265,15 @@ class StaffCourseListView(BaseTemplateMixin, ListView):
         active_modules_qs = TrainingModule.objects.filter(is_active=True)
         
         # 2. コースを取得する際に、上記の「有効なモジュールだけ」を prefetch する
-        return Course.objects.filter(is_deleted=False, is_active=True).prefetch_related(
+        queryset = Course.objects.filter(is_deleted=False, is_active=True).prefetch_related(
             Prefetch("modules", queryset=active_modules_qs)
         )
 
+        # 3. 進捗率（progress_percent）を同じクエリで annotate する
+        if self.request.user.is_authenticated:
+            queryset = annotate_progress(queryset, self.request.user)
+        return queryset
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
@@ -309,48 +299,27 @@ class StaffCourseListView(BaseTemplateMixin, ListView):
                 )
             )
 
-            # 各コースのループ
+            # 進捗率は get_queryset で annotate 済み
             for course in context["courses"]:
                 course.is_mylist = course.id in my_fav_course_ids
 
-                # 進捗計算
-                # get_querysetで絞り込んでいるため、course.modules.all() は有効なもののみ
-                active_modules = list(course.modules.all()) 
-                total_modules = len(active_modules)
-                
-                if total_modules > 0:
-                    # このコースに属する有効な研修のうち、ユーザーが完了した数をカウント
-                    done_count = UserModuleProgress.objects.filter(
-                        user=user, 
-                        module__in=active_modules, # 取得済みの有効モジュールリストで絞り込み
-                        is_completed=True
-                    ).count()
-                    course.progress_percent = int((done_count / total_modules) * 100)
-                else:
-                    course.progress_percent = 0
-                    
         return context
 
 class StaffTrainingDetailView(BaseTemplateMixin, ContextMixin, View):
     def get(self, request, module_id):
         module = get_object_or_404(TrainingModule, pk=module_id, is_active=True)
-        all_modules = list(module.course.modules.filter(is_active=True).order_by("id"))
-        try:
-            current_idx = all_modules.index(module)
-            prev_module = all_modules[current_idx - 1] if current_idx > 0 else None
-            next_module = (
-                all_modules[current_idx + 1]
-                if current_idx < len(all_modules) - 1
-                else None
-            )
-        except ValueError:
-            prev_module = next_module = None
+        # 前後の研修はキャッシュ済みのナビゲーションから O(1) で取得
+        prev_module, next_module = navigation.get_neighbors(module.course_id, module.pk)
         progress = UserModuleProgress.objects.filter(
             user_id=request.user.pk, module=module
         ).first()
+        # まだDBへ書き込まれていない再生位置があればそちらを優先
+        last_position = video_progress.get_buffered_position(request.user.pk, module.pk)
+        if last_position is None:
+            last_position = progress.last_position if progress else 0.0
         context = self.get_context_data(
             module=module,
-            last_position=progress.last_position if progress else 0.0,
+            last_position=last_position,
             is_completed=progress.is_completed if progress else False,
             prev_module=prev_module,
             next_module=next_module,
@@ -359,25 +328,101 @@ class StaffTrainingDetailView(BaseTemplateMixin, ContextMixin, View):
         return render(request, "courses/staff_training_detail.html", context)
 
 
+class TrainingVideoStreamView(LoginRequiredCustomMixin, View):
+    """研修動画の配信（ログイン必須・Range リクエスト対応）"""
+
+    def get(self, request, module_id):
+        module = get_object_or_404(TrainingModule, pk=module_id)
+        # 非表示の研修動画は管理者・モデレーターのみプレビュー可能
+        if not module.is_active and request.user.rank not in ["administer", "moderator"]:
+            raise Http404
+        if not module.video:
+            raise Http404
+        try:
+            return streaming.serve_file(request, module.video)
+        except FileNotFoundError:
+            raise Http404
+
+
+class TrainingVideoHLSView(TrainingVideoStreamView):
+    """HLS 変換済みのプレイリスト・セグメントの配信"""
+
+    def get(self, request, module_id, filename):
+        module = get_object_or_404(TrainingModule, pk=module_id, video_status="ready")
+        if not module.is_active and request.user.rank not in ["administer", "moderator"]:
+            raise Http404
+        hls_dir = os.path.dirname(module.hls_playlist)
+        try:
+            path = safe_join(settings.MEDIA_ROOT, hls_dir, filename)
+            return streaming.serve_path(request, path, f"{hls_dir}/{filename}")
+        except (FileNotFoundError, SuspiciousFileOperation):
+            raise Http404
+
+
 class UpdateVideoProgressView(LoginRequiredCustomMixin, View):
     def post(self, request):
         try:
             data = json.loads(request.body)
-            module_id = data.get("module_id")
-            position = data.get("position", 0)
-            is_done = data.get("is_done", False)
-            progress, created = UserModuleProgress.objects.get_or_create(
-                user_id=request.user.pk, module_id=module_id
-            )
-            progress.last_position = float(position)
-            if is_done or progress.is_completed:
-                progress.is_completed = True
-            progress.save()
+            module_id = int(data.get("module_id"))
+            position = float(data.get("position", 0))
+            if not TrainingModule.objects.filter(pk=module_id).exists():
+                raise ValueError("研修が存在しません")
+            if data.get("is_done", False):
+                video_progress.save_completion(request.user.pk, module_id, position)
+            else:
+                video_progress.buffer_positions(request.user.pk, {module_id: position})
+                video_progress.maybe_flush()
             return JsonResponse({"status": "success"})
         except Exception as e:
             return JsonResponse({"status": "error", "message": str(e)}, status=400)
 
 
+class BatchVideoProgressView(LoginRequiredCustomMixin, View):
+    """
+    複数のハートビート {module_id, position, is_done} をまとめて受け取る
+    ・再生位置はキャッシュにバッファし、定期的にまとめてDBへ書き込む
+    ・完了イベントだけは即時に保存する
+    """
+
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            events = data.get("events", []) if isinstance(data, dict) else data
+
+            # 同じ研修のハートビートは最新の位置だけを残す
+            positions, completed = {}, set()
+            for event in events:
+                module_id = int(event.get("module_id"))
+                positions[module_id] = float(event.get("position", 0))
+                if event.get("is_done", False):
+                    completed.add(module_id)
+
+            # 存在しない研修IDは1クエリでまとめて除外
+            valid_ids = set(
+                TrainingModule.objects.filter(pk__in=positions).values_list(
+                    "id", flat=True
+                )
+            )
+            positions = {m: p for m, p in positions.items() if m in valid_ids}
+            completed &= valid_ids
+
+            for module_id in completed:
+                video_progress.save_completion(
+                    request.user.pk, module_id, positions.pop(module_id)
+                )
+            video_progress.buffer_positions(request.user.pk, positions)
+            video_progress.maybe_flush()
+            return JsonResponse(
+                {
+                    "status": "success",
+                    "buffered": len(positions),
+                    "completed": len(completed),
+                }
+            )
+        except Exception as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+
 # =====================================================
 # 5. マイリスト関連ビュー
 # =====================================================
@@ -402,17 +447,13 @@ def mylist_index(request):
         ).values_list("module_id", flat=True)
     )
 
-    # 各コースの進捗率を計算
+    # 各コースの進捗率を1クエリでまとめて計算
+    progress_map = get_progress_map(
+        request.user, [item.course_id for item in my_favorites if item.course_id]
+    )
     for item in my_favorites:
         if item.course:
-            total_modules = item.course.modules.filter(is_active=True).count()
-            if total_modules > 0:
-                done_count = UserModuleProgress.objects.filter(
-                    user=request.user, module__course=item.course, is_completed=True
-                ).count()
-                item.course.progress_percent = int((done_count / total_modules) * 100)
-            else:
-                item.course.progress_percent = 0
+            item.course.progress_percent = progress_map[item.course.id]["progress_percent"]
 
     # テンプレートに渡すデータ
     context = {
@@ -167,6 +167,92 @@ CACHES = {
     }
 }
 
+# 動画の再生位置バッファ（courses/video_progress.py）
+# ※ バッファは Redis 等の共有キャッシュの場合だけ有効（LocMemCache では直接DBへ書き込む）
+#   有効な場合は flush_video_progress --loop を常駐させる
+VIDEO_PROGRESS_FLUSH_INTERVAL = 30  # バッファをDBへ書き込む間隔（秒）
+VIDEO_PROGRESS_BATCH_SIZE = 500  # bulk_update / bulk_create 1回あたりの件数
+
+# 研修動画の配信（courses/streaming.py）
+VIDEO_STREAM_CHUNK_SIZE = 64 * 1024  # 1回に読み出すバイト数
+# None: Django が配信 / "nginx": X-Accel-Redirect / "sendfile": X-Sendfile (Apache)
+VIDEO_STREAM_OFFLOAD = None
+VIDEO_STREAM_ACCEL_PREFIX = "/protected-media/"  # nginx の internal location
+
+# 研修動画のHLS変換（courses/packaging.py, package_training_videos コマンド）
+FFMPEG_BINARY = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+HLS_RENDITIONS = [(360, 800), (720, 2800), (1080, 5000)]  # (高さ, 映像ビットレートkbps)
+HLS_SEGMENT_SECONDS = 6
+HLS_STALE_TIMEOUT = 3600  # processing のまま残った変換を変換待ちに戻すまでの時間（秒）
+
+# 検定の受験セッション（enrollments/attempts.py, expire_exam_attempts コマンド）
+EXAM_ATTEMPT_GRACE_SECONDS = 30  # 制限時刻を過ぎても提出を受け付ける猶予（通信遅延分）
+EXAM_AUTOSAVE_DELAY = 3  # 回答変更から自動保存までの待ち時間（秒）。連続した変更は1回の保存にまとめる
+EXAM_EXPIRE_BATCH_SIZE = 500  # 時間切れ採点で1回に処理する件数
+EXAM_GRADING_BATCH_SIZE = 500  # 受験履歴・解答ログの bulk_create 1回あたりの件数
+
+# AI生成ジョブ（common/ai_jobs.py, run_ai_worker コマンド）
+AI_WORKER_THREADS = 2  # 1ワーカーあたりのスレッド数
+AI_MAX_CONCURRENCY = 4  # 全ワーカー合計で同時に実行するジョブ数（APIの同時実行制限に合わせる）
+AI_JOB_MAX_ATTEMPTS = 3  # 失敗時の最大実行回数
+AI_JOB_RETRY_BACKOFF = 10  # 再実行までの基本待ち時間（秒）。失敗ごとに2倍
+AI_JOB_RATE_LIMIT_BACKOFF = 60  # 利用上限 (429) の場合の基本待ち時間（秒）
+AI_JOB_STALE_TIMEOUT = 60 * 60  # running のまま残ったジョブを待機中に戻すまでの時間（秒）。生成にかかる最長時間より十分長くする
+
+# AI生成結果のキャッシュ（common/ai_cache.py）
+AI_CACHE_DIR = BASE_DIR / "ai_cache"  # 応答を保存するディレクトリ
+AI_CACHE_MAX_ENTRIES = 500  # 保存する応答の最大件数
+AI_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 保存する応答の合計サイズの上限
+
+# 教材PDFのテキスト抽出・分割生成（common/pdf_text.py, enrollments/ai_tasks.py）
+AI_CHUNK_CHARS = 12000  # 1回の生成に渡す教材テキストの文字数の目安
+AI_CHUNK_WORKERS = 4  # チャンクを並列に生成するスレッド数（1ジョブあたり）
+
+# 問題・例題の一括登録（common/bulk_import.py, enrollments/question_bank.py, courses/example_bank.py, import_questions コマンド）
+QUESTION_IMPORT_BATCH_SIZE = 500  # bulk_create 1回あたりの件数
+
+# ホーム画面の集計のスナップショット（common/dashboard_stats.py）
+# 進捗・合格・お知らせなどの変更時はシグナルで無効化されるので、期限は念のための上限
+DASHBOARD_STATS_TIMEOUT = 60 * 60
+# None: 共有キャッシュ（Redis 等）の場合だけ使う / True・False: 明示的に切り替える
+# ※ LocMemCache で True にできるのは1プロセスで動かす場合だけ（他のプロセスの無効化が届かない）
+DASHBOARD_STATS_SNAPSHOT = None
+
+# メディアライブラリ（common/media_library.py, reconcile_media_library コマンド）
+MEDIA_LIBRARY_PER_PAGE = 20  # 「保存済みから選ぶ」の1ページあたりの件数
+
+# アップロードの受信（common/uploads.py）
+# 受信しながら SHA-256・サイズ・ファイルの種類（先頭のバイト列）を検査する
+FILE_UPLOAD_HANDLERS = ["common.uploads.InspectingUploadHandler"]
+UPLOAD_MAX_SIZE = 100 * 1024 * 1024  # UPLOAD_RULES にない項目の上限
+UPLOAD_RULES = {
+    "exams_file": {"types": ["pdf"], "max_size": 100 * 1024 * 1024},
+    "training_file": {"types": ["pdf", "png", "jpeg"], "max_size": 100 * 1024 * 1024},
+    "video": {"types": ["mp4", "mov", "avi"], "max_size": 4 * 1024 * 1024 * 1024},
+    "icon": {"types": ["png", "jpeg", "gif", "webp"], "max_size": 5 * 1024 * 1024},
+    "avatar": {"types": ["png", "jpeg", "gif", "webp"], "max_size": 5 * 1024 * 1024},
+}
+AI_INLINE_PDF_LIMIT = 8 * 1024 * 1024  # これより大きいPDFは Gemini の File API で送る（common/ai/gemini.py）
+
+# AI プロバイダー（common/ai/）。最初の生成時に import される
+# オフラインのテスト・ベンチマークでは "common.ai.fake.FakeProvider" を指定する
+AI_PROVIDER = "common.ai.gemini.GeminiProvider"
+AI_PROVIDER_OPTIONS = {"model_name": "gemini-flash-latest"}
+
+
+# メールの送信キュー（mail/outbox.py, send_outbox コマンド）
+EMAIL_OUTBOX_BATCH_SIZE = 100  # 1回に取り出して送る件数
+EMAIL_OUTBOX_RATE_LIMIT = 10  # 1秒あたりの送信数の上限（0: 制限なし）。SMTPサーバーの制限に合わせる
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5  # 一時的なエラーの場合の最大送信回数
+EMAIL_OUTBOX_RETRY_BACKOFF = 60  # 再送までの基本待ち時間（秒）。失敗ごとに2倍
+EMAIL_OUTBOX_STALE_TIMEOUT = 600  # sending のまま残ったメールを送信待ちに戻すまでの時間（秒）
+
+# アカウントの一括作成・パスワード再発行（accounts/provisioning.py, run_provisioning_worker コマンド）
+PROVISIONING_WORKERS = None  # パスワードのハッシュ化に使うプロセス数（None: 使えるCPUのコア数）
+PROVISIONING_CHUNK_SIZE = 200  # ハッシュ化・bulk_create・進捗の保存を行う単位（件）
+PROVISIONING_STALE_TIMEOUT = 3600  # running のまま残ったジョブを失敗にするまでの時間（秒）
+PROVISIONING_MAX_ACCOUNTS = 5000  # 連番作成で一度に作成できる人数
 
 # 開発用: メールをコンソールに出力
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -0,0 +1,179 @@
+"""
+AI生成ジョブの処理（検定問題）
+
+common/ai_jobs.py のワーカーから呼ばれる。
+教材PDFは PyMuPDF でテキストを抽出し（common/pdf_text.py）、長い教材はチャンクに分けて
+スレッドプールで並列に問題を生成してから、重複を除いてまとめる。
+テキストを含まないPDF（スキャン画像など）は従来どおりPDFをそのまま送る。
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from common import ai, ai_cache, mapped_file, pdf_text
+from common.ai_jobs import PermanentJobError, lock_running
+
+from . import question_bank
+
+
+# プロンプトを変更したら上げる（古いキャッシュを使わないため）
+PROMPT_VERSION = 1
+CHUNK_WORKERS = getattr(settings, "AI_CHUNK_WORKERS", 4)
+
+
+def _prompt(num_questions, difficulty):
+    return f"""
+        以下の教材内容から、4択形式の検定問題を「{num_questions}問」作成してください。
+        問題の難易度は「{difficulty}」にしてください。
+
+        【重要：JSONの構造ルール】
+        出力は必ず、以下の構造を持つJSON形式のリストのみで返してください。
+        [
+        {{
+            "text": "問題文",
+            "choices": [
+            {{"text": "正解", "is_correct": true}},
+            {{"text": "誤り", "is_correct": false}},
+            {{"text": "誤り", "is_correct": false}},
+            {{"text": "誤り", "is_correct": false}}
+            ]
+        }}
+        ]
+    """
+
+
+def _parse(raw_text):
+    quiz_data = json.loads(raw_text)
+    if isinstance(quiz_data, dict):
+        quiz_data = quiz_data.get('questions', [quiz_data])
+    return quiz_data
+
+
+def _generate_from_pdf(exam, file_sha256, num_questions, difficulty, refresh=False):
+    """教材PDFをそのまま送って生成する（テキストを抽出できないPDF用）"""
+    def generate():
+        with mapped_file.open_mapped(exam.exams_file) as file_data:
+            return ai.generate(
+                _prompt(num_questions, difficulty),
+                pdf_data=file_data,
+                hints={'kind': 'exam_questions', 'count': num_questions},
+            )
+
+    key = ai_cache.make_key(
+        file_sha256,
+        PROMPT_VERSION,
+        ai.identity(),
+        kind='exam_questions',
+        num_questions=str(num_questions),
+        difficulty=difficulty,
+    )
+    return _parse(ai_cache.get_or_generate(key, generate, validate=_parse, refresh=refresh))
+
+
+def _generate_from_text(text, num_questions, difficulty, refresh=False):
+    """教材のチャンク（テキスト）から生成する。スレッドプールから呼ばれる"""
+    def generate():
+        return ai.generate(
+            _prompt(num_questions, difficulty),
+            text=f"【教材】\n{text}",
+            hints={'kind': 'exam_questions', 'count': num_questions},
+        )
+
+    key = ai_cache.make_key(
+        hashlib.sha256(text.encode('utf-8')).hexdigest(),
+        PROMPT_VERSION,
+        ai.identity(),
+        kind='exam_questions_chunk',
+        num_questions=str(num_questions),
+        difficulty=difficulty,
+    )
+    return _parse(ai_cache.get_or_generate(key, generate, validate=_parse, refresh=refresh))
+
+
+def _allocate(total, weights):
+    """total 問を weights（チャンクの文字数）に比例して割り振る（端数は大きい順）"""
+    weight_sum = sum(weights) or 1
+    quotas = [total * w / weight_sum for w in weights]
+    counts = [int(q) for q in quotas]
+    by_remainder = sorted(range(len(weights)), key=lambda i: quotas[i] - counts[i], reverse=True)
+    for i in by_remainder[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _normalize(text):
+    return "".join(text.split()).lower()
+
+
+def _dedupe(items, existing=()):
+    """
+    問題文が同じ（空白・大文字小文字の違いを除く）問題は最初の1問だけ残す
+    existing: 検定に登録済みの問題文（これと同じ問題も除く）
+    """
+    seen, unique = {_normalize(text) for text in existing}, []
+    for item in items:
+        normalized = _normalize(item['text'])
+        if normalized in seen:
+            continue
+        seen.add(normalized)
+        unique.append(item)
+    return unique
+
+
+def _generate_questions(exam, document, chunks, num_questions, difficulty, refresh=False):
+    """教材から問題を生成する（長い教材はチャンクごとに並列に生成する）"""
+    if not chunks:
+        return _generate_from_pdf(exam, document.sha256, num_questions, difficulty, refresh)
+
+    # チャンクごとに割り振った問題数を並列に生成する
+    tasks = [
+        (chunk['text'], count)
+        for chunk, count in zip(chunks, _allocate(num_questions, [len(c['text']) for c in chunks]))
+        if count
+    ]
+    with ThreadPoolExecutor(max_workers=min(CHUNK_WORKERS, len(tasks))) as executor:
+        results = executor.map(
+            lambda task: _generate_from_text(task[0], task[1], difficulty, refresh), tasks
+        )
+        return [item for items in results for item in items]
+
+
+def generate_exam_questions(job):
+    """教材PDFから検定問題を生成して登録する。登録した問題数を返す"""
+    exam = job.exam
+    if exam is None or not exam.exams_file:
+        raise PermanentJobError('教材が登録されていません。')
+
+    try:
+        num_questions = max(int(job.params.get('count', 5)), 1)
+    except (TypeError, ValueError):
+        num_questions = 5
+    difficulty = job.params.get('difficulty', '中級')
+
+    document = pdf_text.extract(exam.exams_file)
+    chunks = pdf_text.chunks(document)
+    existing = list(exam.questions.values_list('text', flat=True))
+
+    items, errors = question_bank.validate_questions(
+        _generate_questions(exam, document, chunks, num_questions, difficulty)
+    )
+    unique = _dedupe(items)
+    new_items = _dedupe(unique, existing)
+    if len(new_items) < min(len(unique), num_questions):
+        # 前回と同じ応答（キャッシュ）で登録済みの問題と重なった場合は、キャッシュを使わずに作り直す
+        items, errors = question_bank.validate_questions(
+            _generate_questions(exam, document, chunks, num_questions, difficulty, refresh=True)
+        )
+        new_items = _dedupe(items, existing)
+    items = new_items[:num_questions]
+
+    # 再実行時に途中までの問題が残らないよう、1つのトランザクションでまとめて登録する
+    # タイムアウトで待機中に戻されたジョブは登録しない（実行し直すワーカーが登録する）
+    with transaction.atomic():
+        lock_running(job)
+        created = question_bank.save_questions(exam, items)
+    return {'created': len(created), 'skipped': len(errors), 'chunks': len(chunks)}
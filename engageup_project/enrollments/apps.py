@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class EnrollmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'enrollments'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from main.models import Exam, Question, Choice
+        from .signals import (
+            invalidate_exam_artifact_on_exam,
+            invalidate_exam_artifact_on_question,
+            invalidate_exam_artifact_on_choice,
+            invalidate_prerequisite_graph,
+        )
+
+        # 検定アーティファクト（問題・選択肢・正解表）のキャッシュ無効化
+        for signal in (post_save, post_delete):
+            signal.connect(invalidate_exam_artifact_on_exam, sender=Exam)
+            signal.connect(invalidate_exam_artifact_on_question, sender=Question)
+            signal.connect(invalidate_exam_artifact_on_choice, sender=Choice)
+            # 前提条件グラフの再構築
+            signal.connect(invalidate_prerequisite_graph, sender=Exam)
@@ -0,0 +1,213 @@
+"""
+検定の受験セッション（ExamAttempt）
+
+・受験開始時に開始時刻・制限時刻・出題順（シード付きシャッフル）をDBに記録する
+・回答はブラウザから少しずつ自動保存され、提出時にまとめて書き込む必要がない
+・制限時刻は expires_at でサーバー側が判定し、放置された受験は一括で採点する
+"""
+
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import Exam, ExamAttempt
+
+from . import exam_cache, grading
+
+GRACE_SECONDS = getattr(settings, "EXAM_ATTEMPT_GRACE_SECONDS", 30)
+AUTOSAVE_DELAY = getattr(settings, "EXAM_AUTOSAVE_DELAY", 3)
+EXPIRE_BATCH_SIZE = getattr(settings, "EXAM_EXPIRE_BATCH_SIZE", 500)
+
+
+def draw_question_ids(exam, index, seed):
+    """
+    シードから出題する問題と順番を決める（同じシードなら必ず同じ結果）
+    ・出題数の指定なし：全問題をシャッフル
+    ・問題プール：M問から N問を抽選。層別指定があればタグ・難易度ごとの割合を保つ
+    """
+    rng = random.Random(seed)
+    ids = list(index["ids"])
+    size = exam.question_pool_size
+    if not size or size >= len(ids):
+        rng.shuffle(ids)
+        return ids
+
+    strata = index.get(exam.pool_stratify) if exam.pool_stratify else None
+    if not strata:
+        return rng.sample(ids, size)
+
+    # 各層の問題数に比例して割り当て、端数は大きい層から1問ずつ追加する
+    groups = [strata[key] for key in sorted(strata, key=str)]
+    quotas = [size * len(group) / len(ids) for group in groups]
+    counts = [int(quota) for quota in quotas]
+    by_remainder = sorted(
+        range(len(groups)), key=lambda i: quotas[i] - counts[i], reverse=True
+    )
+    for i in by_remainder[: size - sum(counts)]:
+        counts[i] += 1
+
+    drawn = [
+        question_id
+        for group, count in zip(groups, counts)
+        for question_id in rng.sample(group, count)
+    ]
+    rng.shuffle(drawn)
+    return drawn
+
+
+def start_or_resume(user, exam, index):
+    """受験中（制限時刻内）の受験があれば再開し、なければ新しく開始する"""
+    now = timezone.now()
+    attempt = (
+        ExamAttempt.objects.filter(user=user, exam=exam, status="in_progress")
+        .order_by("-started_at")
+        .first()
+    )
+    if attempt and not attempt.is_expired(now):
+        return attempt
+
+    seed = random.SystemRandom().randrange(2**31)
+    return ExamAttempt.objects.create(
+        user=user,
+        exam=exam,
+        seed=seed,
+        question_order=draw_question_ids(exam, index, seed),
+        started_at=now,
+        expires_at=now + timedelta(minutes=exam.time_limit) if exam.time_limit else None,
+    )
+
+
+def ordered_questions(attempt, artifact):
+    """
+    出題順に並べた問題（途中で削除された問題は除く）
+    selected: 自動保存済みの回答（受験再開時にチェック状態を戻すため）
+    """
+    questions = {q["id"]: q for q in artifact["questions"]}
+    answers = {int(k): v for k, v in attempt.answers.items()}
+    return [
+        {**questions[qid], "selected": answers.get(qid)}
+        for qid in attempt.question_order
+        if qid in questions
+    ]
+
+
+def accepts_answers(attempt, now=None):
+    """回答を受け付けるか（受験中かつ制限時刻 + 猶予以内）"""
+    return attempt.status == "in_progress" and not attempt.is_expired(now, GRACE_SECONDS)
+
+
+def save_answers(attempt, raw_answers, artifact=None):
+    """
+    自動保存：ブラウザが送ってきた回答の全体を保存する
+    内容が変わっていない場合は書き込まない。書き込んだら True
+    """
+    artifact = artifact or exam_cache.get_artifact_for(attempt.exam, attempt)
+    answers = grading.parse_answers(artifact, raw_answers, attempt.question_order)
+    stored = {str(k): v for k, v in answers.items()}
+    if stored == attempt.answers:
+        return False
+    updated = ExamAttempt.objects.filter(pk=attempt.pk, status="in_progress").update(
+        answers=stored, updated_at=timezone.now()
+    )
+    if updated:
+        attempt.answers = stored
+    return bool(updated)
+
+
+def submit(attempt, artifact, raw_answers=None):
+    """
+    受験を提出して採点する
+    raw_answers: 提出時の回答（猶予時間を過ぎていれば無視し、自動保存済みの回答で採点）
+    すでに採点済み（二重送信・時間切れ採点済み）の場合は保存済みの結果を返す
+    """
+    now = timezone.now()
+    if raw_answers is not None and accepts_answers(attempt, now):
+        answers = grading.parse_answers(artifact, raw_answers, attempt.question_order)
+    else:
+        answers = grading.parse_answers(artifact, attempt.answers, attempt.question_order)
+
+    result = grading.grade(
+        artifact, answers, attempt.exam.passing_score, attempt.question_order
+    )
+    if attempt.status != "in_progress":
+        return result
+
+    status = "submitted" if accepts_answers(attempt, now) else "expired"
+    with transaction.atomic():
+        updated = ExamAttempt.objects.filter(pk=attempt.pk, status="in_progress").update(
+            status=status,
+            answers={str(k): v for k, v in answers.items()},
+            submitted_at=now,
+            score=result["score"],
+            is_passed=result["is_passed"],
+            updated_at=now,
+        )
+        if updated:
+            grading.record_results(
+                [(attempt.user_id, attempt.exam_id, result, attempt.pk)]
+            )
+    return result
+
+
+def expire_overdue(now=None, batch_size=EXPIRE_BATCH_SIZE):
+    """
+    制限時刻 + 猶予を過ぎても提出されていない受験を、自動保存済みの回答でまとめて採点する
+    採点した件数を返す
+    """
+    now = now or timezone.now()
+    deadline = now - timedelta(seconds=GRACE_SECONDS)
+    attempts = list(
+        ExamAttempt.objects.filter(status="in_progress", expires_at__lt=deadline)
+        .order_by("expires_at")[:batch_size]
+    )
+    if not attempts:
+        return 0
+
+    exams = Exam.objects.in_bulk({a.exam_id for a in attempts})
+    artifacts = {}
+    for exam_id, exam in exams.items():
+        if exam.uses_question_pool:
+            # 問題プールの検定は、対象の受験で出題された問題だけをまとめて取得する
+            question_ids = {
+                question_id
+                for a in attempts if a.exam_id == exam_id
+                for question_id in a.question_order
+            }
+            artifacts[exam_id] = exam_cache.compile_questions(exam_id, question_ids)
+        else:
+            artifacts[exam_id] = exam_cache.get_artifact(exam_id)
+
+    results = {}
+    for attempt in attempts:
+        artifact = artifacts[attempt.exam_id]
+        answers = grading.parse_answers(artifact, attempt.answers, attempt.question_order)
+        result = grading.grade(
+            artifact, answers, exams[attempt.exam_id].passing_score, attempt.question_order
+        )
+        results[attempt.pk] = result
+        attempt.status = "expired"
+        attempt.submitted_at = now
+        attempt.score = result["score"]
+        attempt.is_passed = result["is_passed"]
+        attempt.updated_at = now
+
+    with transaction.atomic():
+        # 採点中に提出された受験は上書きしない
+        still_open = set(
+            ExamAttempt.objects.select_for_update()
+            .filter(pk__in=[a.pk for a in attempts], status="in_progress")
+            .values_list("pk", flat=True)
+        )
+        attempts = [a for a in attempts if a.pk in still_open]
+        ExamAttempt.objects.bulk_update(
+            attempts,
+            ["status", "submitted_at", "score", "is_passed", "updated_at"],
+            batch_size=batch_size,
+        )
+        grading.record_results(
+            (a.user_id, a.exam_id, results[a.pk], a.pk) for a in attempts
+        )
+    return len(attempts)
@@ -0,0 +1,153 @@
+"""
+検定のコンパイル済みアーティファクト（問題・選択肢・正解表）と出題候補IDのキャッシュ
+
+受験画面・採点で毎回 Question / Choice を問い合わせないように、
+検定ごとに問題・選択肢・正解をまとめた読み取り専用のデータを作ってキャッシュに置く。
+Exam / Question / Choice が保存・削除されるとバージョンを上げて無効化する。
+無効化は全プロセス（他のワーカー・AI生成ワーカー・import_questions コマンド）に届く必要があるため、
+キャッシュは共有キャッシュの場合だけ使い、それ以外（LocMemCache 等）では毎回作る。
+"""
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from common import cache_backends
+from main.models import Choice, Question
+
+ARTIFACT_TIMEOUT = 60 * 60 * 24
+
+
+def enabled():
+    """アーティファクトをキャッシュするか（共有キャッシュの場合だけ）"""
+    return cache_backends.is_shared()
+
+
+def _version_key(exam_id):
+    return f"exam_artifact_version:{exam_id}"
+
+
+def _get_version(exam_id):
+    return cache.get_or_set(_version_key(exam_id), 1, None)
+
+
+def invalidate(exam_id):
+    """バージョンを上げて古いアーティファクトを参照されないようにする"""
+    if not enabled():
+        return
+    try:
+        cache.incr(_version_key(exam_id))
+    except ValueError:
+        cache.add(_version_key(exam_id), 1, None)
+
+
+def _compile(questions, exam_id, version=None):
+    """
+    問題のクエリセットを1つのアーティファクトにまとめる（クエリは問題 + 選択肢の2回）
+      questions  : ({"id", "text", "choices": ({"id", "text"}, ...)}, ...)
+      choices    : {choice_id: {"id", "text", "question_id"}}
+      answer_key : {question_id: 正解の choice_id（なければ None）}
+    """
+    questions = questions.order_by("id").prefetch_related(
+        Prefetch("choices", queryset=Choice.objects.order_by("id"))
+    )
+
+    compiled_questions, choices, answer_key = [], {}, {}
+    for q in questions:
+        q_choices = []
+        answer_key[q.id] = None
+        for c in q.choices.all():
+            choice = {"id": c.id, "text": c.text, "question_id": q.id}
+            q_choices.append(choice)
+            choices[c.id] = choice
+            if c.is_correct and answer_key[q.id] is None:
+                answer_key[q.id] = c.id
+        compiled_questions.append({"id": q.id, "text": q.text, "choices": tuple(q_choices)})
+
+    return {
+        "exam_id": exam_id,
+        "version": version,
+        "questions": tuple(compiled_questions),
+        "choices": choices,
+        "answer_key": answer_key,
+    }
+
+
+def compile_exam(exam_id, version=None):
+    """検定の全問題をアーティファクトにまとめる"""
+    return _compile(Question.objects.filter(exam_id=exam_id), exam_id, version)
+
+
+def compile_questions(exam_id, question_ids):
+    """
+    指定した問題だけのアーティファクト（キャッシュしない）
+    問題プールの検定では、出題された問題だけを id__in で1回取得する
+    """
+    return _compile(
+        Question.objects.filter(exam_id=exam_id, id__in=question_ids), exam_id
+    )
+
+
+def get_artifact(exam_id):
+    if not enabled():
+        return compile_exam(exam_id)
+    version = _get_version(exam_id)
+    key = f"exam_artifact:{exam_id}:{version}"
+    artifact = cache.get(key)
+    if artifact is None:
+        artifact = compile_exam(exam_id, version)
+        cache.set(key, artifact, ARTIFACT_TIMEOUT)
+    return artifact
+
+
+def build_question_index(exam_id):
+    """
+    出題候補の問題IDの一覧（問題プールの抽選用）
+      ids        : (問題ID, ...)
+      tag        : {タグ: (問題ID, ...)}
+      difficulty : {難易度: (問題ID, ...)}
+    """
+    ids, by_tag, by_difficulty = [], {}, {}
+    rows = Question.objects.filter(exam_id=exam_id).order_by("id").values_list(
+        "id", "tag", "difficulty"
+    )
+    for question_id, tag, difficulty in rows:
+        ids.append(question_id)
+        by_tag.setdefault(tag, []).append(question_id)
+        by_difficulty.setdefault(difficulty, []).append(question_id)
+    return {
+        "ids": tuple(ids),
+        "tag": {k: tuple(v) for k, v in by_tag.items()},
+        "difficulty": {k: tuple(v) for k, v in by_difficulty.items()},
+    }
+
+
+def get_question_index(exam_id):
+    """build_question_index() の結果（共有キャッシュの場合だけ保持する）"""
+    if not enabled():
+        return build_question_index(exam_id)
+    version = _get_version(exam_id)
+    key = f"exam_question_index:{exam_id}:{version}"
+    index = cache.get(key)
+    if index is None:
+        index = build_question_index(exam_id)
+        cache.set(key, index, ARTIFACT_TIMEOUT)
+    return index
+
+
+def get_artifact_for(exam, attempt):
+    """
+    受験1回分の表示・採点に使うアーティファクト
+    問題プールの検定は出題された問題だけを取得してその受験用にキャッシュし、
+    全問題のアーティファクトは作らない
+    """
+    if not exam.uses_question_pool:
+        return get_artifact(exam.id)
+    if not enabled():
+        return compile_questions(exam.id, attempt.question_order)
+    version = _get_version(exam.id)
+    key = f"exam_attempt_artifact:{attempt.pk}:{version}"
+    artifact = cache.get(key)
+    if artifact is None:
+        artifact = compile_questions(exam.id, attempt.question_order)
+        cache.set(key, artifact, ARTIFACT_TIMEOUT)
+    return artifact
@@ -1,13 +1,13 @@
 from django import forms
 from main.models import Question, Choice, Exam
+from . import prerequisites
 from django.forms import inlineformset_factory, BaseInlineFormSet
-import os
-from django.conf import settings
+from common.forms import MediaAssetField
 
 class QuestionForm(forms.ModelForm):
     class Meta:
         model = Question
-        fields = ['text']
+        fields = ['text', 'tag', 'difficulty']
         #タイトルにrequired属性を追加
         widgets = {
             # TextInput ではなく Textarea を使うのが正解です
@@ -18,6 +18,11 @@ class QuestionForm(forms.ModelForm):
                 'placeholder': 'ここに質問文を入力してください',
                 'autofocus': 'autofocus',
             }),
+            'tag': forms.TextInput(attrs={
+                'class': 'form-control',
+                'placeholder': '例：調剤、法規（問題プールの層別出題に使用）',
+            }),
+            'difficulty': forms.Select(attrs={'class': 'form-select'}),
         }
 
 class BaseChoiceFormSet(BaseInlineFormSet):
@@ -65,10 +70,8 @@ EditChoiceFormSet = inlineformset_factory(
 )
 
 class ExamForm(forms.ModelForm):
-    exam_file = forms.ChoiceField(
-        choices=[],
-        required=False,
-        label="保存済みから選ぶ")
+    # 保存済みファイルはメディアライブラリの索引から検索して選ぶ
+    exam_file = MediaAssetField(label="保存済みから選ぶ")
     
     #タイトルにrequired属性を追加
     title = forms.CharField(
@@ -83,25 +86,16 @@ class ExamForm(forms.ModelForm):
 
     class Meta:
         model = Exam
-        fields = ["title", "description", "passing_score", 'time_limit', "exams_file", "exam_type", "prerequisite"]
+        fields = ["title", "description", "passing_score", 'time_limit', 'question_pool_size', 'pool_stratify', "exams_file", "exam_type", "prerequisite"]
         #テキストをpdfのみに制限をかける
         widgets = {
             'exams_file': forms.ClearableFileInput(attrs={'accept': '.pdf'}),
+            'question_pool_size': forms.NumberInput(attrs={'min': 0, 'placeholder': '0'}),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # 保存済みファイルのリストを取得
-        files_dir = os.path.join(settings.MEDIA_ROOT, 'exams_files')
-        if os.path.exists(files_dir):
-            files = os.listdir(files_dir)
-        else:
-            files = []
-
-        file_choices = [('', '--- 選択してください ---')] + [(f, f) for f in files]
-        self.fields['exam_file'].choices = file_choices
-
         # デザインをねこねこ薬局風にするための設定
         widgets = {
             'title': forms.TextInput(attrs={'placeholder': '例：2024年度 新人研修テスト'}),
@@ -118,5 +112,8 @@ class ExamForm(forms.ModelForm):
             'exam_type': forms.Select(),
         }
 
-    
-
+    def clean_prerequisite(self):
+        prerequisite = self.cleaned_data.get('prerequisite')
+        if prerequisite and prerequisites.would_create_cycle(self.instance.pk, prerequisite.pk):
+            raise forms.ValidationError("前提となる試験が循環しています。別の試験を選んでください。")
+        return prerequisite
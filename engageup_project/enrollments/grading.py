@@ -0,0 +1,167 @@
+"""
+検定の採点
+
+コンパイル済みアーティファクト（exam_cache.py）の正解表だけを使って採点する。
+DBへの問い合わせは行わないため、受験画面からの提出と時間切れの一括採点で同じ結果になる。
+採点結果（受験履歴・解答ログ・合格状況）はまとめて1つのトランザクションで書き込む。
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from common import dashboard_stats
+from main.models import AnswerLog, BadgeLeaderboard, Exam, ExamResult, UserExamStatus
+
+BATCH_SIZE = getattr(settings, "EXAM_GRADING_BATCH_SIZE", 500)
+
+
+def parse_answers(artifact, raw_answers, question_ids=None):
+    """
+    {問題ID: 選択肢ID} の形に正規化する（キー・値は文字列でも可）
+    ・出題されていない問題、他の問題の選択肢、数値でない値は捨てる
+    """
+    allowed = set(question_ids) if question_ids is not None else set(artifact["answer_key"])
+    choices = artifact["choices"]
+    answers = {}
+    for question_id, choice_id in (raw_answers or {}).items():
+        try:
+            question_id, choice_id = int(question_id), int(choice_id)
+        except (TypeError, ValueError):
+            continue
+        choice = choices.get(choice_id)
+        if question_id in allowed and choice and choice["question_id"] == question_id:
+            answers[question_id] = choice_id
+    return answers
+
+
+def grade(artifact, answers, passing_score, question_ids=None):
+    """
+    回答を採点する
+    answers      : parse_answers() 済みの {問題ID: 選択肢ID}
+    question_ids : 出題順（省略時はアーティファクトの全問題）。削除済みの問題は除外する
+    """
+    questions = {q["id"]: q for q in artifact["questions"]}
+    if question_ids is None:
+        question_ids = list(questions)
+    choices = artifact["choices"]
+    answer_key = artifact["answer_key"]
+
+    correct_count = 0
+    details = []
+    for question_id in question_ids:
+        q = questions.get(question_id)
+        if q is None:
+            continue
+        user_choice = choices.get(answers.get(question_id))
+        correct_choice = choices.get(answer_key[question_id])
+        is_correct = user_choice == correct_choice
+        if is_correct:
+            correct_count += 1
+        details.append({
+            "question": q,
+            "user_choice": user_choice,
+            "correct_choice": correct_choice,
+            "is_correct": is_correct,
+        })
+
+    total = len(details)
+    score = int(round((correct_count / total) * 100)) if total > 0 else 0
+    return {
+        "score": score,
+        "is_passed": score >= passing_score,
+        "correct_count": correct_count,
+        "total": total,
+        "details": details,
+    }
+
+
+def _record_passes(pairs, now):
+    """
+    合格した (user_id, exam_id) の UserExamStatus を合格にする（upsert）
+    既に合格済みの行の passed_at は上書きしない
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return
+    UserExamStatus.objects.bulk_create(
+        [
+            UserExamStatus(user_id=user_id, exam_id=exam_id, is_passed=True, passed_at=now)
+            for user_id, exam_id in pairs
+        ],
+        ignore_conflicts=True,
+    )
+    # 既存の未合格行は検定ごとに1回の UPDATE で合格にする
+    users_by_exam = {}
+    for user_id, exam_id in pairs:
+        users_by_exam.setdefault(exam_id, set()).add(user_id)
+    for exam_id, user_ids in users_by_exam.items():
+        UserExamStatus.objects.filter(
+            exam_id=exam_id, user_id__in=user_ids, is_passed=False
+        ).update(is_passed=True, passed_at=now, updated_at=now)
+
+    # 合格数が変わったユーザーのホーム画面の集計を作り直す
+    for user_id in {user_id for user_id, _ in pairs}:
+        dashboard_stats.invalidate_user(user_id)
+
+    # バッジ（公開中の本試験）を獲得したユーザーのランキングを更新する
+    badge_exam_ids = set(
+        Exam.objects.filter(
+            pk__in=users_by_exam, exam_type="main", is_active=True
+        ).values_list("pk", flat=True)
+    )
+    BadgeLeaderboard.objects.refresh_users(
+        {user_id for user_id, exam_id in pairs if exam_id in badge_exam_ids}
+    )
+
+
+def record_results(entries):
+    """
+    採点結果をまとめて保存する（1つのトランザクション）
+      ・ExamResult を bulk_create
+      ・問題ごとの AnswerLog を bulk_create
+      ・合格者の UserExamStatus を upsert
+    entries: [(user_id, exam_id, grade() の結果, attempt_id または None), ...]
+    作成した ExamResult のリストを返す
+    """
+    entries = list(entries)
+    if not entries:
+        return []
+    now = timezone.now()
+    results = [
+        ExamResult(
+            user_id=user_id,
+            exam_id=exam_id,
+            attempt_id=attempt_id,
+            score=result["score"],
+            is_passed=result["is_passed"],
+        )
+        for user_id, exam_id, result, attempt_id in entries
+    ]
+
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            ExamResult.objects.bulk_create(results, batch_size=BATCH_SIZE)
+        else:
+            # 作成した行のIDを受け取れないDBでは1件ずつ保存する
+            for exam_result in results:
+                exam_result.save()
+
+        AnswerLog.objects.bulk_create(
+            [
+                AnswerLog(
+                    result=exam_result,
+                    question_id=detail["question"]["id"],
+                    choice_id=detail["user_choice"]["id"] if detail["user_choice"] else None,
+                    is_correct=detail["is_correct"],
+                )
+                for exam_result, (_, _, result, _) in zip(results, entries)
+                for detail in result["details"]
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        _record_passes(
+            ((user_id, exam_id) for user_id, exam_id, result, _ in entries if result["is_passed"]),
+            now,
+        )
+    return results
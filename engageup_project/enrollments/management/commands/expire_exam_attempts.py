@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from enrollments import attempts
+
+
+class Command(BaseCommand):
+    help = "制限時間を過ぎたまま提出されていない受験を、自動保存済みの回答でまとめて採点します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="終了せずに定期的に採点を続ける"
+        )
+        parser.add_argument(
+            "--interval", type=int, default=60, help="--loop 時の実行間隔（秒）"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            # 1回で処理しきれない分は続けて処理する
+            while True:
+                count = attempts.expire_overdue()
+                total += count
+                if count < attempts.EXPIRE_BATCH_SIZE:
+                    break
+            self.stdout.write(f"{total} 件の時間切れの受験を採点しました")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from enrollments import question_bank
+from main.models import Exam
+
+
+class Command(BaseCommand):
+    help = "問題集（JSON）を検定に一括登録します（形式は enrollments/question_bank.py を参照）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_id", type=int, help="登録先の検定ID")
+        parser.add_argument("path", help="問題集のJSONファイル")
+        parser.add_argument(
+            "--skip-invalid",
+            action="store_true",
+            help="形式が正しくない問題を飛ばして残りを登録する（指定しない場合は1問も登録しない）",
+        )
+        parser.add_argument(
+            "--keep-order", action="store_true", help="選択肢を並べ替えずに登録する"
+        )
+
+    def handle(self, *args, **options):
+        exam = Exam.objects.filter(pk=options["exam_id"]).first()
+        if exam is None:
+            raise CommandError(f"検定 #{options['exam_id']} が見つかりません")
+
+        try:
+            with open(options["path"], encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"問題集を読み込めません: {e}")
+
+        items, errors = question_bank.validate_questions(data)
+        for error in errors:
+            self.stderr.write(error)
+        if errors and not options["skip_invalid"]:
+            raise CommandError(f"{len(errors)} 問の形式が正しくないため登録を中止しました")
+
+        created = question_bank.save_questions(
+            exam, items, shuffle_choices=not options["keep_order"]
+        )
+        self.stdout.write(f"「{exam.title}」に {len(created)} 問を登録しました")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from main.models import Exam, Question
+
+
+class Command(BaseCommand):
+    help = "検定の問題数 (Exam.question_count) を実際の問題数に合わせて修正します"
+
+    def handle(self, *args, **options):
+        counts = (
+            Question.objects.filter(exam=OuterRef("pk"))
+            .values("exam")
+            .annotate(c=Count("id"))
+            .values("c")
+        )
+        actual = Coalesce(Subquery(counts), 0)
+        # ずれている検定だけを1回の UPDATE で直す
+        fixed = (
+            Exam.objects.annotate(actual_count=actual)
+            .exclude(question_count=F("actual_count"))
+            .values_list("pk", flat=True)
+        )
+        updated = Exam.objects.filter(pk__in=list(fixed)).update(question_count=actual)
+        self.stdout.write(f"{updated} 件の検定の問題数を修正しました")
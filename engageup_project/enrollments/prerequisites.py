@@ -0,0 +1,136 @@
+"""
+検定の前提条件グラフ（仮試験 → 本試験）のキャッシュ
+
+Exam.prerequisite の関係を1回のクエリで読み込み、検定ごとに前提の連鎖
+（直前の前提 → その前提 …）を解決してキャッシュに置く。
+Exam が保存・削除されるとバージョンを上げて作り直す。
+ユーザーの合格済み検定の集合と突き合わせるだけで、全検定の受験可否が分かる。
+無効化が他のプロセスにも届くよう、キャッシュは共有キャッシュの場合だけ使い、
+それ以外（LocMemCache 等）ではリクエストごとに作る。
+"""
+
+from django.core.cache import cache
+
+from common import cache_backends
+from main.models import Exam, UserExamStatus
+
+GRAPH_VERSION_KEY = "exam_prerequisite_graph_version"
+GRAPH_TIMEOUT = 60 * 60 * 24
+
+
+def invalidate():
+    if not cache_backends.is_shared():
+        return
+    try:
+        cache.incr(GRAPH_VERSION_KEY)
+    except ValueError:
+        cache.add(GRAPH_VERSION_KEY, 1, None)
+
+
+def _resolve_chains(parents):
+    """
+    {検定ID: 前提の検定ID} から検定ごとの前提の連鎖と循環を求める
+      chains : {検定ID: (直前の前提, その前提, ...)}
+      cycles : 循環している検定IDの集合（循環部分の前提は無視する）
+    """
+    chains, cycles = {}, set()
+    for exam_id in parents:
+        path = []
+        position = {}
+        node = exam_id
+        while node is not None and node not in chains and node not in position:
+            position[node] = len(path)
+            path.append(node)
+            node = parents.get(node)
+
+        if node is not None and node in position:
+            # path の途中に戻ってきた → そこから先が循環
+            cycle = path[position[node]:]
+            cycles.update(cycle)
+            for cycle_node in cycle:
+                chains[cycle_node] = ()
+            path = path[: position[node]]
+
+        tail = () if node is None else (node,) + chains[node]
+
+        # 根に近い方から連鎖を確定させる
+        for path_node in reversed(path):
+            chains[path_node] = tail
+            tail = (path_node,) + tail
+    return chains, cycles
+
+
+def build_graph():
+    """
+    前提条件グラフを作る（クエリは1回）
+      chains : {検定ID: (直前の前提, その前提, ...)}
+      titles : {検定ID: 検定名}
+      cycles : 循環している検定IDの集合
+    ※ 前提条件は本試験にだけ適用する
+    """
+    parents, titles = {}, {}
+    for exam_id, prerequisite_id, exam_type, title in Exam.objects.values_list(
+        "id", "prerequisite_id", "exam_type", "title"
+    ):
+        titles[exam_id] = title
+        parents[exam_id] = prerequisite_id if exam_type == "main" else None
+
+    chains, cycles = _resolve_chains(parents)
+    return {"chains": chains, "titles": titles, "cycles": cycles}
+
+
+def get_graph():
+    if not cache_backends.is_shared():
+        return build_graph()
+    version = cache.get_or_set(GRAPH_VERSION_KEY, 1, None)
+    key = f"exam_prerequisite_graph:{version}"
+    graph = cache.get(key)
+    if graph is None:
+        graph = build_graph()
+        cache.set(key, graph, GRAPH_TIMEOUT)
+    return graph
+
+
+def get_chain(exam_id, graph=None):
+    """前提となる検定IDを直前のものから順に返す"""
+    graph = graph or get_graph()
+    return graph["chains"].get(exam_id, ())
+
+
+def would_create_cycle(exam_id, prerequisite_id, graph=None):
+    """exam_id の前提を prerequisite_id にすると循環するか"""
+    if exam_id is None or prerequisite_id is None:
+        return False
+    return prerequisite_id == exam_id or exam_id in get_chain(prerequisite_id, graph)
+
+
+def get_passed_exam_ids(user):
+    return set(
+        UserExamStatus.objects.filter(user=user, is_passed=True).values_list(
+            "exam_id", flat=True
+        )
+    )
+
+
+def unlock_map(user, exam_ids, passed_ids=None, graph=None):
+    """
+    検定ごとの受験可否
+    {検定ID: None（受験可） または {"id", "title"}（先に合格が必要な検定）}
+    先に合格が必要な検定は、未合格の前提のうち最も根に近いもの
+    """
+    graph = graph or get_graph()
+    if passed_ids is None:
+        passed_ids = get_passed_exam_ids(user)
+
+    result = {}
+    for exam_id in exam_ids:
+        blocking = None
+        for prerequisite_id in graph["chains"].get(exam_id, ()):
+            if prerequisite_id not in passed_ids:
+                blocking = prerequisite_id
+        result[exam_id] = (
+            {"id": blocking, "title": graph["titles"].get(blocking, "")}
+            if blocking is not None
+            else None
+        )
+    return result
@@ -0,0 +1,103 @@
+"""
+検定問題の一括登録（AI生成・問題集のインポート）
+
+JSON（問題のリスト）を validate_questions() で一度だけ検証・正規化し、
+save_questions() で Question / Choice をそれぞれ bulk_create でまとめて登録する。
+AI生成ジョブ（enrollments/ai_tasks.py）と import_questions コマンドの両方から使う。
+
+JSONの形:
+[{"text": "問題文", "tag": "任意", "difficulty": 1-3（任意）,
+  "choices": [{"text": "選択肢", "is_correct": true}, ...]}, ...]
+（AIの応答に合わせて "question" / "options" / "option" も受け付ける）
+"""
+
+import random
+
+from django.db import transaction
+
+from common.bulk_import import BATCH_SIZE, bulk_create_parents, normalize_choices
+from main.models import Choice, Question
+
+from . import exam_cache
+
+CHOICE_TEXT_MAX_LENGTH = Choice._meta.get_field("text").max_length
+TAG_MAX_LENGTH = Question._meta.get_field("tag").max_length
+DIFFICULTIES = {value for value, _ in Question.DIFFICULTY_CHOICES}
+
+
+def _validate_item(item):
+    """1問分を検証して正規化した dict を返す（不正なら ValueError）"""
+    if not isinstance(item, dict):
+        raise ValueError("問題の形式が正しくありません")
+    text = str(item.get("text") or item.get("question") or "").strip()
+    if not text:
+        raise ValueError("問題文がありません")
+
+    choices = normalize_choices(
+        item.get("choices") or item.get("options"), CHOICE_TEXT_MAX_LENGTH
+    )
+    if not any(c["is_correct"] for c in choices):
+        raise ValueError("正解の選択肢がありません")
+
+    tag = str(item.get("tag") or "").strip()
+    if len(tag) > TAG_MAX_LENGTH:
+        raise ValueError(f"タグが{TAG_MAX_LENGTH}文字を超えています")
+    try:
+        difficulty = int(item.get("difficulty", 2))
+    except (TypeError, ValueError):
+        difficulty = 0
+    if difficulty not in DIFFICULTIES:
+        raise ValueError("難易度は 1〜3 で指定してください")
+
+    return {"text": text, "tag": tag, "difficulty": difficulty, "choices": choices}
+
+
+def validate_questions(data):
+    """
+    問題のリストを検証・正規化する
+    戻り値: (正しい問題のリスト, エラーメッセージのリスト)
+    """
+    if isinstance(data, dict):
+        data = data.get("questions", [data])
+    if not isinstance(data, list):
+        return [], ["問題のリストではありません"]
+
+    items, errors = [], []
+    for number, item in enumerate(data, start=1):
+        try:
+            items.append(_validate_item(item))
+        except ValueError as e:
+            errors.append(f"{number}問目: {e}")
+    return items, errors
+
+
+def save_questions(exam, items, shuffle_choices=True):
+    """
+    validate_questions() 済みの問題をまとめて登録し、登録した Question のリストを返す
+    問題数 (Exam.question_count) は QuestionManager.bulk_create が同じトランザクションで更新する
+    """
+    if not items:
+        return []
+
+    questions = [
+        Question(exam=exam, text=item["text"], tag=item["tag"], difficulty=item["difficulty"])
+        for item in items
+    ]
+    with transaction.atomic():
+        # 1件ずつ保存するDBでは、問題数はシグナルで更新される
+        bulk_create_parents(questions)
+
+        choices = []
+        for question, item in zip(questions, items):
+            item_choices = list(item["choices"])
+            if shuffle_choices:
+                random.shuffle(item_choices)
+            choices.extend(
+                Choice(question=question, text=c["text"], is_correct=c["is_correct"])
+                for c in item_choices
+            )
+        Choice.objects.bulk_create(choices, batch_size=BATCH_SIZE)
+
+    # bulk_create ではシグナルが送られないため、採点用キャッシュをここで無効化する
+    exam_cache.invalidate(exam.pk)
+    return questions
@@ -0,0 +1,27 @@
+from main.models import Question
+
+from . import exam_cache, prerequisites
+
+
+def invalidate_exam_artifact_on_exam(sender, instance, **kwargs):
+    exam_cache.invalidate(instance.pk)
+
+
+def invalidate_exam_artifact_on_question(sender, instance, **kwargs):
+    exam_cache.invalidate(instance.exam_id)
+
+
+def invalidate_exam_artifact_on_choice(sender, instance, **kwargs):
+    if not exam_cache.enabled():
+        return
+    exam_id = (
+        Question.objects.filter(pk=instance.question_id)
+        .values_list("exam_id", flat=True)
+        .first()
+    )
+    if exam_id is not None:
+        exam_cache.invalidate(exam_id)
+
+
+def invalidate_prerequisite_graph(sender, instance, **kwargs):
+    prerequisites.invalidate()
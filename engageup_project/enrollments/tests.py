@@ -1,3 +1,357 @@
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from common import cache_backends
+from main.models import (
+    AnswerLog,
+    Choice,
+    Exam,
+    ExamAttempt,
+    ExamResult,
+    Question,
+    User,
+    UserExamStatus,
+)
+
+from . import attempts, exam_cache, grading, prerequisites, question_bank
+
+
+def create_exam(question_count=3, **kwargs):
+    """問題ごとに選択肢2つ（1つ目が正解）の検定を作る"""
+    exam = Exam.objects.create(title="exam", **kwargs)
+    for i in range(question_count):
+        question = Question.objects.create(exam=exam, text=f"q{i}", tag=f"t{i % 2}")
+        Choice.objects.create(question=question, text="correct", is_correct=True)
+        Choice.objects.create(question=question, text="wrong", is_correct=False)
+    return exam
+
+
+def create_user(username="u1"):
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password="pass"
+    )
+
+
+def correct_answers(exam):
+    return {
+        str(c.question_id): str(c.pk)
+        for c in Choice.objects.filter(question__exam=exam, is_correct=True)
+    }
+
+
+@mock.patch.object(cache_backends, "is_shared", return_value=True)
+class ExamArtifactCacheTests(TestCase):
+    """採点用アーティファクトは共有キャッシュの場合だけ保持し、選択肢の変更で作り直す"""
+
+    def setUp(self):
+        cache.clear()
+        self.exam = create_exam()
+
+    def test_artifact_is_cached_until_a_choice_changes(self, _):
+        artifact = exam_cache.get_artifact(self.exam.pk)
+        with self.assertNumQueries(0):
+            exam_cache.get_artifact(self.exam.pk)
+
+        question = Question.objects.get(exam=self.exam, text="q0")
+        correct = question.choices.get(text="correct")
+        self.assertEqual(artifact["answer_key"][question.pk], correct.pk)
+        correct.is_correct = False
+        correct.save()
+        self.assertIsNone(exam_cache.get_artifact(self.exam.pk)["answer_key"][question.pk])
+
+    def test_local_cache_compiles_every_time(self, is_shared):
+        is_shared.return_value = False
+        exam_cache.get_artifact(self.exam.pk)
+        # 問題 + 選択肢
+        with self.assertNumQueries(2):
+            exam_cache.get_artifact(self.exam.pk)
+
+
+class ExamAttemptTests(TestCase):
+    """受験の再開・時間切れ・提出"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.exam = create_exam(time_limit=30, passing_score=60)
+        self.index = exam_cache.get_question_index(self.exam.pk)
+        self.artifact = exam_cache.get_artifact(self.exam.pk)
+
+    def test_unexpired_attempt_is_resumed(self):
+        attempt = attempts.start_or_resume(self.user, self.exam, self.index)
+        self.assertEqual(sorted(attempt.question_order), sorted(self.index["ids"]))
+        self.assertEqual(attempts.start_or_resume(self.user, self.exam, self.index), attempt)
+
+        ExamAttempt.objects.filter(pk=attempt.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertNotEqual(
+            attempts.start_or_resume(self.user, self.exam, self.index), attempt
+        )
+
+    def test_autosave_keeps_only_valid_answers(self):
+        attempt = attempts.start_or_resume(self.user, self.exam, self.index)
+        answers = correct_answers(self.exam)
+        first, second = attempt.question_order[:2]
+        # 他の問題の選択肢・数値でない問題IDは捨てる
+        raw = {**answers, str(first): answers[str(second)], "x": "1"}
+        self.assertTrue(attempts.save_answers(attempt, raw, self.artifact))
+        self.assertFalse(attempts.save_answers(attempt, raw, self.artifact))
+        attempt.refresh_from_db()
+        self.assertEqual(set(attempt.answers), set(answers) - {str(first)})
+
+    def test_submit_grades_once(self):
+        attempt = attempts.start_or_resume(self.user, self.exam, self.index)
+        result = attempts.submit(attempt, self.artifact, correct_answers(self.exam))
+        self.assertEqual((result["score"], result["is_passed"]), (100, True))
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, "submitted")
+        # 二重送信は採点結果を作り直さない
+        attempts.submit(attempt, self.artifact, {})
+        self.assertEqual(self.user.examresult_set.count(), 1)
+
+    def test_answers_after_grace_are_ignored(self):
+        attempt = attempts.start_or_resume(self.user, self.exam, self.index)
+        attempt.expires_at = timezone.now() - timedelta(
+            seconds=attempts.GRACE_SECONDS + 1
+        )
+        attempt.save()
+        result = attempts.submit(attempt, self.artifact, correct_answers(self.exam))
+        self.assertEqual(result["score"], 0)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, "expired")
+
+    def test_expire_overdue_grades_autosaved_answers(self):
+        attempt = attempts.start_or_resume(self.user, self.exam, self.index)
+        attempts.save_answers(attempt, correct_answers(self.exam), self.artifact)
+        fresh = attempts.start_or_resume(create_user("u2"), self.exam, self.index)
+        ExamAttempt.objects.filter(pk=attempt.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=attempts.GRACE_SECONDS + 1)
+        )
+
+        self.assertEqual(attempts.expire_overdue(), 1)
+        attempt.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((attempt.status, attempt.score), ("expired", 100))
+        self.assertEqual(fresh.status, "in_progress")
+        self.assertEqual(attempts.expire_overdue(), 0)
+
+    def test_grade_without_attempt_redirects_to_take(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("enrollments:exam_grade", args=[self.exam.pk]),
+            correct_answers(self.exam),
+        )
+        self.assertRedirects(
+            response,
+            reverse("enrollments:exam_take", args=[self.exam.pk]),
+            fetch_redirect_response=False,
+        )
+        self.assertFalse(self.user.examresult_set.exists())
+
+
+class RecordResultsTests(TestCase):
+    """採点結果（受験履歴・解答ログ・合格状況）の一括保存"""
+
+    def setUp(self):
+        self.exam = create_exam(passing_score=60)
+        self.artifact = exam_cache.compile_exam(self.exam.pk)
+
+    def grade(self, raw_answers):
+        answers = grading.parse_answers(self.artifact, raw_answers)
+        return grading.grade(self.artifact, answers, self.exam.passing_score)
+
+    def test_results_and_answer_logs_are_written(self):
+        passed, failed = create_user("u1"), create_user("u2")
+        grading.record_results([
+            (passed.pk, self.exam.pk, self.grade(correct_answers(self.exam)), None),
+            (failed.pk, self.exam.pk, self.grade({}), None),
+        ])
+
+        result = ExamResult.objects.get(user=passed)
+        self.assertEqual((result.score, result.is_passed), (100, True))
+        self.assertEqual(result.answers.filter(is_correct=True).count(), 3)
+        # 未回答の問題も不正解として記録する
+        self.assertEqual(
+            AnswerLog.objects.filter(result__user=failed, choice=None).count(), 3
+        )
+        self.assertTrue(UserExamStatus.objects.get(user=passed, exam=self.exam).is_passed)
+        self.assertFalse(UserExamStatus.objects.filter(user=failed).exists())
+
+    def test_existing_failed_status_is_upgraded_once(self):
+        user = create_user()
+        UserExamStatus.objects.create(user=user, exam=self.exam, is_passed=False)
+        grading.record_results(
+            [(user.pk, self.exam.pk, self.grade(correct_answers(self.exam)), None)]
+        )
+        status = UserExamStatus.objects.get(user=user, exam=self.exam)
+        passed_at = status.passed_at
+        self.assertTrue(status.is_passed)
+
+        grading.record_results(
+            [(user.pk, self.exam.pk, self.grade(correct_answers(self.exam)), None)]
+        )
+        status.refresh_from_db()
+        self.assertEqual(status.passed_at, passed_at)
+        self.assertEqual(ExamResult.objects.filter(user=user).count(), 2)
+
+
+class QuestionPoolTests(TestCase):
+    """問題プールの抽選（シードで再現でき、層別指定ではタグごとの割合を保つ）"""
+
+    def setUp(self):
+        cache.clear()
+        self.exam = create_exam(question_count=6, question_pool_size=4, pool_stratify="tag")
+        self.index = exam_cache.get_question_index(self.exam.pk)
+
+    def test_same_seed_draws_same_questions(self):
+        drawn = attempts.draw_question_ids(self.exam, self.index, 42)
+        self.assertEqual(drawn, attempts.draw_question_ids(self.exam, self.index, 42))
+        self.assertEqual(len(drawn), 4)
+        self.assertEqual(len(set(drawn)), 4)
+
+    def test_stratified_draw_keeps_tag_ratio(self):
+        for seed in range(20):
+            drawn = set(attempts.draw_question_ids(self.exam, self.index, seed))
+            for ids in self.index["tag"].values():
+                self.assertEqual(len(drawn & set(ids)), 2)
+
+    def test_pool_larger_than_exam_shuffles_all(self):
+        self.exam.question_pool_size = 10
+        drawn = attempts.draw_question_ids(self.exam, self.index, 1)
+        self.assertEqual(sorted(drawn), sorted(self.index["ids"]))
+
+    @mock.patch.object(cache_backends, "is_shared", return_value=True)
+    def test_index_is_invalidated_after_save_questions(self, _):
+        exam_cache.get_question_index(self.exam.pk)
+        with self.assertNumQueries(0):
+            exam_cache.get_question_index(self.exam.pk)
+
+        items, errors = question_bank.validate_questions([
+            {"text": "new", "tag": "t2", "choices": [
+                {"text": "a", "is_correct": True}, {"text": "b", "is_correct": False},
+            ]},
+        ])
+        self.assertEqual(errors, [])
+        question_bank.save_questions(self.exam, items)
+        index = exam_cache.get_question_index(self.exam.pk)
+        self.assertEqual(len(index["ids"]), 7)
+        self.assertIn("t2", index["tag"])
+
+    def test_attempt_artifact_contains_only_drawn_questions(self):
+        user = create_user()
+        attempt = attempts.start_or_resume(user, self.exam, self.index)
+        artifact = exam_cache.get_artifact_for(self.exam, attempt)
+        self.assertEqual(
+            {q["id"] for q in artifact["questions"]}, set(attempt.question_order)
+        )
+
+
+class PrerequisiteTests(TestCase):
+    """前提条件（仮試験 → 本試験）の連鎖による受験可否"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.mock1 = Exam.objects.create(title="mock1")
+        self.mock2 = Exam.objects.create(title="mock2", exam_type="main", prerequisite=self.mock1)
+        self.main = Exam.objects.create(title="main", exam_type="main", prerequisite=self.mock2)
+
+    def pass_exam(self, exam):
+        UserExamStatus.objects.create(user=self.user, exam=exam, is_passed=True)
+
+    def test_unlock_map_reports_root_most_unpassed_prerequisite(self):
+        exam_ids = [self.mock1.pk, self.mock2.pk, self.main.pk]
+        locks = prerequisites.unlock_map(self.user, exam_ids)
+        self.assertIsNone(locks[self.mock1.pk])
+        self.assertEqual(locks[self.main.pk], {"id": self.mock1.pk, "title": "mock1"})
+
+        self.pass_exam(self.mock1)
+        locks = prerequisites.unlock_map(self.user, exam_ids)
+        self.assertIsNone(locks[self.mock2.pk])
+        self.assertEqual(locks[self.main.pk]["id"], self.mock2.pk)
+
+        self.pass_exam(self.mock2)
+        self.assertIsNone(prerequisites.unlock_map(self.user, exam_ids)[self.main.pk])
+
+    def test_cycle_is_detected(self):
+        self.assertTrue(prerequisites.would_create_cycle(self.mock1.pk, self.main.pk))
+        self.assertFalse(prerequisites.would_create_cycle(self.main.pk, self.mock1.pk))
+
+    @mock.patch.object(cache_backends, "is_shared", return_value=True)
+    def test_shared_graph_is_rebuilt_when_an_exam_changes(self, _):
+        prerequisites.get_graph()
+        with self.assertNumQueries(0):
+            prerequisites.get_graph()
+
+        self.main.prerequisite = self.mock1
+        self.main.save()
+        self.assertEqual(prerequisites.get_chain(self.main.pk), (self.mock1.pk,))
+
+    def test_local_cache_builds_every_time(self):
+        prerequisites.get_graph()
+        with self.assertNumQueries(1):
+            prerequisites.get_graph()
+
+
+class QuestionBankTests(TestCase):
+    """問題集・AI応答の検証と一括登録（import_questions コマンド）"""
+
+    VALID = {"question": "q1", "tag": "t", "options": [
+        {"option": "a", "is_correct": "true"}, {"text": "b", "is_correct": False},
+    ]}
+    NO_ANSWER = {"text": "q2", "choices": [{"text": "a"}, {"text": "b"}]}
+
+    def setUp(self):
+        cache.clear()
+        self.exam = Exam.objects.create(title="e")
+
+    def test_validate_normalizes_and_reports_each_item(self):
+        items, errors = question_bank.validate_questions(
+            {"questions": [self.VALID, self.NO_ANSWER, "x"]}
+        )
+        self.assertEqual(items, [{
+            "text": "q1", "tag": "t", "difficulty": 2,
+            "choices": [{"text": "a", "is_correct": True}, {"text": "b", "is_correct": False}],
+        }])
+        self.assertEqual([e.split(":")[0] for e in errors], ["2問目", "3問目"])
+
+    def test_save_questions_keeps_choice_order(self):
+        items, _ = question_bank.validate_questions([self.VALID])
+        with self.assertNumQueries(7):
+            # セーブポイント(4) + 問題 + 問題数 + 選択肢（問題数に関わらず一定）
+            question_bank.save_questions(self.exam, items * 3, shuffle_choices=False)
+        self.exam.refresh_from_db()
+        self.assertEqual(self.exam.question_count, 3)
+        question = self.exam.questions.first()
+        self.assertEqual(
+            list(question.choices.order_by("id").values_list("text", "is_correct")),
+            [("a", True), ("b", False)],
+        )
+
+    def import_questions(self, data, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            out = StringIO()
+            call_command(
+                "import_questions", self.exam.pk, f.name, *args, stdout=out, stderr=StringIO()
+            )
+            return out.getvalue()
+
+    def test_import_is_all_or_nothing_unless_skipping_invalid(self):
+        with self.assertRaises(CommandError):
+            self.import_questions([self.VALID, self.NO_ANSWER])
+        self.assertFalse(self.exam.questions.exists())
 
-# Create your tests here.
+        self.import_questions([self.VALID, self.NO_ANSWER], "--skip-invalid")
+        self.assertEqual(self.exam.questions.count(), 1)
@@ -19,5 +19,6 @@ urlpatterns = [
     path('exam_list/', views.UserExamListView.as_view(), name='exam_list_user'),
     path('exam/<int:exam_id>/take/', views.ExamTakeView.as_view(), name='exam_take'),
     path('exam/<int:exam_id>/grade/', views.ExamGradeView.as_view(), name='exam_grade'),
+    path('exam/attempt/<int:attempt_id>/autosave/', views.ExamAutosaveView.as_view(), name='exam_autosave'),
     path('exams/<int:exam_id>/toggle-active/', views.ExamToggleActiveView.as_view(), name='exam_toggle_active'),
 ]
@@ -1,9 +1,6 @@
 import json
-import random
 import os
 from django.urls import reverse
-import fitz  # type: ignore
-import google.generativeai as genai  # type: ignore
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
@@ -11,11 +8,11 @@ from django.views.generic.base import ContextMixin
 from django.views.generic import ListView, UpdateView, TemplateView
 from django.urls import reverse_lazy
 from django.http import JsonResponse
-from google.generativeai.types import HarmCategory, HarmBlockThreshold  # type: ignore
-from common.views import BaseCreateView, BaseTemplateMixin, AdminOrModeratorRequiredMixin
-from main.models import Exam, Question, Badge, Choice, UserExamStatus
+from common import ai_jobs, dashboard_stats
+from common.views import BaseCreateView, BaseTemplateMixin, AdminOrModeratorRequiredMixin, LoginRequiredCustomMixin
+from main.models import BadgeLeaderboard, Exam, ExamAttempt, Question, Badge, Choice, UserExamStatus
 from .forms import QuestionForm, ChoiceFormSet, EditChoiceFormSet, ExamForm
-from django.db.models import Count
+from . import attempts, exam_cache, prerequisites
 
 # --- 基本表示 ---
 
@@ -97,15 +94,15 @@ class ExamCreateView(AdminOrModeratorRequiredMixin, BaseTemplateMixin, BaseCreat
         # 1. 新規アップロードがあるか確認
         new_file = self.request.FILES.get('exams_file')
         # 2. 過去のファイル選択（プルダウン）の値を確認
-        past_file_name = form.cleaned_data.get('exam_file')
+        past_file = form.cleaned_data.get('exam_file')
         
 
         if new_file:
             # 新規があればそのまま（Djangoが自動保存）
             pass
-        elif past_file_name:
+        elif past_file:
             # 新規がなく、過去のファイルが選択されていれば、そのパスをセット
-            form.instance.exams_file.name = f"exams_files/{past_file_name}"
+            form.instance.exams_file.name = past_file.name
         
         return super().form_valid(form)
     
@@ -146,12 +143,12 @@ class ExamUpdateView(AdminOrModeratorRequiredMixin, BaseTemplateMixin, UpdateVie
         elif score < 0:
             form.instance.passing_score = 0
         new_file = self.request.FILES.get('exams_file')
-        past_file_name = form.cleaned_data.get('exam_file')
+        past_file = form.cleaned_data.get('exam_file')
 
         if new_file:
             pass
-        elif past_file_name:
-            form.instance.exams_file.name = f"exams_files/{past_file_name}"
+        elif past_file:
+            form.instance.exams_file.name = past_file.name
             
         return super().form_valid(form)
 
@@ -267,18 +264,33 @@ class ExamBulkActionView(AdminOrModeratorRequiredMixin, View):
         elif action == 'restore':
             # 一括復元
             target_exams.update(is_deleted=False)
-            # オプションで前提の仮試験も復元
+            # オプションで前提の試験も（連鎖をさかのぼって）復元
             if restore_prerequisite:
-                prereq_ids = target_exams.filter(exam_type='main').values_list('prerequisite_id', flat=True)
-                target_mocks = [pid for pid in prereq_ids if pid]
-                Exam.objects.filter(id__in=target_mocks).update(is_deleted=False)
+                graph = prerequisites.get_graph()
+                target_prereqs = {
+                    prereq_id
+                    for exam_id in exam_ids if exam_id.isdigit()
+                    for prereq_id in prerequisites.get_chain(int(exam_id), graph)
+                }
+                if target_prereqs:
+                    Exam.objects.filter(id__in=target_prereqs).update(is_deleted=False)
         elif action == 'make_public':
             # 一括公開 (DB保存)
             target_exams.update(is_active=True)
         elif action == 'make_private':
             # 一括非公開 (DB保存)
             target_exams.update(is_active=False)
-        
+
+        if action in ('make_public', 'make_private'):
+            # update() はシグナルを送らないので、バッジ保持者のランキングを更新する
+            BadgeLeaderboard.objects.refresh_users(
+                UserExamStatus.objects.filter(
+                    exam__in=target_exams, exam__exam_type='main', is_passed=True
+                ).values_list('user_id', flat=True)
+            )
+        # 検定の一覧・公開状態が変わったのでホーム画面の集計を作り直す
+        dashboard_stats.invalidate_all()
+
         return redirect('enrollments:exam_list')
 
 
@@ -294,83 +306,42 @@ class AddQuestionAIView(AdminOrModeratorRequiredMixin, BaseTemplateMixin, Contex
 
     def post(self, request, exam_id):
         exam = get_object_or_404(Exam, pk=exam_id)
-        
-        if not exam.exams_file:
-            context = self.get_context_data(error='教材が登録されていません。', exam_id=exam_id)
-            return render(request, 'enrollments/enrollments_error.html', context) 
-        
-        num_questions = request.POST.get('count', 5)
-        difficulty = request.POST.get('difficulty', '中級')
+        is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
-        try:
-            with exam.exams_file.open('rb') as f:
-                file_data = f.read()
-
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            model = genai.GenerativeModel(
-                model_name="gemini-flash-latest",
-                safety_settings={
-                    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                }
-            )
-            
-            prompt = f"""
-                以下の教材内容から、4択形式の検定問題を「{num_questions}問」作成してください。
-                問題の難易度は「{difficulty}」にしてください。
-
-                【重要：JSONの構造ルール】
-                出力は必ず、以下の構造を持つJSON形式のリストのみで返してください。
-                [
-                {{
-                    "text": "問題文",
-                    "choices": [
-                    {{"text": "正解", "is_correct": true}},
-                    {{"text": "誤り", "is_correct": false}},
-                    {{"text": "誤り", "is_correct": false}},
-                    {{"text": "誤り", "is_correct": false}}
-                    ]
-                }}
-                ]
-            """
-
-            response = model.generate_content([
-                prompt, 
-                {'mime_type': 'application/pdf', 'data': file_data}
-            ])
-
-            raw_text = response.text.replace('```json', '').replace('```', '').strip()
-            quiz_data = json.loads(raw_text)
-
-            if isinstance(quiz_data, dict):
-                quiz_data = quiz_data.get('questions', [quiz_data])
-
-            for item in quiz_data:
-                q_text = item.get('text') or item.get('question')
-                if not q_text: continue
-
-                q = Question.objects.create(exam=exam, text=q_text)
-                choices_data = item.get('choices') or item.get('options')
-                if not choices_data: continue
-
-                random.shuffle(choices_data)
-                for c in choices_data:
-                    c_text = c.get('text') or c.get('option')
-                    if c_text:
-                        Choice.objects.create(
-                            question=q, 
-                            text=c_text, 
-                            is_correct=c.get('is_correct', False)
-                        )
-            
-            return redirect('enrollments:question_list', exam_id=exam.id)
-
-        except Exception as e:
-            context = self.get_context_data(error=str(e), exam_id=exam_id)
+        error = None
+        if not exam.exams_file:
+            error = '教材が登録されていません。'
+        else:
+            # 生成はワーカー（run_ai_worker）で行い、画面はジョブの状態をポーリングする
+            try:
+                job = ai_jobs.enqueue(
+                    'exam_questions',
+                    params={
+                        'count': int(request.POST.get('count', 5)),
+                        'difficulty': request.POST.get('difficulty', '中級'),
+                    },
+                    exam=exam,
+                    user=request.user,
+                )
+            except ValueError:
+                error = '生成する問題数が正しくありません。'
+            except ai_jobs.JobConflictError as e:
+                error = str(e)
+
+        if error:
+            if is_ajax:
+                return JsonResponse({'status': 'error', 'message': error}, status=400)
+            context = self.get_context_data(error=error, exam_id=exam_id)
             return render(request, 'enrollments/enrollments_error.html', context)
 
+        if is_ajax:
+            return JsonResponse({
+                'status': 'success',
+                'job_id': job.pk,
+                'status_url': reverse('ai_job_status', kwargs={'job_id': job.pk}),
+            })
+        return redirect('enrollments:question_list', exam_id=exam.id)
+
 # --- 受講者用 ---
 
 class UserExamListView(BaseTemplateMixin, ListView):
@@ -382,10 +353,9 @@ class UserExamListView(BaseTemplateMixin, ListView):
         # 1. 基本設定：削除されていない、公開中、かつ「問題数が1問以上」の検定に絞り込む
         queryset = Exam.objects.filter(
             is_deleted=False, 
-            is_active=True
-        ).annotate(
-            q_count=Count('questions')
-        ).filter(q_count__gt=0)
+            is_active=True,
+            question_count__gt=0,
+        )
 
         # 2. 【検索機能】キーワード(q)があればタイトルで絞り込み
         q = self.request.GET.get('q')
@@ -402,12 +372,18 @@ class UserExamListView(BaseTemplateMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
-            context['passed_exam_ids'] = list(UserExamStatus.objects.filter(
-                user=self.request.user, 
-                is_passed=True
-            ).values_list('exam_id', flat=True))
+            passed_ids = prerequisites.get_passed_exam_ids(self.request.user)
         else:
-            context['passed_exam_ids'] = []
+            passed_ids = set()
+        context['passed_exam_ids'] = list(passed_ids)
+
+        # 受験できない検定には、先に合格が必要な検定を持たせる（テンプレートで鍵表示）
+        exams = context['exams']
+        locks = prerequisites.unlock_map(
+            self.request.user, [exam.id for exam in exams], passed_ids=passed_ids
+        )
+        for exam in exams:
+            exam.blocking_exam = locks[exam.id]
         return context
 
 
@@ -415,72 +391,97 @@ class ExamTakeView(BaseTemplateMixin, ContextMixin, View):
     def get(self, request, exam_id):
         # 受講時も公開・削除フラグをチェック
         exam = get_object_or_404(Exam, pk=exam_id, is_active=True, is_deleted=False)
-        
         # ★ 追加：問題が1問も存在しない場合はエラーを表示してブロック
-        if not exam.questions.exists():
+        index = exam_cache.get_question_index(exam.id) if exam.question_count else None
+        if not index or not index['ids']:
             return render(request, 'enrollments/enrollments_error.html', 
                 self.get_context_data(
                     error='この検定は現在準備中のため、受講することができません。', 
                     exam_id=exam.id
                 ))
 
-        # 前提条件チェック（本試験の場合）
-        if exam.exam_type == 'main' and exam.prerequisite:
-            passed = UserExamStatus.objects.filter(user=request.user, exam=exam.prerequisite, is_passed=True).exists()
-            if not passed: 
-                return render(request, 'enrollments/enrollments_error.html', 
-                    self.get_context_data(
-                        error=f'先に「{exam.prerequisite.title}」に合格してください。', 
-                        exam_id=exam.prerequisite.id
-                    ))
-        
+        # 前提条件チェック（本試験の場合。前提の連鎖をすべて確認する）
+        blocking = prerequisites.unlock_map(request.user, [exam.id])[exam.id]
+        if blocking:
+            return render(request, 'enrollments/enrollments_error.html', 
+                self.get_context_data(
+                    error=f'先に「{blocking["title"]}」に合格してください。', 
+                    exam_id=blocking['id']
+                ))
+
+        # 受験セッションを開始（受験中のものがあれば再開）し、記録された出題順で表示する
+        # 問題プールの検定は、抽選された問題だけを取得する
+        attempt = attempts.start_or_resume(request.user, exam, index)
+        artifact = exam_cache.get_artifact_for(exam, attempt)
+        questions = attempts.ordered_questions(attempt, artifact)
         return render(request, 'enrollments/exam_take.html', 
-            self.get_context_data(exam=exam, questions=exam.questions.all().order_by('?')))
+            self.get_context_data(
+                exam=exam,
+                questions=questions,
+                attempt=attempt,
+                remaining_seconds=attempt.remaining_seconds(),
+                autosave_delay=attempts.AUTOSAVE_DELAY,
+            ))
+
+
+class ExamAutosaveView(LoginRequiredCustomMixin, View):
+    """
+    受験中の回答の自動保存
+    ブラウザは回答の変更をまとめて（一定時間おきに）全体を送ってくる
+    """
+
+    def post(self, request, attempt_id):
+        attempt = get_object_or_404(
+            ExamAttempt.objects.select_related('exam'), pk=attempt_id, user=request.user
+        )
+        if not attempts.accepts_answers(attempt):
+            return JsonResponse(
+                {"status": "error", "message": "この受験はすでに終了しています。"}, status=409
+            )
+        try:
+            data = json.loads(request.body)
+            saved = attempts.save_answers(attempt, data.get("answers", {}))
+        except (ValueError, AttributeError) as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
+        return JsonResponse({
+            "status": "success",
+            "saved": saved,
+            "remaining_seconds": attempt.remaining_seconds(),
+        })
+
+
 class ExamGradeView(BaseTemplateMixin, ContextMixin, View):
     def post(self, request, exam_id):
         exam = get_object_or_404(Exam, pk=exam_id)
-        questions = exam.questions.all()
-        
-        correct_count = 0
-        result_details = [] # ★ 復習用の詳細リスト
-
-        for q in questions:
-            user_choice_id = request.POST.get(f'question_{q.id}')
-            user_choice = None
-            if user_choice_id:
-                user_choice = Choice.objects.filter(pk=user_choice_id).first()
-            
-            # 正解の選択肢を取得
-            correct_choice = q.choices.filter(is_correct=True).first()
-            
-            # 判定
-            is_correct = (user_choice == correct_choice)
-            if is_correct:
-                correct_count += 1
-            
-            # 復習用データを格納
-            result_details.append({
-                'question': q,
-                'user_choice': user_choice,
-                'correct_choice': correct_choice,
-                'is_correct': is_correct
-            })
-        
-        total = questions.count()
-        score = int(round((correct_count / total) * 100)) if total > 0 else 0
-        is_passed = score >= exam.passing_score
+        raw_answers = {
+            key[len('question_'):]: value
+            for key, value in request.POST.items()
+            if key.startswith('question_')
+        }
+
+        attempt_id = request.POST.get('attempt_id', '')
+        attempt = ExamAttempt.objects.filter(
+            pk=int(attempt_id) if attempt_id.isdigit() else None,
+            user=request.user,
+            exam=exam,
+        ).first()
+
+        if attempt is None:
+            # 受験セッションのない送信は採点しない（制限時間・出題順を確認できないため）
+            # 受験画面に戻し、受験中のセッションを再開または新しく開始させる
+            return redirect('enrollments:exam_take', exam_id=exam.id)
 
-        if is_passed:
-            status, _ = UserExamStatus.objects.get_or_create(user=request.user, exam=exam)
-            status.is_passed = True
-            status.save()
+        # 出題順・制限時刻はサーバー側の記録で判定する
+        attempt.exam = exam
+        artifact = exam_cache.get_artifact_for(exam, attempt)
+        result = attempts.submit(attempt, artifact, raw_answers)
 
         context = self.get_context_data(
             exam=exam, 
-            score=score, 
-            is_passed=is_passed, 
-            correct_count=correct_count, 
-            total=total,
-            result_details=result_details # ★ HTMLに渡す
+            score=result['score'], 
+            is_passed=result['is_passed'], 
+            correct_count=result['correct_count'], 
+            total=result['total'],
+            result_details=result['details'] # ★ HTMLに渡す
         )
         return render(request, 'enrollments/exam_result.html', context)
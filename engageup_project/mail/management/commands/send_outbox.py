@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mail import outbox
+
+
+class Command(BaseCommand):
+    help = "送信キュー (OutboundEmail) のメールを1つのSMTP接続でまとめて送信します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=outbox.BATCH_SIZE,
+            help="1回に取り出して送る件数",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=outbox.RATE_LIMIT,
+            help="1秒あたりの送信数の上限（0: 制限なし）",
+        )
+        parser.add_argument(
+            "--loop", action="store_true", help="終了せずに定期的に送信を続ける"
+        )
+        parser.add_argument(
+            "--interval", type=int, default=30, help="--loop 時の確認間隔（秒）"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                totals = outbox.drain(
+                    batch_size=max(options["batch_size"], 1),
+                    rate=options["rate"],
+                    on_batch=lambda result: self.stdout.write(
+                        f"送信 {result['sent']} 件 / 再送待ち {result['retry']} 件 / 失敗 {result['failed']} 件"
+                    ),
+                )
+            except OSError as e:
+                # SMTPサーバーに接続できない（メールは送信待ちのまま）
+                self.stderr.write(f"SMTPサーバーに接続できません: {e}")
+            else:
+                self.stdout.write(
+                    f"{totals['sent']} 件のメールを送信しました"
+                    f"（再送待ち {totals['retry']} 件、失敗 {totals['failed']} 件）"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
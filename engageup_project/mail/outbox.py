@@ -0,0 +1,228 @@
+"""
+メールの送信キュー（DB: OutboundEmail）
+
+画面からは enqueue_news() などで宛先ごとの行を bulk_create で登録してすぐに応答を返し、
+send_outbox コマンドが1つのSMTP接続を使い回してまとめて送信する。
+・1回に取り出す件数は EMAIL_OUTBOX_BATCH_SIZE、送信の速さは EMAIL_OUTBOX_RATE_LIMIT 件/秒まで
+・一時的なエラーは指数バックオフで再送する（最大 EMAIL_OUTBOX_MAX_ATTEMPTS 回）
+・宛先の拒否など 5xx のエラーは再送しない
+・ワーカーが落ちて sending のまま残ったメールは EMAIL_OUTBOX_STALE_TIMEOUT 秒後に戻す
+"""
+
+import logging
+import random
+import smtplib
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from main.models import OutboundEmail, User
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 100)
+RATE_LIMIT = getattr(settings, "EMAIL_OUTBOX_RATE_LIMIT", 10)
+MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+RETRY_BACKOFF = getattr(settings, "EMAIL_OUTBOX_RETRY_BACKOFF", 60)
+STALE_TIMEOUT = getattr(settings, "EMAIL_OUTBOX_STALE_TIMEOUT", 600)
+INSERT_BATCH_SIZE = 500
+
+
+def news_message(news):
+    """お知らせメールの件名・本文"""
+    return news.title, f"【ねこねこ薬局】{news.title}\n\n{news.content}"
+
+
+def enqueue_news(news):
+    """お知らせを全アクティブユーザー宛てに登録する（1回の bulk_create）。登録した件数を返す"""
+    subject, body = news_message(news)
+    emails = (
+        User.objects.filter(is_active=True)
+        .exclude(email="")
+        .values_list("email", flat=True)
+        .order_by("pk")
+    )
+    rows = OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(
+                to_email=email,
+                subject=subject,
+                body=body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                news=news,
+                max_attempts=MAX_ATTEMPTS,
+            )
+            for email in emails
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    return len(rows)
+
+
+def requeue_stale(now=None):
+    """一定時間以上 sending のままのメールを送信待ちに戻す（上限回数に達していれば失敗）"""
+    now = now or timezone.now()
+    stale = OutboundEmail.objects.filter(
+        status="sending", claimed_at__lt=now - timedelta(seconds=STALE_TIMEOUT)
+    )
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status="failed", error="タイムアウトしました", claim_token=""
+    )
+    requeued = stale.update(status="pending", run_after=now, claim_token="")
+    return failed + requeued
+
+
+def claim_batch(size=BATCH_SIZE, now=None):
+    """
+    送信可能なメールを最大 size 件取り出して sending にする
+    取り出した行には識別子を付けるので、複数ワーカーでも同じメールを二重に送らない
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    ids = list(
+        OutboundEmail.objects.filter(status="pending", run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("pk", flat=True)[:size]
+    )
+    if not ids:
+        return []
+    OutboundEmail.objects.filter(pk__in=ids, status="pending").update(
+        status="sending", claim_token=token, claimed_at=now, attempts=F("attempts") + 1
+    )
+    return list(OutboundEmail.objects.filter(claim_token=token).order_by("id"))
+
+
+def is_permanent(error):
+    """再送しても結果が変わらないエラー（宛先・差出人の拒否などの 5xx）か"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+def is_disconnected(error):
+    """接続が切れたエラー（次のメールは接続し直して送る）"""
+    # SMTPException も OSError のサブクラスなので、応答コードのあるエラーは除く
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def retry_delay(email):
+    """次の送信までの待ち時間（秒）。指数バックオフ + ゆらぎ"""
+    return RETRY_BACKOFF * (2 ** max(email.attempts - 1, 0)) + random.uniform(0, RETRY_BACKOFF)
+
+
+class RateLimiter:
+    """1秒あたり rate 件を超えないように待つ（0 なら待たない）"""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / rate if rate else 0
+        self.clock = clock
+        self.sleep = sleep
+        self.next_at = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = self.clock()
+        if self.next_at is not None and now < self.next_at:
+            self.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def _message(email, connection):
+    return EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[email.to_email],
+        connection=connection,
+    )
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def send_batch(emails, connection, limiter):
+    """
+    取り出したメールを開いている接続で1件ずつ send_messages に渡し、結果を保存する
+    （1件ずつ渡すのは、どのメールが失敗したかを記録するため。接続は使い回す）
+    戻り値: {"sent": n, "retry": n, "failed": n}
+    """
+    sent_ids, retried, failed = [], [], []
+    for email in emails:
+        limiter.wait()
+        try:
+            if connection.send_messages([_message(email, connection)]):
+                sent_ids.append(email.pk)
+                continue
+            error = ValueError("宛先がありません")
+        except Exception as e:
+            error = e
+            if is_disconnected(e):
+                # 切れた接続は閉じる（次の send_messages で接続し直す）
+                _close(connection)
+
+        now = timezone.now()
+        logger.warning("メール #%s（%s）の送信に失敗しました: %s", email.pk, email.to_email, error)
+        email.error = str(error)
+        email.claim_token = ""
+        email.updated_at = now
+        if is_permanent(error) or email.attempts >= email.max_attempts:
+            email.status = "failed"
+            failed.append(email)
+        else:
+            email.status = "pending"
+            email.run_after = now + timedelta(seconds=retry_delay(email))
+            retried.append(email)
+
+    if sent_ids:
+        now = timezone.now()
+        OutboundEmail.objects.filter(pk__in=sent_ids).update(
+            status="sent", sent_at=now, error="", claim_token="", updated_at=now
+        )
+    OutboundEmail.objects.bulk_update(
+        retried + failed, ["status", "run_after", "error", "claim_token", "updated_at"]
+    )
+    return {"sent": len(sent_ids), "retry": len(retried), "failed": len(failed)}
+
+
+def drain(batch_size=BATCH_SIZE, rate=RATE_LIMIT, connection=None, on_batch=None):
+    """
+    送信可能なメールがなくなるまで送る（send_outbox コマンド）
+    SMTP接続は最初に1回開いて全バッチで使い回す
+    on_batch: バッチごとに結果 dict を受け取る関数（進捗表示用）
+    戻り値: {"sent": n, "retry": n, "failed": n}
+    """
+    totals = {"sent": 0, "retry": 0, "failed": 0}
+    requeue_stale()
+    if not OutboundEmail.objects.filter(status="pending", run_after__lte=timezone.now()).exists():
+        return totals
+
+    # 接続できない場合はメールを取り出さずに例外を出す（送信回数を消費しない）
+    connection = connection or get_connection()
+    connection.open()
+    limiter = RateLimiter(rate)
+    try:
+        while True:
+            emails = claim_batch(batch_size)
+            if not emails:
+                break
+            result = send_batch(emails, connection, limiter)
+            for key, value in result.items():
+                totals[key] += value
+            if on_batch:
+                on_batch(result)
+    finally:
+        _close(connection)
+    return totals
@@ -1,3 +1,136 @@
-from django.test import TestCase
+import smtplib
+import socket
+import unittest
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import RequestFactory, TestCase, override_settings
+
+from main.models import News, OutboundEmail, User
+
+from . import outbox
+from .views import NewsCreateView
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.handlers import Sink
+except ImportError:
+    Controller = None
+
+
+class RefusingBackend(EmailBackend):
+    """refused@ 宛ては 550 で拒否し、開いた回数を数える"""
+
+    opened = 0
+
+    def open(self):
+        RefusingBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(to.startswith("refused@") for to in message.to):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b"no such user")})
+        return super().send_messages(messages)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.moderator = User.objects.create_user(
+            username="mod", email="mod@example.com", password="pass", rank="moderator"
+        )
+        for i in range(5):
+            User.objects.create_user(
+                username=f"staff{i}", email=f"staff{i}@example.com", password="pass", rank="staff"
+            )
+        User.objects.create_user(
+            username="gone", email="gone@example.com", password="pass", is_active=False
+        )
+
+    def create_news(self):
+        request = RequestFactory().post(
+            "/", {"title": "t", "content": "body", "category": "news"}
+        )
+        request.user = self.moderator
+        view = NewsCreateView()
+        view.setup(request)
+        view.post(request)
+        return News.objects.get()
+
+    def test_news_is_queued_with_one_insert_and_not_sent_in_request(self):
+        with self.assertNumQueries(4):
+            # News の INSERT + 宛先の SELECT + OutboundEmail の bulk_create（+ テスト側の News 取得）
+            news = self.create_news()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(news.outbound_emails.filter(status="pending").count(), 6)
+
+    def test_drain_sends_batches_over_one_connection(self):
+        self.create_news()
+        results = []
+        RefusingBackend.opened = 0
+        totals = outbox.drain(
+            batch_size=4,
+            rate=0,
+            connection=RefusingBackend(),
+            on_batch=results.append,
+        )
+        self.assertEqual(totals, {"sent": 6, "retry": 0, "failed": 0})
+        self.assertEqual([r["sent"] for r in results], [4, 2])
+        self.assertEqual(RefusingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertFalse(OutboundEmail.objects.exclude(status="sent").exists())
+
+    def test_refused_recipient_fails_and_disconnect_is_retried(self):
+        OutboundEmail.objects.create(to_email="ok@example.com", subject="s", body="b")
+        refused = OutboundEmail.objects.create(to_email="refused@example.com", subject="s", body="b")
+
+        totals = outbox.drain(rate=0, connection=RefusingBackend())
+        self.assertEqual(totals, {"sent": 1, "retry": 0, "failed": 1})
+        refused.refresh_from_db()
+        self.assertEqual((refused.status, refused.attempts), ("failed", 1))
+
+        class DisconnectingBackend(EmailBackend):
+            def send_messages(self, messages):
+                raise smtplib.SMTPServerDisconnected("closed")
+
+        pending = OutboundEmail.objects.create(to_email="later@example.com", subject="s", body="b")
+        totals = outbox.drain(rate=0, connection=DisconnectingBackend())
+        self.assertEqual(totals, {"sent": 0, "retry": 1, "failed": 0})
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, "pending")
+        self.assertGreater(pending.run_after, pending.created_at)
+
+    def test_rate_limiter_spaces_sends(self):
+        clock = [0.0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            clock[0] += seconds
+
+        limiter = outbox.RateLimiter(4, clock=lambda: clock[0], sleep=sleep)
+        for _ in range(3):
+            limiter.wait()
+        self.assertEqual(slept, [0.25, 0.25])
+
+    @unittest.skipIf(Controller is None, "aiosmtpd がインストールされていません")
+    def test_drain_against_local_smtp_sink(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        controller = Controller(Sink(), hostname="127.0.0.1", port=port)
+        controller.start()
+        self.addCleanup(controller.stop)
+
+        self.create_news()
+        with override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+        ):
+            totals = outbox.drain(rate=0, connection=get_connection())
+        self.assertEqual(totals["sent"], 6)
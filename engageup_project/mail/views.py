@@ -5,12 +5,12 @@ from django.views.generic import ListView, CreateView
 from django.urls import reverse_lazy
 from django.http import JsonResponse
 from django.db.models import Q
-from django.core.mail import send_mail
-from django.conf import settings
 
 # 共通Mixinのインポート
 from common.views import AdminOrModeratorRequiredMixin, BaseTemplateMixin
-from main.models import User, News
+from main.models import News
+
+from . import outbox
 
 # --- お知らせ作成 ---
 class NewsCreateView(AdminOrModeratorRequiredMixin, BaseTemplateMixin, CreateView):
@@ -23,19 +23,8 @@ class NewsCreateView(AdminOrModeratorRequiredMixin, BaseTemplateMixin, CreateVie
         form.instance.author = self.request.user
         response = super().form_valid(form)
 
-        # 全アクティブユーザーにメール送信
-        title = form.cleaned_data["title"]
-        message = form.cleaned_data["content"]
-        users = User.objects.filter(is_active=True).exclude(email="")
-
-        for user in users:
-            send_mail(
-                subject=title,
-                message=f"【ねこねこ薬局】{title}\n\n{message}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=True,
-            )
+        # 全アクティブユーザー宛てのメールを送信キューに登録（送信は send_outbox コマンド）
+        outbox.enqueue_news(self.object)
         return response
 
 # --- お知らせ履歴（一覧） ---
@@ -8,6 +8,43 @@ class MainConfig(AppConfig):
     name = 'main'
 
     def ready(self):
-        from django.db.models.signals import post_migrate
-        from .signals import create_initial_constant
-        post_migrate.connect(create_initial_constant, sender=self)
\ No newline at end of file
+        from django.db.models.signals import post_init, post_migrate, post_save, post_delete, pre_delete
+        from .models import Exam, Question, TrainingModule, User, UserModuleProgress
+        from .signals import (
+            create_initial_constant,
+            remember_progress_state,
+            sync_course_progress_on_progress_save,
+            sync_course_progress_on_progress_delete,
+            remember_module_state,
+            sync_course_progress_on_module_save,
+            sync_course_progress_on_module_delete,
+            increment_question_count,
+            decrement_question_count,
+            remember_badge_state,
+            sync_badge_leaderboard_on_exam_save,
+            remember_badge_holders_on_exam_delete,
+            sync_badge_leaderboard_on_exam_delete,
+            remember_rank,
+            sync_badge_leaderboard_on_user_save,
+        )
+        post_migrate.connect(create_initial_constant, sender=self)
+
+        # コース進捗サマリー (UserCourseProgress) の同期
+        post_init.connect(remember_progress_state, sender=UserModuleProgress)
+        post_save.connect(sync_course_progress_on_progress_save, sender=UserModuleProgress)
+        post_delete.connect(sync_course_progress_on_progress_delete, sender=UserModuleProgress)
+        post_init.connect(remember_module_state, sender=TrainingModule)
+        post_save.connect(sync_course_progress_on_module_save, sender=TrainingModule)
+        post_delete.connect(sync_course_progress_on_module_delete, sender=TrainingModule)
+
+        # 検定の問題数 (Exam.question_count) の同期
+        post_save.connect(increment_question_count, sender=Question)
+        post_delete.connect(decrement_question_count, sender=Question)
+
+        # バッジ獲得ランキング (BadgeLeaderboard) の同期
+        post_init.connect(remember_badge_state, sender=Exam)
+        post_save.connect(sync_badge_leaderboard_on_exam_save, sender=Exam)
+        pre_delete.connect(remember_badge_holders_on_exam_delete, sender=Exam)
+        post_delete.connect(sync_badge_leaderboard_on_exam_delete, sender=Exam)
+        post_init.connect(remember_rank, sender=User)
+        post_save.connect(sync_badge_leaderboard_on_user_save, sender=User)
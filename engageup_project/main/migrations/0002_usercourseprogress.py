@@ -0,0 +1,67 @@
+# Generated by Django 4.0 on 2026-10-17 19:12
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def fill_course_progress(apps, schema_editor):
+    # UserCourseProgress.objects.rebuild() と同じ集計（履歴上のモデルで行う）
+    TrainingModule = apps.get_model("main", "TrainingModule")
+    UserModuleProgress = apps.get_model("main", "UserModuleProgress")
+    UserCourseProgress = apps.get_model("main", "UserCourseProgress")
+    total_map = dict(
+        TrainingModule.objects.filter(is_active=True)
+        .values("course_id")
+        .annotate(total=Count("id"))
+        .values_list("course_id", "total")
+    )
+    done_rows = (
+        UserModuleProgress.objects.filter(module__is_active=True, is_completed=True)
+        .values("user_id", "module__course_id")
+        .annotate(done=Count("id"))
+    )
+    now = timezone.now()
+    rows = []
+    for item in done_rows:
+        done, total = item["done"], total_map.get(item["module__course_id"], 0)
+        is_completed = total > 0 and done >= total
+        rows.append(
+            UserCourseProgress(
+                user_id=item["user_id"],
+                course_id=item["module__course_id"],
+                done_count=done,
+                total_active=total,
+                percent=int(done / total * 100) if total > 0 else 0,
+                completed_at=now if is_completed else None,
+            )
+        )
+    UserCourseProgress.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('done_count', models.PositiveIntegerField(default=0, verbose_name='完了した研修数')),
+                ('total_active', models.PositiveIntegerField(default=0, verbose_name='有効な研修数')),
+                ('percent', models.PositiveSmallIntegerField(default=0, verbose_name='進捗率(%)')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='コース完了日時')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_progresses', to='main.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progresses', to='main.user')),
+            ],
+            options={
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.RunPython(fill_course_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0 on 2026-10-17 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_usercourseprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingmodule',
+            name='hls_playlist',
+            field=models.CharField(blank=True, max_length=255, verbose_name='HLSマスタープレイリスト'),
+        ),
+        migrations.AddField(
+            model_name='trainingmodule',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='training_thumbnails/', verbose_name='サムネイル'),
+        ),
+        migrations.AddField(
+            model_name='trainingmodule',
+            name='video_error',
+            field=models.TextField(blank=True, verbose_name='変換エラー'),
+        ),
+        migrations.AddField(
+            model_name='trainingmodule',
+            name='video_status',
+            field=models.CharField(choices=[('none', '動画なし'), ('pending', '変換待ち'), ('processing', '変換中'), ('ready', '配信準備完了'), ('failed', '変換失敗')], default='none', max_length=20, verbose_name='動画の変換状況'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.0 on 2026-10-17 19:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_trainingmodule_hls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('in_progress', '受験中'), ('submitted', '提出済み'), ('expired', '時間切れ')], default='in_progress', max_length=20, verbose_name='状態')),
+                ('seed', models.BigIntegerField(verbose_name='出題順シード')),
+                ('question_order', models.JSONField(default=list, verbose_name='出題順(問題ID)')),
+                ('answers', models.JSONField(default=dict, verbose_name='回答 {問題ID: 選択肢ID}')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='開始日時')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='制限時刻')),
+                ('submitted_at', models.DateTimeField(blank=True, null=True, verbose_name='提出日時')),
+                ('score', models.IntegerField(blank=True, null=True, verbose_name='獲得スコア')),
+                ('is_passed', models.BooleanField(blank=True, null=True, verbose_name='合否')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='main.exam', verbose_name='検定')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_attempts', to='main.user', verbose_name='受験者')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['status', 'expires_at'], name='main_examat_status_b3ad2a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['user', 'exam', 'status'], name='main_examat_user_id_ba7772_idx'),
+        ),
+    ]
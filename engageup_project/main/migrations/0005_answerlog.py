@@ -0,0 +1,29 @@
+# Generated by Django 4.0 on 2026-10-17 19:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_examattempt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examresult',
+            name='attempt',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='result', to='main.examattempt', verbose_name='受験セッション'),
+        ),
+        migrations.CreateModel(
+            name='AnswerLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_correct', models.BooleanField(verbose_name='正解したか')),
+                ('choice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main.choice', verbose_name='選択した選択肢')),
+                ('question', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main.question', verbose_name='問題')),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='main.examresult', verbose_name='受験履歴')),
+            ],
+        ),
+    ]
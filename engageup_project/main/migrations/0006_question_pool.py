@@ -0,0 +1,33 @@
+# Generated by Django 4.0 on 2026-10-17 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_answerlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='pool_stratify',
+            field=models.CharField(blank=True, choices=[('', 'しない'), ('tag', 'タグごと'), ('difficulty', '難易度ごと')], default='', help_text='問題プールから出題する時、タグ・難易度ごとの割合を保つ', max_length=20, verbose_name='出題の偏り防止'),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='question_pool_size',
+            field=models.PositiveIntegerField(default=0, help_text='0を入力すると全問題を出題します', verbose_name='出題数'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='difficulty',
+            field=models.PositiveSmallIntegerField(choices=[(1, '易しい'), (2, '普通'), (3, '難しい')], default=2, verbose_name='難易度'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='tag',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='タグ'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0 on 2026-10-17 19:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_question_count(apps, schema_editor):
+    Exam = apps.get_model("main", "Exam")
+    Question = apps.get_model("main", "Question")
+    counts = (
+        Question.objects.filter(exam=OuterRef("pk"))
+        .values("exam")
+        .annotate(c=Count("id"))
+        .values("c")
+    )
+    Exam.objects.update(question_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_question_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='question_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='問題数'),
+        ),
+        migrations.RunPython(fill_question_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.0 on 2026-10-17 19:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_exam_question_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('exam_questions', '検定問題の生成'), ('module_content', '研修内容の生成')], max_length=30, verbose_name='種類')),
+                ('status', models.CharField(choices=[('pending', '待機中'), ('running', '実行中'), ('succeeded', '完了'), ('failed', '失敗')], default='pending', max_length=20, verbose_name='状態')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='生成条件')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='結果')),
+                ('error', models.TextField(blank=True, default='', verbose_name='エラー内容')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='実行回数')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='最大実行回数')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='実行可能日時')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='終了日時')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ai_jobs', to='main.user', verbose_name='依頼者')),
+                ('exam', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ai_jobs', to='main.exam')),
+                ('module', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ai_jobs', to='main.trainingmodule')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='aijob',
+            index=models.Index(fields=['status', 'run_after'], name='main_aijob_status_d2cca3_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.0 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_aijob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='ファイルのSHA-256')),
+                ('text', models.TextField(blank=True, verbose_name='本文')),
+                ('page_offsets', models.JSONField(default=list, verbose_name='ページ開始位置')),
+                ('page_count', models.PositiveIntegerField(default=0, verbose_name='ページ数')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
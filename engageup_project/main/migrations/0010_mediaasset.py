@@ -0,0 +1,27 @@
+# Generated by Django 4.0 on 2026-10-17 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_documenttext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='ファイル名（MEDIA_ROOTからの相対パス）')),
+                ('size', models.BigIntegerField(default=0, verbose_name='サイズ（バイト）')),
+                ('sha256', models.CharField(db_index=True, max_length=64, verbose_name='ファイルのSHA-256')),
+                ('page_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='ページ数（PDFのみ）')),
+                ('uploaded_at', models.DateTimeField(db_index=True, verbose_name='アップロード日時')),
+            ],
+            options={
+                'ordering': ['-uploaded_at', 'name'],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.0 on 2026-10-17 19:39
+
+from collections import Counter
+
+import common.storage
+from django.db import migrations, models
+
+REFERENCE_FIELDS = [
+    ("Exam", "exams_file"),
+    ("TrainingModule", "training_file"),
+    ("TrainingModule", "video"),
+    ("Badge", "icon"),
+    ("User", "avatar"),
+]
+
+
+def fill_original_name_and_ref_count(apps, schema_editor):
+    MediaAsset = apps.get_model("main", "MediaAsset")
+    counts = Counter()
+    for model_name, field_name in REFERENCE_FIELDS:
+        counts.update(
+            apps.get_model("main", model_name)
+            .objects.exclude(**{field_name: ""})
+            .exclude(**{f"{field_name}__isnull": True})
+            .values_list(field_name, flat=True)
+        )
+    assets = list(MediaAsset.objects.all())
+    for asset in assets:
+        asset.original_name = asset.name.rsplit("/", 1)[-1]
+        asset.ref_count = counts.get(asset.name, 0)
+    MediaAsset.objects.bulk_update(assets, ["original_name", "ref_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_mediaasset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaasset',
+            name='original_name',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='アップロード時のファイル名'),
+        ),
+        migrations.AddField(
+            model_name='mediaasset',
+            name='ref_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='参照数'),
+        ),
+        migrations.AlterField(
+            model_name='badge',
+            name='icon',
+            field=models.ImageField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='badges/', verbose_name='バッジ画像'),
+        ),
+        migrations.AlterField(
+            model_name='exam',
+            name='exams_file',
+            field=models.FileField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='exams_files/', verbose_name='教材ファイル'),
+        ),
+        migrations.AlterField(
+            model_name='trainingmodule',
+            name='training_file',
+            field=models.FileField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='exams_files/', verbose_name='要約元資料(PDF/画像)'),
+        ),
+        migrations.AlterField(
+            model_name='trainingmodule',
+            name='video',
+            field=models.FileField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='training_videos/', verbose_name='研修動画'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='avatars/', verbose_name='プロフィール写真'),
+        ),
+        migrations.RunPython(fill_original_name_and_ref_count, migrations.RunPython.noop),
+    ]
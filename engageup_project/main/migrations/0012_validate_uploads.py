@@ -0,0 +1,40 @@
+# Generated by Django 4.0 on 2026-10-17 19:41
+
+import common.storage
+import common.uploads
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_dedup_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='badge',
+            name='icon',
+            field=models.ImageField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='badges/', validators=[common.uploads.validate_upload], verbose_name='バッジ画像'),
+        ),
+        migrations.AlterField(
+            model_name='exam',
+            name='exams_file',
+            field=models.FileField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='exams_files/', validators=[common.uploads.validate_upload], verbose_name='教材ファイル'),
+        ),
+        migrations.AlterField(
+            model_name='trainingmodule',
+            name='training_file',
+            field=models.FileField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='exams_files/', validators=[common.uploads.validate_upload], verbose_name='要約元資料(PDF/画像)'),
+        ),
+        migrations.AlterField(
+            model_name='trainingmodule',
+            name='video',
+            field=models.FileField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='training_videos/', validators=[common.uploads.validate_upload], verbose_name='研修動画'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=common.storage.DedupStorage(), upload_to='avatars/', validators=[common.uploads.validate_upload], verbose_name='プロフィール写真'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.0 on 2026-10-17 19:43
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_leaderboard(apps, schema_editor):
+    BadgeLeaderboard = apps.get_model("main", "BadgeLeaderboard")
+    UserExamStatus = apps.get_model("main", "UserExamStatus")
+    rows = (
+        UserExamStatus.objects.filter(
+            user__rank="staff",
+            is_passed=True,
+            exam__exam_type="main",
+            exam__is_active=True,
+        )
+        .values("user_id")
+        .annotate(badge_count=Count("id"), last_passed_at=Max("passed_at"))
+    )
+    BadgeLeaderboard.objects.bulk_create(
+        [BadgeLeaderboard(**row) for row in rows], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_validate_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BadgeLeaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('badge_count', models.PositiveIntegerField(default=0, verbose_name='バッジ数')),
+                ('last_passed_at', models.DateTimeField(blank=True, null=True, verbose_name='最後に獲得した日時')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='badge_leaderboard', to='main.user', verbose_name='ユーザー')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='badgeleaderboard',
+            index=models.Index(fields=['-badge_count', 'last_passed_at'], name='main_badgel_badge_c_e04e4d_idx'),
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
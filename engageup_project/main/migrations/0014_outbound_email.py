@@ -0,0 +1,44 @@
+# Generated by Django 4.0 on 2026-10-17 19:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_badgeleaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_email', models.EmailField(max_length=254, verbose_name='宛先')),
+                ('subject', models.CharField(max_length=255, verbose_name='件名')),
+                ('body', models.TextField(verbose_name='本文')),
+                ('from_email', models.CharField(blank=True, default='', max_length=255, verbose_name='差出人')),
+                ('status', models.CharField(choices=[('pending', '送信待ち'), ('sending', '送信中'), ('sent', '送信済み'), ('failed', '失敗')], default='pending', max_length=20, verbose_name='状態')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='送信回数')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='最大送信回数')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='送信可能日時')),
+                ('claim_token', models.CharField(blank=True, default='', max_length=32, verbose_name='取り出したワーカーの識別子')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='取り出した日時')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='送信日時')),
+                ('error', models.TextField(blank=True, default='', verbose_name='エラー内容')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('news', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbound_emails', to='main.news', verbose_name='お知らせ')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['status', 'run_after'], name='main_outbou_status_72c808_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['claim_token'], name='main_outbou_claim_t_71248a_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.0 on 2026-10-17 19:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_outbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProvisioningJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('create_users', 'アカウントの連番作成'), ('reset_passwords', 'パスワードの再発行')], max_length=30, verbose_name='種類')),
+                ('status', models.CharField(choices=[('pending', '待機中'), ('running', '実行中'), ('succeeded', '完了'), ('failed', '失敗')], default='pending', max_length=20, verbose_name='状態')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='条件')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='結果')),
+                ('error', models.TextField(blank=True, default='', verbose_name='エラー内容')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='対象件数')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='処理済み件数')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='終了日時')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='provisioning_jobs', to='main.user', verbose_name='依頼者')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='provisioningjob',
+            index=models.Index(fields=['status', 'id'], name='main_provis_status_013a66_idx'),
+        ),
+    ]
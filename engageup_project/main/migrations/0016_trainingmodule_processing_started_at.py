@@ -0,0 +1,18 @@
+# Generated by Django 4.0 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_provisioning_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingmodule',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='変換開始日時'),
+        ),
+    ]
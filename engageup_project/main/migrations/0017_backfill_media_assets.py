@@ -0,0 +1,104 @@
+from collections import Counter
+import hashlib
+import os
+
+from django.core.files.storage import default_storage
+from django.db import migrations
+from django.utils import timezone
+
+# 索引を作る前からあるファイルを登録する（以降はアップロード時にストレージが登録する）
+UPLOAD_DIRS = ["exams_files", "training_videos", "badges", "avatars"]
+
+REFERENCE_FIELDS = [
+    ("Exam", "exams_file"),
+    ("TrainingModule", "training_file"),
+    ("TrainingModule", "video"),
+    ("Badge", "icon"),
+    ("User", "avatar"),
+]
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _walk(directory):
+    try:
+        dirs, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for f in files:
+        if not f.endswith(".upload"):
+            yield f"{directory}/{f}"
+    for d in dirs:
+        yield from _walk(f"{directory}/{d}")
+
+
+def _inspect(name):
+    digest = hashlib.sha256()
+    size = 0
+    with default_storage.open(name, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def _page_count(name):
+    if not name.lower().endswith(".pdf"):
+        return None
+    try:
+        import fitz  # type: ignore
+
+        with fitz.open(default_storage.path(name)) as pdf:
+            return pdf.page_count
+    except Exception:
+        return None
+
+
+def _modified_time(name):
+    try:
+        return default_storage.get_modified_time(name)
+    except (NotImplementedError, OSError):
+        return timezone.now()
+
+
+def index_existing_files(apps, schema_editor):
+    MediaAsset = apps.get_model("main", "MediaAsset")
+    counts = Counter()
+    for model_name, field_name in REFERENCE_FIELDS:
+        counts.update(
+            apps.get_model("main", model_name)
+            .objects.exclude(**{field_name: ""})
+            .exclude(**{f"{field_name}__isnull": True})
+            .values_list(field_name, flat=True)
+        )
+
+    indexed = set(MediaAsset.objects.values_list("name", flat=True))
+    assets = []
+    for directory in UPLOAD_DIRS:
+        for name in _walk(directory):
+            if name in indexed:
+                continue
+            size, sha256 = _inspect(name)
+            assets.append(
+                MediaAsset(
+                    name=name,
+                    original_name=os.path.basename(name),
+                    size=size,
+                    sha256=sha256,
+                    page_count=_page_count(name),
+                    uploaded_at=_modified_time(name),
+                    ref_count=counts.get(name, 0),
+                )
+            )
+    MediaAsset.objects.bulk_create(assets, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_trainingmodule_processing_started_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_files, migrations.RunPython.noop),
+    ]
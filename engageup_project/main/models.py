@@ -1,9 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from datetime import timedelta
 import random
 
+from common.storage import dedup_storage
+from common.uploads import validate_upload
+
 
 # =========================
 # ユーティリティ関数
@@ -48,6 +55,14 @@ class Course(models.Model):
 # 研修モジュール (TrainingModule)
 # =========================
 class TrainingModule(models.Model):
+    VIDEO_STATUS_CHOICES = [
+        ("none", "動画なし"),
+        ("pending", "変換待ち"),
+        ("processing", "変換中"),
+        ("ready", "配信準備完了"),
+        ("failed", "変換失敗"),
+    ]
+
     course = models.ForeignKey(
         Course,
         on_delete=models.CASCADE,
@@ -56,11 +71,18 @@ class TrainingModule(models.Model):
     )
     title = models.CharField(verbose_name="研修名", max_length=100)
     video = models.FileField(
-        verbose_name="研修動画", upload_to="training_videos/", null=True, blank=True
+        verbose_name="研修動画",
+        upload_to="training_videos/",
+        storage=dedup_storage,
+        validators=[validate_upload],
+        null=True,
+        blank=True,
     )
     training_file = models.FileField(
         verbose_name="要約元資料(PDF/画像)",
         upload_to="exams_files/",
+        storage=dedup_storage,
+        validators=[validate_upload],
         null=True,
         blank=True,
     )
@@ -73,6 +95,24 @@ class TrainingModule(models.Model):
     order = models.IntegerField(verbose_name="表示順", default=0)
     is_active = models.BooleanField(verbose_name="有効フラグ", default=True)
 
+    # 動画のHLS変換（courses/packaging.py）
+    thumbnail = models.ImageField(
+        verbose_name="サムネイル", upload_to="training_thumbnails/", null=True, blank=True
+    )
+    video_status = models.CharField(
+        verbose_name="動画の変換状況",
+        max_length=20,
+        choices=VIDEO_STATUS_CHOICES,
+        default="none",
+    )
+    hls_playlist = models.CharField(
+        verbose_name="HLSマスタープレイリスト", max_length=255, blank=True
+    )
+    video_error = models.TextField(verbose_name="変換エラー", blank=True)
+    processing_started_at = models.DateTimeField(
+        verbose_name="変換開始日時", null=True, blank=True
+    )
+
     def __str__(self):
         return f"{self.course.subject} - {self.title}"
 
@@ -95,6 +135,149 @@ class UserModuleProgress(models.Model):
         return f"{self.user.username} - {self.module.title} ({status})"
 
 
+# =========================
+# ユーザーのコース進捗サマリー (UserCourseProgress)
+# =========================
+class UserCourseProgressManager(models.Manager):
+    """
+    コース単位の進捗サマリーを再計算するマネージャ
+    ※ 一覧画面で毎回コースごとに count() しないための非正規化テーブル
+    """
+
+    def _build_values(self, done_count, total_active, completed_at):
+        percent = int((done_count / total_active) * 100) if total_active > 0 else 0
+        is_completed = total_active > 0 and done_count >= total_active
+        if not is_completed:
+            completed_at = None
+        elif completed_at is None:
+            completed_at = timezone.now()
+        return {
+            "done_count": done_count,
+            "total_active": total_active,
+            "percent": percent,
+            "completed_at": completed_at,
+        }
+
+    def refresh_for_user(self, user_id, course_id, create=True):
+        """1ユーザー × 1コースの進捗を再計算する"""
+        total_active = TrainingModule.objects.filter(
+            course_id=course_id, is_active=True
+        ).count()
+        done_count = UserModuleProgress.objects.filter(
+            user_id=user_id,
+            module__course_id=course_id,
+            module__is_active=True,
+            is_completed=True,
+        ).count()
+
+        row = self.filter(user_id=user_id, course_id=course_id).first()
+        if row is None:
+            if not create or done_count == 0:
+                return None
+            row = self.model(user_id=user_id, course_id=course_id)
+
+        for field, value in self._build_values(
+            done_count, total_active, row.completed_at
+        ).items():
+            setattr(row, field, value)
+        row.save()
+        return row
+
+    def refresh_for_course(self, course_id):
+        """
+        コース内の研修が追加・表示切替・削除された時に、
+        既存のサマリー行をまとめて再計算する（行の新規作成はしない）
+        """
+        total_active = TrainingModule.objects.filter(
+            course_id=course_id, is_active=True
+        ).count()
+        done_map = dict(
+            UserModuleProgress.objects.filter(
+                module__course_id=course_id,
+                module__is_active=True,
+                is_completed=True,
+            )
+            .values("user_id")
+            .annotate(done=models.Count("id"))
+            .values_list("user_id", "done")
+        )
+
+        rows = list(self.filter(course_id=course_id))
+        for row in rows:
+            for field, value in self._build_values(
+                done_map.get(row.user_id, 0), total_active, row.completed_at
+            ).items():
+                setattr(row, field, value)
+            row.updated_at = timezone.now()
+        self.bulk_update(
+            rows,
+            ["done_count", "total_active", "percent", "completed_at", "updated_at"],
+            batch_size=500,
+        )
+        return len(rows)
+
+    def rebuild(self):
+        """全ユーザー・全コースのサマリーを作り直す（管理コマンド用）"""
+        total_map = dict(
+            TrainingModule.objects.filter(is_active=True)
+            .values("course_id")
+            .annotate(total=models.Count("id"))
+            .values_list("course_id", "total")
+        )
+        done_rows = (
+            UserModuleProgress.objects.filter(module__is_active=True, is_completed=True)
+            .values("user_id", "module__course_id")
+            .annotate(done=models.Count("id"))
+        )
+        completed_at_map = {
+            (user_id, course_id): completed_at
+            for user_id, course_id, completed_at in self.values_list(
+                "user_id", "course_id", "completed_at"
+            )
+        }
+
+        rows = []
+        for item in done_rows:
+            key = (item["user_id"], item["module__course_id"])
+            values = self._build_values(
+                item["done"], total_map.get(key[1], 0), completed_at_map.get(key)
+            )
+            rows.append(self.model(user_id=key[0], course_id=key[1], **values))
+
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(rows, batch_size=500)
+
+        from common import dashboard_stats
+
+        dashboard_stats.invalidate_all()
+        return len(rows)
+
+
+class UserCourseProgress(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="course_progresses",
+    )
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="user_progresses"
+    )
+    done_count = models.PositiveIntegerField(default=0, verbose_name="完了した研修数")
+    total_active = models.PositiveIntegerField(default=0, verbose_name="有効な研修数")
+    percent = models.PositiveSmallIntegerField(default=0, verbose_name="進捗率(%)")
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name="コース完了日時")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserCourseProgressManager()
+
+    class Meta:
+        unique_together = ("user", "course")
+
+    def __str__(self):
+        return f"{self.user.username} - {self.course.subject} ({self.percent}%)"
+
+
 # =========================
 # 研修内の例題 (Example)
 # =========================
@@ -213,7 +396,12 @@ class User(AbstractUser):
         default=False, verbose_name="パスワード暗号化フラグ"
     )
     avatar = models.ImageField(
-        upload_to="avatars/", null=True, blank=True, verbose_name="プロフィール写真"
+        upload_to="avatars/",
+        storage=dedup_storage,
+        validators=[validate_upload],
+        null=True,
+        blank=True,
+        verbose_name="プロフィール写真",
     )
     remarks = models.TextField(
         max_length=500, blank=True, verbose_name="備考・自己紹介"
@@ -248,7 +436,12 @@ class Exam(models.Model):
 
     title = models.CharField(verbose_name="検定名", max_length=200)
     exams_file = models.FileField(
-        verbose_name="教材ファイル", upload_to="exams_files/", null=True, blank=True
+        verbose_name="教材ファイル",
+        upload_to="exams_files/",
+        storage=dedup_storage,
+        validators=[validate_upload],
+        null=True,
+        blank=True,
     )
     description = models.TextField(verbose_name="説明・研修テキスト", blank=True)
     passing_score = models.IntegerField(verbose_name="合格基準点", default=80)
@@ -277,11 +470,48 @@ class Exam(models.Model):
         help_text="0を入力すると無制限になります",
     )
 
+    # 問題プール（大量の問題から受験ごとに一部だけ出題する）
+    POOL_STRATIFY_CHOICES = [
+        ("", "しない"),
+        ("tag", "タグごと"),
+        ("difficulty", "難易度ごと"),
+    ]
+    question_pool_size = models.PositiveIntegerField(
+        default=0,
+        verbose_name="出題数",
+        help_text="0を入力すると全問題を出題します",
+    )
+    pool_stratify = models.CharField(
+        max_length=20,
+        choices=POOL_STRATIFY_CHOICES,
+        default="",
+        blank=True,
+        verbose_name="出題の偏り防止",
+        help_text="問題プールから出題する時、タグ・難易度ごとの割合を保つ",
+    )
+
+    # 問題数（Question の作成・削除時にシグナル／QuestionManager で更新する非正規化カラム）
+    question_count = models.PositiveIntegerField(
+        default=0, db_index=True, editable=False, verbose_name="問題数"
+    )
+
     def __str__(self):
         return f"[{self.get_exam_type_display()}] {self.title}"
 
+    @property
+    def uses_question_pool(self):
+        return self.question_pool_size > 0
+
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
+        is_new = self._state.adding
+        if not is_new and not kwargs.get("force_insert") and kwargs.get("update_fields") is None:
+            # 問題数は別経路で加減算されるため、読み込み時の古い値で上書きしない
+            # （新規作成・INSERT の指定がある場合は全項目を保存する）
+            kwargs["update_fields"] = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != "question_count"
+            ]
         super().save(*args, **kwargs)
 
         # 本試験が新規作成された場合、自動でバッジを作成
@@ -301,7 +531,12 @@ class Badge(models.Model):
     exam = models.OneToOneField(Exam, on_delete=models.CASCADE, related_name="badge")
     name = models.CharField(verbose_name="バッジ名", max_length=100)
     icon = models.ImageField(
-        verbose_name="バッジ画像", upload_to="badges/", null=True, blank=True
+        verbose_name="バッジ画像",
+        upload_to="badges/",
+        storage=dedup_storage,
+        validators=[validate_upload],
+        null=True,
+        blank=True,
     )
     is_active = models.BooleanField(default=True, verbose_name="有効フラグ")
 
@@ -312,9 +547,45 @@ class Badge(models.Model):
 # =========================
 # 問題・選択肢 (Question / Choice)
 # =========================
+class QuestionManager(models.Manager):
+    def adjust_exam_counts(self, deltas):
+        """
+        Exam.question_count を加減算する
+        deltas: {exam_id: 増減数}（F式で更新するため同時に更新されても数がずれない）
+        """
+        for exam_id, delta in deltas.items():
+            if delta:
+                Exam.objects.filter(pk=exam_id).update(
+                    question_count=Greatest(F("question_count") + delta, 0)
+                )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """一括作成（AIによる自動生成など）でも問題数を同じトランザクションで更新する"""
+        objs = list(objs)
+        deltas = {}
+        for obj in objs:
+            deltas[obj.exam_id] = deltas.get(obj.exam_id, 0) + 1
+        with transaction.atomic():
+            created = super().bulk_create(objs, *args, **kwargs)
+            self.adjust_exam_counts(deltas)
+        return created
+
+
 class Question(models.Model):
+    DIFFICULTY_CHOICES = [
+        (1, "易しい"),
+        (2, "普通"),
+        (3, "難しい"),
+    ]
+
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="questions")
     text = models.TextField(verbose_name="問題文")
+    tag = models.CharField(max_length=50, blank=True, default="", verbose_name="タグ")
+    difficulty = models.PositiveSmallIntegerField(
+        choices=DIFFICULTY_CHOICES, default=2, verbose_name="難易度"
+    )
+
+    objects = QuestionManager()
 
     def __str__(self):
         return f"{self.exam.title} - {self.text[:20]}"
@@ -354,6 +625,115 @@ class UserExamStatus(models.Model):
         return f"{self.user.username} - {self.exam.title} ({'合格' if self.is_passed else '未'})"
 
 
+# =========================
+# バッジ獲得ランキング (BadgeLeaderboard)
+# =========================
+class BadgeLeaderboardManager(models.Manager):
+    """
+    スタッフのバッジ（公開中の本試験の合格）数を数えたランキング表
+    ※ 画面表示のたびに全スタッフ × 合格状況を集計しないための非正規化テーブル
+    合格・検定の公開切替・ユーザーのランク変更の時に、該当ユーザーの行だけを再計算する
+    """
+
+    def refresh_users(self, user_ids):
+        """指定したユーザーの行を再計算する（スタッフ以外・バッジ0個の行は削除）"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        staff_ids = set(
+            User.objects.filter(pk__in=user_ids, rank="staff").values_list("pk", flat=True)
+        )
+        counts = {
+            row["user_id"]: row
+            for row in UserExamStatus.objects.filter(
+                user_id__in=staff_ids,
+                is_passed=True,
+                exam__exam_type="main",
+                exam__is_active=True,
+            )
+            .values("user_id")
+            .annotate(
+                badge_count=models.Count("id"), last_passed_at=models.Max("passed_at")
+            )
+        }
+
+        with transaction.atomic():
+            self.filter(user_id__in=user_ids - set(counts)).delete()
+            rows = {row.user_id: row for row in self.filter(user_id__in=counts)}
+            now = timezone.now()
+            for user_id, values in counts.items():
+                row = rows.get(user_id)
+                if row is None:
+                    rows[user_id] = row = self.model(user_id=user_id)
+                row.badge_count = values["badge_count"]
+                row.last_passed_at = values["last_passed_at"]
+                row.updated_at = now
+            self.bulk_create(
+                [row for row in rows.values() if row.pk is None], batch_size=500
+            )
+            self.bulk_update(
+                [row for row in rows.values() if row.pk is not None],
+                ["badge_count", "last_passed_at", "updated_at"],
+                batch_size=500,
+            )
+
+        # 順位は全員に影響するので、全ユーザーのホーム画面の集計を作り直す
+        from common import dashboard_stats
+
+        dashboard_stats.invalidate_all()
+
+    def rebuild(self):
+        """全スタッフ分を作り直す（rebuild_badge_leaderboard コマンド）"""
+        with transaction.atomic():
+            self.all().delete()
+            self.refresh_users(User.objects.filter(rank="staff").values_list("pk", flat=True))
+
+    def top(self, limit):
+        """上位 limit 人（同数の場合は先に達成した人が上）"""
+        return list(
+            self.select_related("user").order_by("-badge_count", "last_passed_at", "user_id")[:limit]
+        )
+
+    def rank_of(self, user):
+        """
+        ユーザーの順位（同数は同順位）
+        戻り値: {"rank": 順位, "badge_count": バッジ数, "total": ランキングの人数}
+        ランキングの対象外（行のない）ユーザーは None
+        """
+        badge_count = self.filter(user=user).values_list("badge_count", flat=True).first()
+        if badge_count is None:
+            return None
+        counts = self.aggregate(
+            total=models.Count("id"),
+            above=models.Count("id", filter=models.Q(badge_count__gt=badge_count)),
+        )
+        return {
+            "rank": counts["above"] + 1,
+            "badge_count": badge_count,
+            "total": counts["total"],
+        }
+
+
+class BadgeLeaderboard(models.Model):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="badge_leaderboard",
+        verbose_name="ユーザー",
+    )
+    badge_count = models.PositiveIntegerField(default=0, verbose_name="バッジ数")
+    last_passed_at = models.DateTimeField(null=True, blank=True, verbose_name="最後に獲得した日時")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日")
+
+    objects = BadgeLeaderboardManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["-badge_count", "last_passed_at"])]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.badge_count}"
+
+
 # =========================
 # 【追加】ユーザー受験履歴 (Log)
 # =========================
@@ -368,6 +748,14 @@ class ExamResult(models.Model):
     exam = models.ForeignKey(
         Exam, on_delete=models.CASCADE, verbose_name="受験した検定"
     )
+    attempt = models.OneToOneField(
+        "ExamAttempt",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="result",
+        verbose_name="受験セッション",
+    )
     score = models.IntegerField(verbose_name="獲得スコア")
     is_passed = models.BooleanField(verbose_name="合否")
     taken_at = models.DateTimeField(auto_now_add=True, verbose_name="受験日時")
@@ -376,6 +764,187 @@ class ExamResult(models.Model):
         return f"{self.user.username} - {self.exam.title} - {self.score}点"
 
 
+# =========================
+# 解答ログ (AnswerLog)
+# =========================
+class AnswerLog(models.Model):
+    """
+    受験1回分の問題ごとの解答（ExamResult に紐づく）
+    ※ 問題・選択肢が後から削除されても記録は残す
+    """
+
+    result = models.ForeignKey(
+        ExamResult, on_delete=models.CASCADE, related_name="answers", verbose_name="受験履歴"
+    )
+    question = models.ForeignKey(
+        Question, on_delete=models.SET_NULL, null=True, related_name="+", verbose_name="問題"
+    )
+    choice = models.ForeignKey(
+        Choice,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="選択した選択肢",
+    )
+    is_correct = models.BooleanField(verbose_name="正解したか")
+
+    def __str__(self):
+        return f"{self.result} - Q{self.question_id} ({'正' if self.is_correct else '誤'})"
+
+
+# =========================
+# 受験セッション (ExamAttempt)
+# =========================
+class ExamAttempt(models.Model):
+    """
+    1回の受験の状態（開始時刻・出題順・途中の回答）をサーバー側で保持する
+    ※ 制限時間はブラウザのタイマーではなく expires_at で判定する
+    """
+
+    STATUS_CHOICES = [
+        ("in_progress", "受験中"),
+        ("submitted", "提出済み"),
+        ("expired", "時間切れ"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="exam_attempts",
+        verbose_name="受験者",
+    )
+    exam = models.ForeignKey(
+        Exam, on_delete=models.CASCADE, related_name="attempts", verbose_name="検定"
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="in_progress", verbose_name="状態"
+    )
+    seed = models.BigIntegerField(verbose_name="出題順シード")
+    question_order = models.JSONField(default=list, verbose_name="出題順(問題ID)")
+    answers = models.JSONField(default=dict, verbose_name="回答 {問題ID: 選択肢ID}")
+    started_at = models.DateTimeField(default=timezone.now, verbose_name="開始日時")
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="制限時刻")
+    submitted_at = models.DateTimeField(null=True, blank=True, verbose_name="提出日時")
+    score = models.IntegerField(null=True, blank=True, verbose_name="獲得スコア")
+    is_passed = models.BooleanField(null=True, blank=True, verbose_name="合否")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "expires_at"]),
+            models.Index(fields=["user", "exam", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.exam.title} ({self.get_status_display()})"
+
+    def is_expired(self, now=None, grace_seconds=0):
+        if self.expires_at is None:
+            return False
+        now = now or timezone.now()
+        return now > self.expires_at + timedelta(seconds=grace_seconds)
+
+    def remaining_seconds(self, now=None):
+        """残り時間（秒）。制限時間なしの場合は None"""
+        if self.expires_at is None:
+            return None
+        now = now or timezone.now()
+        return max(int((self.expires_at - now).total_seconds()), 0)
+
+
+# =========================
+# PDFの抽出テキスト (DocumentText)
+# =========================
+class DocumentText(models.Model):
+    """
+    PDF から抽出したテキスト（同じ内容のファイルは SHA-256 で共有し、抽出は1回だけ）
+    page_offsets: 各ページの先頭が text の何文字目か
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="ファイルのSHA-256")
+    text = models.TextField(blank=True, verbose_name="本文")
+    page_offsets = models.JSONField(default=list, verbose_name="ページ開始位置")
+    page_count = models.PositiveIntegerField(default=0, verbose_name="ページ数")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.page_count}ページ)"
+
+    def page_text(self, index):
+        """index ページ目（0始まり）の本文"""
+        start = self.page_offsets[index]
+        end = (
+            self.page_offsets[index + 1]
+            if index + 1 < len(self.page_offsets)
+            else len(self.text)
+        )
+        return self.text[start:end]
+
+
+# =========================
+# AI生成ジョブ (AIJob)
+# =========================
+class AIJob(models.Model):
+    """
+    Gemini による生成処理のジョブ（run_ai_worker コマンドがバックグラウンドで実行する）
+    """
+
+    KIND_CHOICES = [
+        ("exam_questions", "検定問題の生成"),
+        ("module_content", "研修内容の生成"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "待機中"),
+        ("running", "実行中"),
+        ("succeeded", "完了"),
+        ("failed", "失敗"),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="種類")
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", verbose_name="状態"
+    )
+    exam = models.ForeignKey(
+        Exam, on_delete=models.CASCADE, null=True, blank=True, related_name="ai_jobs"
+    )
+    module = models.ForeignKey(
+        TrainingModule,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="ai_jobs",
+    )
+    params = models.JSONField(default=dict, blank=True, verbose_name="生成条件")
+    result = models.JSONField(default=dict, blank=True, verbose_name="結果")
+    error = models.TextField(blank=True, default="", verbose_name="エラー内容")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="実行回数")
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name="最大実行回数")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="実行可能日時")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="開始日時")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="終了日時")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ai_jobs",
+        verbose_name="依頼者",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in ("succeeded", "failed")
+
+
 # =========================
 # マイリスト (Mylist)
 # =========================
@@ -434,3 +1003,138 @@ class Mylist(models.Model):
         elif self.news:
             return f"[News] {self.user.username} - {self.news.title}"
         return f"{self.user.username} - (Empty)"
+
+
+# =========================
+# メディアライブラリの索引 (MediaAsset)
+# =========================
+class MediaAsset(models.Model):
+    """
+    アップロード済みファイルの索引（重複排除ストレージの1ファイル = 1行）
+    フォームの「保存済みから選ぶ」はディレクトリを読まずにこの表を検索する
+    （アップロード時にストレージが登録、reconcile_media_library コマンドで実ファイルと同期）
+    ref_count: このファイルを参照しているモデルの項目の数（0 のものは削除できる）
+    """
+
+    name = models.CharField(max_length=255, unique=True, verbose_name="ファイル名（MEDIA_ROOTからの相対パス）")
+    original_name = models.CharField(max_length=255, blank=True, default="", verbose_name="アップロード時のファイル名")
+    size = models.BigIntegerField(default=0, verbose_name="サイズ（バイト）")
+    sha256 = models.CharField(max_length=64, db_index=True, verbose_name="ファイルのSHA-256")
+    page_count = models.PositiveIntegerField(null=True, blank=True, verbose_name="ページ数（PDFのみ）")
+    uploaded_at = models.DateTimeField(db_index=True, verbose_name="アップロード日時")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="参照数")
+
+    class Meta:
+        ordering = ["-uploaded_at", "name"]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def filename(self):
+        return self.original_name or self.name.rsplit("/", 1)[-1]
+
+
+# =========================
+# メールの送信キュー (OutboundEmail)
+# =========================
+class OutboundEmail(models.Model):
+    """
+    送信待ちのメール（1行 = 宛先1件）
+    画面からは bulk_create で登録するだけで、send_outbox コマンドが1つのSMTP接続でまとめて送る
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "送信待ち"),
+        ("sending", "送信中"),
+        ("sent", "送信済み"),
+        ("failed", "失敗"),
+    ]
+
+    to_email = models.EmailField(verbose_name="宛先")
+    subject = models.CharField(max_length=255, verbose_name="件名")
+    body = models.TextField(verbose_name="本文")
+    from_email = models.CharField(max_length=255, blank=True, default="", verbose_name="差出人")
+    news = models.ForeignKey(
+        News,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="outbound_emails",
+        verbose_name="お知らせ",
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", verbose_name="状態"
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="送信回数")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="最大送信回数")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="送信可能日時")
+    claim_token = models.CharField(max_length=32, blank=True, default="", verbose_name="取り出したワーカーの識別子")
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name="取り出した日時")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="送信日時")
+    error = models.TextField(blank=True, default="", verbose_name="エラー内容")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["claim_token"]),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email}: {self.subject}"
+
+
+# =========================
+# アカウント一括作成・パスワード再発行のジョブ (ProvisioningJob)
+# =========================
+class ProvisioningJob(models.Model):
+    """
+    パスワードのハッシュ化（PBKDF2）に時間がかかる一括処理のジョブ
+    画面からは登録するだけで、run_provisioning_worker コマンドがプロセスプールで実行する
+    ※ 生のパスワードは保存しない（ワーカーが作成してメールで送る）
+    """
+
+    KIND_CHOICES = [
+        ("create_users", "アカウントの連番作成"),
+        ("reset_passwords", "パスワードの再発行"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "待機中"),
+        ("running", "実行中"),
+        ("succeeded", "完了"),
+        ("failed", "失敗"),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="種類")
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", verbose_name="状態"
+    )
+    params = models.JSONField(default=dict, blank=True, verbose_name="条件")
+    result = models.JSONField(default=dict, blank=True, verbose_name="結果")
+    error = models.TextField(blank=True, default="", verbose_name="エラー内容")
+    total = models.PositiveIntegerField(default=0, verbose_name="対象件数")
+    processed = models.PositiveIntegerField(default=0, verbose_name="処理済み件数")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="開始日時")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="終了日時")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="provisioning_jobs",
+        verbose_name="依頼者",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"])]
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_kind_display()}（{self.get_status_display()}）"
+
+    @property
+    def percent(self):
+        return int(self.processed * 100 / self.total) if self.total else 0
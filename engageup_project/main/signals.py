@@ -1,8 +1,152 @@
-from .models import Constant
+from .models import BadgeLeaderboard, Constant, Question, TrainingModule, UserCourseProgress, UserExamStatus
 
 def create_initial_constant(sender, **kwargs):
     if not Constant.objects.exists():
         Constant.objects.create(
             company_code='exa',
             address='gmail.com'
-        )
\ No newline at end of file
+        )
+
+
+# =========================
+# コース進捗サマリーの同期
+# =========================
+def _loaded_values(instance, attnames):
+    # 遅延読み込み（only/defer）された項目は None（不明 = 変更ありとして扱う）
+    if any(attname not in instance.__dict__ for attname in attnames):
+        return None
+    return tuple(instance.__dict__[attname] for attname in attnames)
+
+
+def remember_progress_state(sender, instance, **kwargs):
+    """読み込んだ時点の完了フラグを覚えておく（保存時に変化を検出するため）"""
+    instance._loaded_is_completed = _loaded_values(instance, ["is_completed"])
+
+
+def sync_course_progress_on_progress_save(sender, instance, created, raw=False, **kwargs):
+    """受講者の研修進捗が保存された時（完了フラグが変わった時のみ）サマリーを更新"""
+    loaded = getattr(instance, "_loaded_is_completed", None)
+    instance._loaded_is_completed = (instance.is_completed,)
+    if raw:
+        return
+    if created and not instance.is_completed:
+        return
+    if not created and loaded == (instance.is_completed,):
+        return
+    course_id = (
+        TrainingModule.objects.filter(pk=instance.module_id)
+        .values_list("course_id", flat=True)
+        .first()
+    )
+    if course_id is not None:
+        UserCourseProgress.objects.refresh_for_user(instance.user_id, course_id)
+
+
+def sync_course_progress_on_progress_delete(sender, instance, **kwargs):
+    """研修進捗が削除された時は既存のサマリー行のみ再計算（新規作成はしない）"""
+    course_id = (
+        TrainingModule.objects.filter(pk=instance.module_id)
+        .values_list("course_id", flat=True)
+        .first()
+    )
+    if course_id is not None:
+        UserCourseProgress.objects.refresh_for_user(
+            instance.user_id, course_id, create=False
+        )
+
+
+MODULE_PROGRESS_FIELDS = ["course_id", "is_active"]
+
+
+def remember_module_state(sender, instance, **kwargs):
+    """読み込んだ時点のコース・表示状態を覚えておく（コースの移動・表示切替を検出するため）"""
+    instance._loaded_module_state = _loaded_values(instance, MODULE_PROGRESS_FIELDS)
+
+
+def sync_course_progress_on_module_save(sender, instance, created, raw=False, **kwargs):
+    """
+    研修の追加・表示切替・コースの移動時に、関係するコースのサマリーをまとめて再計算
+    （タイトル・本文だけの変更では再計算しない）
+    """
+    loaded = getattr(instance, "_loaded_module_state", None)
+    state = tuple(getattr(instance, attname) for attname in MODULE_PROGRESS_FIELDS)
+    instance._loaded_module_state = state
+    if raw or (not created and loaded == state):
+        return
+    UserCourseProgress.objects.refresh_for_course(instance.course_id)
+    # 別のコースから移動した場合は、移動元のコースも再計算する
+    if not created and loaded is not None and loaded[0] != instance.course_id:
+        UserCourseProgress.objects.refresh_for_course(loaded[0])
+
+
+def sync_course_progress_on_module_delete(sender, instance, **kwargs):
+    """研修の削除時に、そのコースのサマリーをまとめて再計算"""
+    UserCourseProgress.objects.refresh_for_course(instance.course_id)
+
+
+# =========================
+# 検定の問題数 (Exam.question_count) の同期
+# =========================
+def increment_question_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Question.objects.adjust_exam_counts({instance.exam_id: 1})
+
+
+def decrement_question_count(sender, instance, **kwargs):
+    Question.objects.adjust_exam_counts({instance.exam_id: -1})
+
+
+# =========================
+# バッジ獲得ランキング (BadgeLeaderboard) の同期
+# ※ 合格時の更新は enrollments/grading.py の _record_passes で行う
+# =========================
+def _passed_user_ids(exam_id):
+    return UserExamStatus.objects.filter(exam_id=exam_id, is_passed=True).values_list(
+        "user_id", flat=True
+    )
+
+
+EXAM_BADGE_FIELDS = ["is_active", "exam_type"]
+
+
+def remember_badge_state(sender, instance, **kwargs):
+    """読み込んだ時点の検定の公開状態・種類を覚えておく"""
+    instance._loaded_badge_state = _loaded_values(instance, EXAM_BADGE_FIELDS)
+
+
+def sync_badge_leaderboard_on_exam_save(sender, instance, created, raw=False, **kwargs):
+    """検定の公開状態・種類が変わった時、その検定の合格者の行を再計算"""
+    state = tuple(getattr(instance, attname) for attname in EXAM_BADGE_FIELDS)
+    loaded = getattr(instance, "_loaded_badge_state", None)
+    instance._loaded_badge_state = state
+    if created or raw or loaded == state:
+        return
+    BadgeLeaderboard.objects.refresh_users(list(_passed_user_ids(instance.pk)))
+
+
+def remember_badge_holders_on_exam_delete(sender, instance, **kwargs):
+    # 削除後は合格状況も消えているため、削除前に合格者を覚えておく
+    instance._badge_holder_ids = list(_passed_user_ids(instance.pk))
+
+
+def sync_badge_leaderboard_on_exam_delete(sender, instance, **kwargs):
+    BadgeLeaderboard.objects.refresh_users(getattr(instance, "_badge_holder_ids", []))
+
+
+def remember_rank(sender, instance, **kwargs):
+    """読み込んだ時点のランクを覚えておく"""
+    instance._loaded_rank = _loaded_values(instance, ["rank"])
+
+
+def sync_badge_leaderboard_on_user_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """ユーザーのランクが変わった時（スタッフになった・外れた）その行を再計算"""
+    if raw or (update_fields is not None and "rank" not in update_fields):
+        return
+    loaded = getattr(instance, "_loaded_rank", None)
+    instance._loaded_rank = (instance.rank,)
+    if created:
+        if instance.rank != "staff":
+            return
+    elif loaded == (instance.rank,):
+        return
+    BadgeLeaderboard.objects.refresh_users([instance.pk])
@@ -1,3 +1,101 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from main.models import BadgeLeaderboard, Exam, Question, User, UserExamStatus
+
+
+class BadgeLeaderboardSignalTests(TestCase):
+    """読み込み時の値と比べ、ランク・公開状態が変わった時だけランキングを再計算する"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="u1", email="u1@example.com", password="pass", rank="visitor"
+        )
+        self.exam = Exam.objects.create(title="e")
+
+    def test_user_rank_change_is_detected_after_loading(self):
+        user = User.objects.get(pk=self.user.pk)
+        with mock.patch.object(BadgeLeaderboard.objects, "refresh_users") as refresh:
+            user.first_name = "name"
+            user.save()
+            refresh.assert_not_called()
+
+            user.rank = "staff"
+            user.save()
+            refresh.assert_called_once_with([user.pk])
+
+    def test_exam_visibility_change_is_detected_after_loading(self):
+        exam = Exam.objects.get(pk=self.exam.pk)
+        with mock.patch.object(BadgeLeaderboard.objects, "refresh_users") as refresh:
+            exam.title = "renamed"
+            exam.save()
+            refresh.assert_not_called()
+
+            exam.is_active = False
+            exam.save()
+            refresh.assert_called_once()
+
+
+class QuestionCountTests(TestCase):
+    """Exam.question_count は問題の追加・削除に合わせて加減算される"""
+
+    def setUp(self):
+        self.exam = Exam.objects.create(title="e")
+
+    def count(self):
+        return Exam.objects.values_list("question_count", flat=True).get(pk=self.exam.pk)
+
+    def test_signals_and_bulk_create_keep_count(self):
+        question = Question.objects.create(exam=self.exam, text="q")
+        Question.objects.bulk_create(
+            [Question(exam=self.exam, text=f"b{i}") for i in range(3)]
+        )
+        self.assertEqual(self.count(), 4)
+        question.delete()
+        self.assertEqual(self.count(), 3)
+
+    def test_saving_stale_exam_does_not_overwrite_count(self):
+        stale = Exam.objects.get(pk=self.exam.pk)
+        Question.objects.create(exam=self.exam, text="q")
+        stale.title = "renamed"
+        stale.save()
+        self.assertEqual(self.count(), 1)
+
+    def test_repair_command_fixes_drifted_counts(self):
+        Question.objects.create(exam=self.exam, text="q")
+        Exam.objects.filter(pk=self.exam.pk).update(question_count=5)
+        out = StringIO()
+        call_command("repair_question_counts", stdout=out)
+        self.assertEqual(self.count(), 1)
+        self.assertIn("1 件", out.getvalue())
+
+
+class BadgeLeaderboardRankTests(TestCase):
+    """順位は同数なら同順位、バッジのないユーザーは順位なし"""
+
+    def setUp(self):
+        self.exams = [Exam.objects.create(title=f"e{i}", exam_type="main") for i in range(2)]
+        self.users = [
+            User.objects.create_user(
+                username=f"s{i}", email=f"s{i}@example.com", password="pass", rank="staff"
+            )
+            for i in range(4)
+        ]
+        # s0: 2個、s1・s2: 1個、s3: なし
+        for user, exams in zip(self.users, [self.exams, self.exams[:1], self.exams[1:], []]):
+            for exam in exams:
+                UserExamStatus.objects.create(user=user, exam=exam, is_passed=True)
+        BadgeLeaderboard.objects.refresh_users([u.pk for u in self.users])
+
+    def test_tied_users_share_a_rank(self):
+        ranks = [BadgeLeaderboard.objects.rank_of(u) for u in self.users[:3]]
+        self.assertEqual(
+            [(r["rank"], r["badge_count"], r["total"]) for r in ranks],
+            [(1, 2, 3), (2, 1, 3), (2, 1, 3)],
+        )
+
+    def test_user_without_badges_has_no_rank(self):
+        self.assertIsNone(BadgeLeaderboard.objects.rank_of(self.users[3]))
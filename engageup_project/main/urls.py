@@ -1,6 +1,10 @@
 from django.urls import path
 from . import views
+from common.views import AIJobStatusView, MediaLibrarySearchView, ProvisioningJobStatusView
 
 urlpatterns = [
     path("", views.IndexView.as_view(), name="index"),  # トップページ用
+    path("ai-jobs/<int:job_id>/status/", AIJobStatusView.as_view(), name="ai_job_status"),  # AI生成ジョブの状態
+    path("provisioning-jobs/<int:job_id>/status/", ProvisioningJobStatusView.as_view(), name="provisioning_job_status"),  # アカウント一括処理の進捗
+    path("media-library/search/", MediaLibrarySearchView.as_view(), name="media_library_search"),  # 保存済みファイルの検索
 ]
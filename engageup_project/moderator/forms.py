@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 from main.models import News, User
 
 class SequentialUserCreateForm(forms.Form):
@@ -12,7 +13,7 @@ class SequentialUserCreateForm(forms.Form):
     count = forms.IntegerField(
         label="作成人数",
         min_value=1,
-        max_value=100
+        max_value=getattr(settings, "PROVISIONING_MAX_ACCOUNTS", 5000)
     )
 
 
@@ -0,0 +1,50 @@
+"""
+アカウント連番作成のユーザー名・メールアドレス
+
+開始番号と人数から作成するアカウントの一覧を Python 側で作り、
+既存ユーザーとの重複は username__in / email__in でまとめて1回の問い合わせで調べる。
+（番号ごとに exists() を呼ばないので、入力のたびに呼ばれる重複チェックでも件数によらず一定）
+"""
+
+from django.db.models import Q
+
+from main.models import Constant, User
+
+# 1回の問い合わせで調べる件数（SQLite のパラメータ数の上限に収まるように分ける）
+CHECK_CHUNK_SIZE = 5000
+
+
+def candidates(start_number, count):
+    """作成するアカウントの [(番号, ユーザー名, メールアドレス), ...]"""
+    company_code, address = (
+        Constant.objects.values_list("company_code", "address").first() or ("", "")
+    )
+    return [
+        (number, f"user{number}", f"{company_code}{number}@{address}")
+        for number in range(start_number, start_number + count)
+    ]
+
+
+def find_conflicts(accounts):
+    """
+    既存ユーザーと重複するユーザー名・メールアドレス
+    戻り値: {"usernames": [...], "emails": [...]}（作成する順）
+    """
+    taken_usernames, taken_emails = set(), set()
+    for start in range(0, len(accounts), CHECK_CHUNK_SIZE):
+        chunk = accounts[start:start + CHECK_CHUNK_SIZE]
+        for username, email in User.objects.filter(
+            Q(username__in=[a[1] for a in chunk]) | Q(email__in=[a[2] for a in chunk])
+        ).values_list("username", "email"):
+            taken_usernames.add(username)
+            taken_emails.add(email)
+    return {
+        "usernames": [a[1] for a in accounts if a[1] in taken_usernames],
+        "emails": [a[2] for a in accounts if a[2] in taken_emails],
+    }
+
+
+def conflicting_usernames(accounts, conflicts):
+    """ユーザー名・メールアドレスのどちらかが重複するアカウントのユーザー名"""
+    usernames, emails = set(conflicts["usernames"]), set(conflicts["emails"])
+    return [a[1] for a in accounts if a[1] in usernames or a[2] in emails]
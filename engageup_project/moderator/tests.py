@@ -1,3 +1,36 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase
+
+from main.models import Constant, User
+
+from .views import check_user_duplicate
+
+
+class SequentialUserDuplicateTests(TestCase):
+    """連番作成の重複チェックは人数によらずクエリ数が一定であることを確認する"""
+
+    def setUp(self):
+        Constant.objects.all().delete()
+        Constant.objects.create(company_code="exa", address="example.com")
+        User.objects.create_user(username="user3", email="other@example.com", password="pass")
+        User.objects.create_user(username="someone", email="exa7@example.com", password="pass")
+
+    def check(self, start_number, count):
+        request = RequestFactory().post(
+            "/", {"start_number": start_number, "count": count}
+        )
+        # 定数の取得 + 重複の検索
+        with self.assertNumQueries(2):
+            return json.loads(check_user_duplicate(request).content)
+
+    def test_conflicts_are_found_in_one_query(self):
+        data = self.check(1, 10)
+        self.assertFalse(data["ok"])
+        self.assertEqual(data["duplicates"], ["user3", "user7"])
+        self.assertEqual(
+            data["conflicts"], {"usernames": ["user3"], "emails": ["exa7@example.com"]}
+        )
+
+    def test_free_range_is_ok(self):
+        self.assertEqual(self.check(11, 90), {"ok": True})
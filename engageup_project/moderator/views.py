@@ -6,12 +6,12 @@ from django.views.generic import (
     UpdateView,
 )
 from django.urls import reverse, reverse_lazy
-from django.db import transaction
-from django.utils.crypto import get_random_string
 from django.core.exceptions import PermissionDenied
 
-from main.models import User, Badge, Constant, News
+from main.models import User, Badge, News
 from .forms import SequentialUserCreateForm, NewsForm
+from . import sequential_accounts
+from accounts import provisioning
 from accounts.authority import AuthoritySet
 from common.views import BaseCreateView, BaseTemplateMixin,AdminOrModeratorRequiredMixin, BadgeRankingMixin
 
@@ -48,10 +48,6 @@ class ModeratorNewsView(
 # =====================================================
 # アカウント連番作成
 # =====================================================from django.views.generic import FormView
-from django.utils.crypto import get_random_string
-from django.core.mail import send_mail
-from django.conf import settings
-from django.db import transaction
 
 class SequentialUserCreateView(
     AdminOrModeratorRequiredMixin,
@@ -61,13 +57,6 @@ class SequentialUserCreateView(
     template_name = "moderator/mo_create_user.html"
     form_class = SequentialUserCreateForm
 
-    PASSWORD_LENGTH = 12
-    PASSWORD_CHARS = (
-        "abcdefghijklmnopqrstuvwxyz"
-        "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-        "0123456789!@#$%^&*"
-    )
-
     def get_success_url(self):
         return AuthoritySet.authority_two(
             "administer", "user_list",
@@ -75,102 +64,60 @@ class SequentialUserCreateView(
             self.request.user.rank
         )
 
-    def generate_password(self):
-        return get_random_string(
-            length=self.PASSWORD_LENGTH,
-            allowed_chars=self.PASSWORD_CHARS
-        )
-
     def form_valid(self, form):
-        company_code = Constant.objects.values_list(
-            "company_code", flat=True
-        ).first()
-        email_address = Constant.objects.values_list(
-            "address", flat=True
-        ).first()
-
-        start_number = form.cleaned_data["start_number"]
-        count = form.cleaned_data["count"]
+        accounts = sequential_accounts.candidates(
+            form.cleaned_data["start_number"], form.cleaned_data["count"]
+        )
 
         FIXED_RANK = "visitor"
 
-        users = []
-
-        for i in range(count):
-            number = start_number + i
-            username = f"user{number}"
-            email = f"{company_code}{number}@{email_address}"
-
-            # 🔒 重複チェック
-            if User.objects.filter(username=username).exists():
+        # 🔒 重複チェック（ユーザー名・メールアドレスをまとめて1回で調べる）
+        conflicts = sequential_accounts.find_conflicts(accounts)
+        if conflicts["usernames"] or conflicts["emails"]:
+            for username in conflicts["usernames"]:
                 form.add_error(None, f"{username} は既に存在します")
-                return self.form_invalid(form)
-
-            raw_password = self.generate_password()
-
-            user = User(
-                username=username,
-                email=email,
-                rank=FIXED_RANK   # ← ★ここが正解
-            )
-            user.set_password(raw_password)
-
-            # メール用に一時保持
-            user._raw_password = raw_password
-            users.append(user)
-
-        # DB保存
-        with transaction.atomic():
-            User.objects.bulk_create(users)
-
-        # メール送信
-        for user in users:
-            send_mail(
-                subject="アカウント作成のお知らせ",
-                message=f"""
-{user.username} 様
-
-アカウントが作成されました。
-
-ログイン情報
-ユーザー名: {user.username}
-パスワード: {user._raw_password}
-""",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-
+            for email in conflicts["emails"]:
+                form.add_error(None, f"{email} は既に使われています")
+            return self.form_invalid(form)
+
+        # パスワードのハッシュ化・保存・メール送信はワーカー（run_provisioning_worker）で行い、
+        # 画面はジョブの進捗をポーリングする
+        job = provisioning.enqueue(
+            "create_users",
+            params={
+                "start_number": form.cleaned_data["start_number"],
+                "count": form.cleaned_data["count"],
+                "rank": FIXED_RANK,
+            },
+            user=self.request.user,
+            total=len(accounts),
+        )
+        if self.request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return JsonResponse({
+                "status": "success",
+                "job_id": job.pk,
+                "status_url": reverse("provisioning_job_status", kwargs={"job_id": job.pk}),
+            })
         return super().form_valid(form)
 
 
 
 def check_user_duplicate(request):
-    start_number = int(request.POST.get("start_number"))
-    count = int(request.POST.get("count"))
-
-    company_code = Constant.objects.values_list(
-        "company_code", flat=True
-    ).first()
-    email_address = Constant.objects.values_list(
-        "address", flat=True
-    ).first()
+    """作成予定のアカウントの重複チェック（入力のたびに画面から呼ばれる）"""
+    form = SequentialUserCreateForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"ok": False, "duplicates": [], "errors": form.errors}, status=400)
 
-    duplicates = []
-
-    for i in range(count):
-        number = start_number + i
-        username = f"user{number}"
-        email = f"{company_code}{number}@{email_address}"
-
-        if User.objects.filter(username=username).exists() or \
-           User.objects.filter(email=email).exists():
-            duplicates.append(username)
+    accounts = sequential_accounts.candidates(
+        form.cleaned_data["start_number"], form.cleaned_data["count"]
+    )
+    conflicts = sequential_accounts.find_conflicts(accounts)
 
-    if duplicates:
+    if conflicts["usernames"] or conflicts["emails"]:
         return JsonResponse({
             "ok": False,
-            "duplicates": duplicates
+            "duplicates": sequential_accounts.conflicting_usernames(accounts, conflicts),
+            "conflicts": conflicts,
         })
 
     return JsonResponse({"ok": True})
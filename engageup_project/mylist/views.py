@@ -2,6 +2,7 @@ from django.views.generic import ListView
 from django.db.models import Prefetch
 from main.models import Mylist, UserModuleProgress, TrainingModule # 必要に応じてインポート追加
 from common.views import LoginRequiredCustomMixin, BaseTemplateMixin
+from courses.progress import get_progress_map
 
 class MylistIndexView(LoginRequiredCustomMixin, BaseTemplateMixin, ListView):
     """マイリスト一覧画面（進捗率計算・非表示除外対応）"""
@@ -35,21 +36,12 @@ class MylistIndexView(LoginRequiredCustomMixin, BaseTemplateMixin, ListView):
             ).values_list("module_id", flat=True)
         )
 
-        # 各コースの進捗率を計算
-        # get_queryset で prefetch されているため、item.course.modules.all() は有効なもののみ
+        # 各コースの進捗率を1クエリでまとめて計算
+        progress_map = get_progress_map(
+            user, [item.course_id for item in context["my_favorites"] if item.course_id]
+        )
         for item in context["my_favorites"]:
             if item.course:
-                active_modules = list(item.course.modules.all()) # すでに絞り込み済み
-                total_modules = len(active_modules)
+                item.course.progress_percent = progress_map[item.course.id]["progress_percent"]
 
-                if total_modules > 0:
-                    done_count = UserModuleProgress.objects.filter(
-                        user=user, 
-                        module__in=active_modules, 
-                        is_completed=True
-                    ).count()
-                    item.course.progress_percent = int((done_count / total_modules) * 100)
-                else:
-                    item.course.progress_percent = 0
-        
         return context
\ No newline at end of file
@@ -1,12 +1,13 @@
-from datetime import datetime
+import datetime
 from django.shortcuts import redirect, render
 from django.views.generic import ListView,TemplateView
 from common.views import AdminOrModeratorOrStaffRequiredMixin, BaseTemplateMixin
-from main.models import Course, User, UserModuleProgress
+from main.models import Course, User
 from django.db.models import Count, Q
 
 from django.views.generic import TemplateView, ListView
-from main.models import News, UserExamStatus
+from main.models import News
+from common import dashboard_stats
 from common.views import BaseTemplateMixin
 from moderator.views import BadgeRankingMixin 
 
@@ -19,26 +20,8 @@ class StaffIndexView(BaseTemplateMixin, BadgeRankingMixin, TemplateView):
         user = self.request.user
 
         if user.is_authenticated:
-            # 1. 🏆 ランキング
-            context['badge_ranking'] = self.get_badge_ranking_data()
-
-            # 2. 📊 スタッツ（バッジ数・完了コース）
-            context['badges_count'] = UserExamStatus.objects.filter(
-                user=user, is_passed=True, exam__exam_type='main', exam__is_active=True
-            ).count()
-
-            all_courses = Course.objects.filter(is_active=True).prefetch_related('modules')
-            completed_course_count = 0
-            for course in all_courses:
-                total = course.modules.filter(is_active=True).count()
-                if total == 0: continue
-                done = UserModuleProgress.objects.filter(user=user, module__course=course, is_completed=True).count()
-                if total == done: completed_course_count += 1
-            
-            context['completed_course_count'] = completed_course_count
-
-            # 3. 📢 お知らせ（最新3件） ★追加
-            context['latest_news'] = News.objects.filter(is_active=True).order_by('-created_at')[:3]
+            # 1〜3. 🏆 ランキング・📊 スタッツ・📢 お知らせ（キャッシュ済みのスナップショット）
+            context.update(dashboard_stats.get_stats(user))
 
             # 4. 📅 挨拶用データ ★追加
             hour = datetime.datetime.now().hour